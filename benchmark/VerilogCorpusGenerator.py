@@ -0,0 +1,150 @@
+
+#
+# generator for synthetic Verilog/SystemVerilog corpora (used by verilog_codeGen_benchmark)
+#
+
+import os, random
+
+
+class VerilogCorpusGenerator:
+    """writes a deterministic (seeded) synthetic corpus of Verilog/SystemVerilog module files into a directory tree
+    Modules use the declaration styles the scanner has to handle: ANSI headers with parameter lists, packed dimensions, net/variable types, signed ports, lists of identifiers sharing one declaration, comments and attributes between items, as well as a module body which the scanner has to skip.
+    """
+
+    # directory names used for the tree (mixed with excluded names to exercise the module search)
+    __l_dirNames = ["rtl", "ip", "core", "periph", "bus", "mem", "dsp", "util", "top", "sim"]
+    # port name stems and suffixes
+    __l_portStems = ["clk", "rst_n", "data", "addr", "valid", "ready", "wr_en", "rd_en", "sel", "cfg", "irq", "status", "count", "mask"]
+    __l_portTypes = ["input", "input", "input", "output", "output", "inout"]
+    # net/variable types per language
+    __d_netTypes = { "v": ["", "wire ", "reg "], "sv": ["", "logic ", "wire ", "logic signed "] }
+
+
+    def __init__(self, s_rootDir, seed=0):
+        """
+        :s_rootDir: directory the corpus is written to (created if it does not exist)
+        :seed: seed of the random generator, equal seeds yield equal corpora
+        """
+        self.s_rootDir  = s_rootDir
+        self.random     = random.Random(seed)
+
+
+    def generate_tree(self, numFiles=1000, depth=4, fanout=4, minPorts=10, maxPorts=200, maxParameters=8):
+        """writes numFiles module files, distributed over a directory tree
+
+        :numFiles: number of module files
+        :depth: depth of the directory tree
+        :fanout: number of subdirectories per directory
+        :minPorts/maxPorts: range of the number of ports per module
+        :maxParameters: maximum number of parameters per module
+        :returns: list of tuples (file path, module name, number of ports)
+        """
+        l_directories = self.__generate_directories(depth, fanout)
+
+        l_files = []
+        for i_file in range(numFiles):
+            s_language = "sv" if self.random.random() < 0.5 else "v"
+            s_moduleName = "mod_" + str(i_file)
+            s_path = os.path.join( self.random.choice(l_directories), s_moduleName + "." + s_language )
+            numPorts = self.random.randint(minPorts, maxPorts)
+            self.write_module(s_path, s_moduleName, numPorts, self.random.randint(0, maxParameters), s_language)
+            l_files.append( (s_path, s_moduleName, numPorts) )
+
+        return l_files
+
+
+    def write_module(self, s_path, s_moduleName, numPorts, numParameters=4, s_language="v", bodyLines=50):
+        """writes a single module file
+
+        :s_path: output file
+        :s_moduleName: name of the module
+        :numPorts: number of ports (identifiers, several identifiers may share one declaration)
+        :numParameters: number of parameters
+        :s_language: "v" or "sv"
+        :bodyLines: number of lines of the module body
+        """
+        l_out = ["`timescale 1ns/1ps\n", "\n", "// synthetic module " + s_moduleName + "\n",
+                "/*\n * generated by VerilogCorpusGenerator\n */\n", "module " + s_moduleName]
+
+        #### parameters ####
+        if numParameters:
+            l_out.append(" #(\n")
+            for i_parameter in range(numParameters):
+                l_out.append("\tparameter P_" + str(i_parameter) + " = " + str(self.random.randint(1, 64)))
+                l_out.append(",\n" if i_parameter < numParameters - 1 else "\n")
+            l_out.append(")")
+
+        #### ports ####
+        l_out.append(" (\n")
+        i_port = 0
+        while i_port < numPorts:
+            # several identifiers per declaration now and then
+            numIdentifiers = min( numPorts - i_port, self.random.choice([1, 1, 1, 2, 3]) )
+            s_portType = self.random.choice(type(self).__l_portTypes)
+            s_netType = self.random.choice(type(self).__d_netTypes[s_language]) if s_portType != "inout" else "wire "
+            s_width = self.__get_width(numParameters)
+            if self.random.random() < 0.05:
+                l_out.append("\t(* keep = \"true\" *)\n")
+            l_identifiers = [ self.__get_portName(i_port + i, s_portType) for i in range(numIdentifiers) ]
+            l_out.append("\t" + s_portType + " " + s_netType + s_width + ", ".join(l_identifiers))
+            i_port += numIdentifiers
+            l_out.append("," if i_port < numPorts else "")
+            if self.random.random() < 0.1:
+                l_out.append("\t// port comment")
+            l_out.append("\n")
+        l_out.append(");\n\n")
+
+        #### body ####
+        for i_line in range(bodyLines // 5):
+            l_out.append("\talways @(posedge clk) begin\n\t\tif (!rst_n) begin\n\t\t\tcnt_" + str(i_line) + " <= 0;\n\t\tend\n\tend\n")
+        l_out.append("\nendmodule\n")
+
+        os.makedirs(os.path.dirname(s_path) or ".", exist_ok=True)
+        with open(s_path, "w") as file_out:
+            file_out.write("".join(l_out))
+
+
+    def __generate_directories(self, depth, fanout):
+        """creates the directory tree (including some directories the module search excludes by default)
+
+        :returns: list of all created directories (files are only placed into not excluded ones)
+        """
+        l_directories = [self.s_rootDir]
+        l_level = [self.s_rootDir]
+        for i_depth in range(depth):
+            l_nextLevel = []
+            for s_dir in l_level:
+                for i_subdir in range(fanout):
+                    l_nextLevel.append( os.path.join(s_dir, type(self).__l_dirNames[i_subdir % len(type(self).__l_dirNames)] + "_" + str(i_subdir)) )
+            l_directories.extend(l_nextLevel)
+            l_level = l_nextLevel
+
+        for s_dir in l_directories:
+            os.makedirs(s_dir, exist_ok=True)
+        # tool output directories next to the sources
+        for s_dir in l_directories[:fanout + 1]:
+            os.makedirs(os.path.join(s_dir, ".git", "objects"), exist_ok=True)
+            os.makedirs(os.path.join(s_dir, "work", "_lib"), exist_ok=True)
+
+        return l_directories
+
+
+    def __get_portName(self, i_port, s_portType):
+        """returns a unique port name with the usual io suffix
+        """
+        s_suffix = { "input": "_i", "output": "_o", "inout": "_io" }[s_portType]
+        return self.random.choice(type(self).__l_portStems) + "_" + str(i_port) + s_suffix
+
+
+    def __get_width(self, numParameters):
+        """returns a random packed dimension (or none)
+        """
+        f_random = self.random.random()
+        if f_random < 0.4:
+            return ""
+        elif f_random < 0.7:
+            return "[" + str(self.random.randint(1, 63)) + ":0] "
+        elif numParameters:
+            return "[P_" + str(self.random.randrange(numParameters)) + "-1:0] "
+        else:
+            return "[7:0] "
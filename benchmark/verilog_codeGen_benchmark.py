@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+
+# verilog_codeGen_benchmark
+# Copyright © 2020 Marwin Kirchhofs <marwin.kirchhofs@rwth-aachen.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# benchmark suite for verilog_codeGen
+#
+#   Generates a synthetic corpus (see VerilogCorpusGenerator) and times the stages of the code generator on it:
+#       * index:        cold module search (builds the module index)
+#       * lookup:       warm module searches for random modules (latency percentiles)
+#       * scan:         scanning all corpus files (VerilogFile.scan)
+#       * scan_lazy:    determining the module names of all corpus files without parsing the headers (lazy modules)
+#       * cache_cold:   scanning all corpus files through an empty module cache
+#       * cache_warm:   scanning all corpus files through the filled module cache
+#       * tabbedString: get_tabbedString calls
+#       * render:       rendering testbench, module file and instantiation of all scanned modules
+#       * write:        writing testbench files of all scanned modules
+#       * memory:       memory (bytes per port) of all scanned modules loaded from serialized (cache) entries
+#       * large_scan/large_render: scanning and rendering (testbench, module file and instantiation) a single module with --large-ports ports,
+#                                  large_render also reports the time per port relative to a module with a tenth of the ports (scaling, 1.0: linear)
+#   The results are written as JSON (-> compare results between commits with --compare).
+#   The module index and module cache are redirected to a temporary directory (XDG_CACHE_HOME), so your own caches are untouched.
+#
+#   usage:
+#       verilog_codeGen_benchmark.py [--files 2000 --min-ports 10 --max-ports 200 --depth 4 --fanout 4 --large-ports 100000 --lookups 200 --repeat 1] [-o results.json] [--compare old_results.json]
+#
+
+# add src path to python's module search path
+def add_srcPath():
+    s_thisPath = os.path.realpath(__file__)
+    l_srcPath = s_thisPath.split("/")[:-2] + ["src"]
+    sys.path.append( "/".join(l_srcPath) )
+
+
+import sys, os, gc, json, time, platform, shutil, subprocess, tempfile, random, tracemalloc
+from optparse import OptionParser
+add_srcPath()
+from VerilogCorpusGenerator import VerilogCorpusGenerator
+
+
+def get_percentile(l_values, percentile):
+    """returns the percentile (0..100) of l_values (nearest rank)
+    """
+    l_sorted = sorted(l_values)
+    return l_sorted[ min( len(l_sorted) - 1, max(0, int(round(percentile / 100 * len(l_sorted))) - 1) ) ]
+
+
+def time_stage(function, repeat=1):
+    """runs function repeat times
+
+    :returns: tuple (best wall time in seconds, return value of the last run)
+    """
+    bestTime = None
+    for i in range(repeat):
+        startTime = time.perf_counter()
+        result = function()
+        elapsedTime = time.perf_counter() - startTime
+        bestTime = elapsedTime if bestTime is None else min(bestTime, elapsedTime)
+    return bestTime, result
+
+
+def get_commit():
+    """returns the current git commit of this repository, empty string if unknown
+    """
+    try:
+        return subprocess.run( ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.realpath(__file__)),
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run_benchmarks(options, s_workDir):
+    """runs all benchmark stages in s_workDir
+
+    :returns: dictionary stage name -> dictionary of measurements
+    """
+    # imported here, because the cache directory is determined from XDG_CACHE_HOME set by the caller
+    from VerilogFile import VerilogFile
+    from VerilogModuleIndex import VerilogModuleIndex
+    from VerilogModuleCache import VerilogModuleCache
+    from Verilog_codeGen_config import Verilog_codeGen_config
+    from VerilogCodeGen_Helper import IndentObj, get_tabbedString
+
+    d_stages = {}
+    s_corpusDir = os.path.join(s_workDir, "corpus")
+    s_outputDir = os.path.join(s_workDir, "output")
+    os.makedirs(s_outputDir)
+
+    #### corpus generation ####
+    corpusGenerator = VerilogCorpusGenerator(s_corpusDir, seed=options.seed)
+    seconds, l_files = time_stage( lambda: corpusGenerator.generate_tree( options.numFiles, options.depth, options.fanout,
+                                                        options.minPorts, options.maxPorts, options.maxParameters ) )
+    numPorts = sum( [ t_file[2] for t_file in l_files ] )
+    numBytes = sum( [ os.path.getsize(t_file[0]) for t_file in l_files ] )
+    d_stages["generate"] = { "seconds": seconds, "files": len(l_files), "ports": numPorts, "bytes": numBytes }
+
+    #### module search ####
+    config = Verilog_codeGen_config( configFile="" )
+    l_roots = [ s_corpusDir ]
+
+    moduleIndex = VerilogModuleIndex.load()
+    seconds, l_found = time_stage( lambda: moduleIndex.find( l_files[0][1], l_roots, **config.get_searchOptions() ) )
+    moduleIndex.save()
+    d_stages["index"] = { "seconds": seconds, "found": len(l_found) }
+
+    randomLookup = random.Random(options.seed)
+    l_lookupNames = [ randomLookup.choice(l_files)[1] for i in range(options.lookups) ]
+    l_latencies = []
+    for s_moduleName in l_lookupNames:
+        # load per lookup, same as a command line call
+        startTime = time.perf_counter()
+        moduleIndex = VerilogModuleIndex.load()
+        moduleIndex.find( s_moduleName, l_roots, **config.get_searchOptions() )
+        l_latencies.append( time.perf_counter() - startTime )
+    d_stages["lookup"] = { "seconds": sum(l_latencies), "lookups": len(l_latencies),
+                            "p50": get_percentile(l_latencies, 50), "p90": get_percentile(l_latencies, 90),
+                            "p99": get_percentile(l_latencies, 99), "max": max(l_latencies) }
+
+    #### scanning ####
+    seconds, l_scanned = time_stage( lambda: [ VerilogFile.scan(t_file[0]) for t_file in l_files ], options.repeat )
+    d_stages["scan"] = { "seconds": seconds, "files_per_s": len(l_files) / seconds, "ports_per_s": numPorts / seconds,
+                        "bytes_per_s": numBytes / seconds, "failed": l_scanned.count(None) }
+
+    # module names only (lazy modules, headers are not parsed)
+    seconds, l_names = time_stage( lambda: [ VerilogFile.scan_moduleAt(t_file[0], offset, s_timescale, moduleName=s_moduleName).verilogModule.moduleName
+                                                for t_file in l_files for s_moduleName, offset, s_timescale in VerilogFile.scan_moduleDeclarations(t_file[0]) ], options.repeat )
+    d_stages["scan_lazy"] = { "seconds": seconds, "files_per_s": len(l_files) / seconds, "modules": len(l_names) }
+
+    moduleCache = VerilogModuleCache.load()
+    seconds, l_result = time_stage( lambda: [ moduleCache.scan(t_file[0]) for t_file in l_files ] )
+    d_stages["cache_cold"] = { "seconds": seconds, "files_per_s": len(l_files) / seconds, "ports_per_s": numPorts / seconds }
+    seconds, l_result = time_stage( lambda: [ moduleCache.scan(t_file[0]) for t_file in l_files ], options.repeat )
+    d_stages["cache_warm"] = { "seconds": seconds, "files_per_s": len(l_files) / seconds, "ports_per_s": numPorts / seconds }
+
+    #### get_tabbedString ####
+    indentObj = IndentObj( tabwidth=4, desiredIndentation=24 )
+    l_elements = [ ("input", "wire", "[" + str(i % 64) + ":0]", "port_" + str(i)) for i in range(options.tabbedStrings) ]
+    seconds, l_result = time_stage( lambda: [ get_tabbedString(t_elements, indentObj) for t_elements in l_elements ], options.repeat )
+    d_stages["tabbedString"] = { "seconds": seconds, "calls_per_s": len(l_elements) / seconds }
+
+    #### rendering and writing ####
+    l_scanned = [ verilogFile for verilogFile in l_scanned if verilogFile ]
+    numScannedPorts = sum( [ sum( [ len(l_ports) for l_ports in verilogFile.verilogModule.ports.values() ] ) for verilogFile in l_scanned ] )
+
+    def render_all():
+        numRendered = 0
+        for verilogFile in l_scanned:
+            numRendered += len( verilogFile.render_testbenchFile() )
+            numRendered += len( verilogFile.render_moduleFile() )
+            numRendered += len( verilogFile.verilogModule.render_instantiation(indentObj) )
+        return numRendered
+    seconds, numRendered = time_stage(render_all, options.repeat)
+    d_stages["render"] = { "seconds": seconds, "files_per_s": len(l_scanned) / seconds, "ports_per_s": numScannedPorts / seconds,
+                            "bytes_per_s": numRendered / seconds }
+
+    def write_all():
+        for verilogFile in l_scanned:
+            verilogFile.write_testbenchFile( os.path.join(s_outputDir, "tb_" + verilogFile.verilogModule.moduleName + "." + verilogFile.language.get_fileEnding()),
+                                                s_overwritePolicy="overwrite" )
+    seconds, result = time_stage(write_all, options.repeat)
+    d_stages["write"] = { "seconds": seconds, "files_per_s": len(l_scanned) / seconds, "ports_per_s": numScannedPorts / seconds }
+
+    #### memory ####
+    # all scanned modules loaded from serialized entries, as from the module cache when indexing a whole library (traced allocations while the objects are alive)
+    l_entries = [ json.dumps( verilogFile.to_dict() ) for verilogFile in l_scanned ]
+    gc.collect()
+    tracemalloc.start()
+    seconds, l_loaded = time_stage( lambda: [ VerilogFile.fromDict( json.loads(s_entry) ) for s_entry in l_entries ] )
+    numBytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del l_loaded
+    d_stages["memory"] = { "seconds": seconds, "ports": numScannedPorts, "bytes": numBytes, "bytes_per_port": numBytes / numScannedPorts }
+
+    #### single large module ####
+    if options.largePorts:
+        s_largeFile = os.path.join(s_workDir, "large_module.sv")
+        corpusGenerator.write_module(s_largeFile, "large_module", options.largePorts, numParameters=16, s_language="sv", bodyLines=1000)
+        seconds, largeFile = time_stage( lambda: VerilogFile.scan(s_largeFile), options.repeat )
+        d_stages["large_scan"] = { "seconds": seconds, "ports": options.largePorts, "ports_per_s": options.largePorts / seconds }
+
+        def render_large(verilogFile):
+            return ( len( verilogFile.render_testbenchFile() ) + len( verilogFile.render_moduleFile() )
+                    + len( verilogFile.verilogModule.render_instantiation(indentObj) ) )
+        seconds, numRendered = time_stage( lambda: render_large(largeFile), options.repeat )
+
+        # same module with a tenth of the ports -> scaling: time per port of the large module relative to the small one (1.0: linear)
+        s_smallFile = os.path.join(s_workDir, "small_module.sv")
+        numSmallPorts = max(1, options.largePorts // 10)
+        corpusGenerator.write_module(s_smallFile, "small_module", numSmallPorts, numParameters=16, s_language="sv", bodyLines=1000)
+        smallFile = VerilogFile.scan(s_smallFile)
+        smallSeconds, result = time_stage( lambda: render_large(smallFile), max(3, options.repeat) )
+
+        d_stages["large_render"] = { "seconds": seconds, "ports": options.largePorts, "ports_per_s": options.largePorts / seconds,
+                                    "bytes": numRendered, "scaling": (seconds / options.largePorts) / (smallSeconds / numSmallPorts) }
+
+    return d_stages
+
+
+def print_results(d_results, d_compare=None):
+    """prints the measured stages (and the relative change to d_compare if given)
+    """
+    for s_stage, d_stage in d_results["stages"].items():
+        l_print = [ s_stage.ljust(14), "{:10.4f} s".format(d_stage["seconds"]) ]
+        if d_compare and s_stage in d_compare.get("stages", {}) and d_compare["stages"][s_stage]["seconds"] > 0:
+            oldSeconds = d_compare["stages"][s_stage]["seconds"]
+            l_print.append( "  ({:+.1f} %, was {:.4f} s)".format( (d_stage["seconds"] / oldSeconds - 1) * 100, oldSeconds ) )
+        for s_key, value in d_stage.items():
+            if s_key.endswith("_per_s"):
+                l_print.append( "  " + s_key + ": " + "{:.0f}".format(value) )
+            elif s_key == "bytes_per_port":
+                l_print.append( "  bytes_per_port: " + "{:.1f}".format(value) )
+            elif s_key == "scaling":
+                l_print.append( "  scaling: " + "{:.2f}".format(value) )
+            elif s_key.startswith("p") and s_key[1:].isdigit():
+                l_print.append( "  " + s_key + ": " + "{:.2f} ms".format(value * 1000) )
+        print( "".join(l_print) )
+
+
+if __name__ == '__main__':
+
+    #########################
+    #### option handling ####
+    #########################
+
+    optionParser = OptionParser(usage="usage: %prog [options]")
+    optionParser.add_option("--files", type="int", dest="numFiles", default=2000, help="number of module files of the synthetic corpus")
+    optionParser.add_option("--min-ports", type="int", dest="minPorts", default=10, help="minimum number of ports per module")
+    optionParser.add_option("--max-ports", type="int", dest="maxPorts", default=200, help="maximum number of ports per module")
+    optionParser.add_option("--max-parameters", type="int", dest="maxParameters", default=16, help="maximum number of parameters per module")
+    optionParser.add_option("--depth", type="int", dest="depth", default=4, help="depth of the corpus directory tree")
+    optionParser.add_option("--fanout", type="int", dest="fanout", default=4, help="subdirectories per directory of the corpus tree")
+    optionParser.add_option("--large-ports", type="int", dest="largePorts", default=100000, help="number of ports of the single large module, 0 to skip")
+    optionParser.add_option("--lookups", type="int", dest="lookups", default=200, help="number of warm module searches")
+    optionParser.add_option("--tabbed-strings", type="int", dest="tabbedStrings", default=100000, help="number of get_tabbedString calls")
+    optionParser.add_option("--repeat", type="int", dest="repeat", default=1, help="repetitions per stage (best time is reported)")
+    optionParser.add_option("--seed", type="int", dest="seed", default=0, help="seed of the corpus generator")
+    optionParser.add_option("--work-dir", dest="workDir", default="", help="directory for corpus, caches and output (default: temporary directory, removed afterwards)")
+    optionParser.add_option("-o", "--output", dest="output", default="", help="JSON result file (default: benchmark_<commit>.json in the work directory if given, otherwise in the current directory)")
+    optionParser.add_option("--compare", dest="compare", default="", help="JSON result file of an earlier run to compare with")
+
+    (options, args) = optionParser.parse_args()
+
+    #### work directory ####
+    if options.workDir:
+        if os.path.exists(options.workDir) and os.listdir(options.workDir):
+            print("Work directory " + options.workDir + " is not empty!")
+            sys.exit(1)
+        s_workDir = options.workDir
+        os.makedirs(s_workDir, exist_ok=True)
+    else:
+        s_workDir = tempfile.mkdtemp(prefix="verilog_codeGen_benchmark_")
+
+    # isolated caches (module index, module cache)
+    os.environ["XDG_CACHE_HOME"] = os.path.join(s_workDir, "cache")
+
+    try:
+        d_stages = run_benchmarks(options, s_workDir)
+    finally:
+        if not options.workDir:
+            shutil.rmtree(s_workDir, ignore_errors=True)
+
+    #### results ####
+    s_commit = get_commit()
+    d_results = { "version": 1, "commit": s_commit, "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                    "parameters": vars(options), "stages": d_stages }
+
+    d_compare = None
+    if options.compare:
+        with open(options.compare, "r") as file_in:
+            d_compare = json.load(file_in)
+        print("compared with " + options.compare + " (commit " + d_compare.get("commit", "")[:10] + ")")
+    print_results(d_results, d_compare)
+
+    s_output = options.output if options.output else os.path.join( options.workDir, "benchmark_" + (s_commit[:10] if s_commit else "unknown") + ".json" )
+    with open(s_output, "w") as file_out:
+        json.dump(d_results, file_out, indent=4)
+    print("results written to " + s_output)
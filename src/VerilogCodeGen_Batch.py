@@ -0,0 +1,151 @@
+
+#
+# batch testbench generation for many Verilog/SystemVerilog files
+#
+
+import os, sys, re, io, glob
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+
+from VerilogModuleCache import VerilogModuleCache
+from VerilogModuleIndex import VerilogModuleIndex
+from VerilogCodeGen_Helper import *
+
+
+# pattern to match Verilog/SystemVerilog source files
+re_sourceFile = re.compile(r"\.(v|sv)$")
+
+
+def collect_sourceFiles(l_sources, s_fileList="", d_searchOptions=None):
+    """collects the source files for batch generation
+
+    :l_sources: list of directories (searched recursively for .v/.sv files), glob patterns (recursive "**" supported) or files
+    :s_fileList: file containing one source (file, directory or glob pattern) per line, "-" to read from stdin
+    :d_searchOptions: options of the module search (see Verilog_codeGen_config.get_searchOptions): directories are walked like the module search (see VerilogModuleIndex.list_files), the excludes also apply to glob patterns
+    :returns: list of source file paths, in order of appearance and without duplicates
+    """
+    d_searchOptions = dict(d_searchOptions) if d_searchOptions else {}
+    d_searchOptions.pop("b_stopAtUniqueMatch", None)
+    moduleIndex = None
+
+    l_sources = list(l_sources)
+    if s_fileList:
+        if s_fileList == "-":
+            l_sources.extend( [ s_line.strip() for s_line in sys.stdin if s_line.strip() ] )
+        else:
+            with open(s_fileList, "r") as file_in:
+                l_sources.extend( [ s_line.strip() for s_line in file_in if s_line.strip() ] )
+
+    l_files = []
+    for s_source in l_sources:
+        if os.path.isdir(s_source):
+            if not moduleIndex:
+                moduleIndex = VerilogModuleIndex.load()
+            # (paths relative to s_source as given)
+            s_root = os.path.abspath(s_source)
+            l_files.extend( [ os.path.join( s_source, os.path.relpath(s_file, s_root) ) for s_file in sorted( moduleIndex.list_files([s_root], **d_searchOptions) ) ] )
+        elif re.search(r"[*?[]", s_source):
+            # excludes are matched below the directory in front of the first wildcard
+            s_globRoot = os.path.dirname( re.split(r"[*?[]", s_source, 1)[0] ) or "."
+            l_globFiles = [ s_file for s_file in sorted(glob.glob(s_source, recursive=True)) if re_sourceFile.search(s_file) and os.path.isfile(s_file) ]
+            l_files.extend( VerilogModuleIndex.filter_excluded( l_globFiles, s_globRoot, d_searchOptions.get("l_excludes", ()) ) )
+        else:
+            l_files.append(s_source)
+    if moduleIndex:
+        moduleIndex.save()
+
+    # remove duplicates (e.g. a file matched by two patterns)
+    return list( dict.fromkeys(l_files) )
+
+
+def generate_testbench(s_fileIn, s_overwritePolicy="skip", s_outputDir="", s_author="", s_timescale="", tabwidth=4, moduleCacheSize=64, l_includeDirs=()):
+    """scans s_fileIn and writes a testbench for the found module without any user interaction
+
+    :s_fileIn: Verilog/SystemVerilog source file
+    :s_overwritePolicy: "skip" or "overwrite" (policy for existing testbench files)
+    :s_outputDir: directory the testbench is written to, defaults to the directory of s_fileIn
+    :s_author: author inserted in the testbench
+    :s_timescale: timescale of the testbench
+    :tabwidth: tabwidth used for indentation
+    :moduleCacheSize: size of the module cache in MB (0 disables it)
+    :l_includeDirs: directories searched for `include files (see VerilogFile.scan)
+    :returns: tuple (s_fileIn, status, message), status is one of "generated", "unchanged" (testbench up to date), "skipped", "failed"
+    """
+    # testbenches are no sources for new testbenches
+    if os.path.basename(s_fileIn).startswith("tb_"):
+        return (s_fileIn, "skipped", "testbench file")
+
+    # messages printed while scanning/writing are returned instead (output of parallel workers would be interleaved otherwise)
+    stdout = io.StringIO()
+    try:
+        with redirect_stdout(stdout):
+            verilogFile = VerilogModuleCache.load(moduleCacheSize, l_includeDirs).scan(s_fileIn)
+            if not verilogFile:
+                return (s_fileIn, "failed", "no module declaration found")
+
+            verilogFile.indentObj = IndentObj( tabwidth, desiredIndentation=24 )
+            verilogFile.s_author = s_author
+            verilogFile.s_timescale = s_timescale
+
+            s_fileOut = os.path.join( s_outputDir if s_outputDir else os.path.dirname(s_fileIn),
+                        "tb_" + verilogFile.verilogModule.moduleName + "." + verilogFile.language.get_fileEnding() )
+            s_status = verilogFile.write_testbenchFile(s_fileOut, s_overwritePolicy="skip" if s_overwritePolicy != "overwrite" else "overwrite")
+            if s_status == "skipped":
+                return (s_fileIn, "skipped", s_fileOut + " exists")
+            return (s_fileIn, "generated" if s_status == "written" else s_status, s_fileOut)
+
+    except (Exception, SystemExit) as e:
+        # scanning exits on syntax errors
+        s_message = stdout.getvalue().strip()
+        return (s_fileIn, "failed", s_message if s_message else str(e))
+
+
+def _generate_testbenchStar(t_args):
+    """unpacks an argument tuple for generate_testbench (used by the process pool)"""
+    return generate_testbench(*t_args)
+
+
+def generate_testbenches(l_files, s_overwritePolicy="skip", s_outputDir="", s_author="", s_timescale="", tabwidth=4, jobs=None, moduleCacheSize=64, l_includeDirs=()):
+    """generates testbenches for all l_files in parallel worker processes and prints a summary
+
+    :l_files: list of source files (see collect_sourceFiles)
+    :s_overwritePolicy: "skip" or "overwrite", "ask" is treated as "skip" (no interaction in batch mode)
+    :s_outputDir: directory all testbenches are written to, defaults to the directory of each source file
+    :s_author: author inserted in the testbenches
+    :s_timescale: timescale of the testbenches
+    :tabwidth: tabwidth used for indentation
+    :jobs: number of worker processes, defaults to the number of cores
+    :moduleCacheSize: size of the module cache in MB (0 disables it)
+    :l_includeDirs: directories searched for `include files (see VerilogFile.scan)
+    :returns: dictionary mapping status ("generated", "unchanged", "skipped", "failed") to a list of (s_fileIn, message) tuples
+    """
+    if s_outputDir:
+        os.makedirs(s_outputDir, exist_ok=True)
+    if s_overwritePolicy not in ("skip", "overwrite"):
+        s_overwritePolicy = "skip"
+
+    l_args = [ (s_file, s_overwritePolicy, s_outputDir, s_author, s_timescale, tabwidth, moduleCacheSize, l_includeDirs) for s_file in l_files ]
+    jobs = jobs if jobs else os.cpu_count()
+
+    if jobs == 1 or len(l_args) < 2:
+        l_results = [ generate_testbench(*t_args) for t_args in l_args ]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            l_results = list( executor.map( _generate_testbenchStar, l_args, chunksize=max(1, len(l_args) // (jobs * 4)) ) )
+
+    # workers added cache entries -> keep the cache within its size limit
+    VerilogModuleCache.load(moduleCacheSize).prune(b_always=True)
+
+    d_summary = { "generated": [], "unchanged": [], "skipped": [], "failed": [] }
+    for s_fileIn, s_status, s_message in l_results:
+        d_summary[s_status].append( (s_fileIn, s_message) )
+
+    #### print summary ####
+    for s_fileIn, s_message in d_summary["skipped"]:
+        print("skipped: " + s_fileIn + " (" + s_message + ")")
+    for s_fileIn, s_message in d_summary["failed"]:
+        print("failed: " + s_fileIn + " (" + s_message + ")")
+    print( "batch testbench generation: " + str(len(d_summary["generated"])) + " generated, "
+            + str(len(d_summary["unchanged"])) + " unchanged, " + str(len(d_summary["skipped"])) + " skipped, " + str(len(d_summary["failed"])) + " failed" )
+
+    return d_summary
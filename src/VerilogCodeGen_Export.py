@@ -0,0 +1,102 @@
+
+#
+# machine-readable (JSON/JSONL) export of scanned module interfaces
+#
+
+import os, io, re, json
+from contextlib import redirect_stdout, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+from VerilogModuleCache import VerilogModuleCache
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+# pattern of a port width declaration with constant bounds (-> group(1): msb, group(2): lsb)
+re_constantWidth = re.compile(r"^\s*\[\s*(\d+)\s*:\s*(\d+)\s*\]\s*$")
+
+
+def get_record(s_fileIn, verilogFile):
+    """returns the export record of a scanned module
+
+    :s_fileIn: source file of verilogFile
+    :verilogFile: scanned VerilogFile object
+    :returns: dictionary with file, module name, language, timescale, parameters (identifier, defaultValue) and ports (portType, identifier, portWidth, bits), bits is None unless the width declaration has constant bounds
+    """
+    d_module = verilogFile.verilogModule.to_dict()
+    for d_port in d_module["ports"]:
+        mo_constantWidth = re_constantWidth.match(d_port["portWidth"]) if d_port["portWidth"] else None
+        if mo_constantWidth:
+            d_port["bits"] = abs( int(mo_constantWidth.group(1)) - int(mo_constantWidth.group(2)) ) + 1
+        else:
+            d_port["bits"] = None if d_port["portWidth"] else 1
+
+    return { "file": s_fileIn, "module": d_module["moduleName"], "language": verilogFile.language.name, "timescale": verilogFile.s_timescale,
+            "parameters": d_module["parameters"], "ports": d_module["ports"] }
+
+
+def export_file(s_fileIn, moduleCacheSize=64, l_includeDirs=()):
+    """scans all modules of s_fileIn and serializes their records (see get_record)
+
+    :s_fileIn: Verilog/SystemVerilog source file
+    :moduleCacheSize: size of the module cache in MB (0 disables it)
+    :l_includeDirs: directories searched for `include files (see VerilogFile.scan)
+    :returns: tuple (string of JSON lines, one per module; error message, empty if successful)
+    """
+    # messages printed while scanning are dropped (stdout carries the records)
+    stdout = io.StringIO()
+    try:
+        with redirect_stdout(stdout):
+            moduleCache = VerilogModuleCache.load(moduleCacheSize, l_includeDirs)
+            l_modules = moduleCache.get_moduleDeclarations(s_fileIn)
+            # the first module does not need a module name (-> same cache entry as --scan and --tb)
+            l_moduleNames = [ s_moduleName if i else "" for i, (s_moduleName, offset, s_timescale) in enumerate(l_modules) ]
+
+            l_lines = []
+            for s_moduleName in l_moduleNames:
+                verilogFile = moduleCache.scan(s_fileIn, s_moduleName)
+                if verilogFile:
+                    l_lines.append( json.dumps( get_record(s_fileIn, verilogFile) ) + "\n" )
+            if not l_lines:
+                return ("", "no module declaration found")
+            return ("".join(l_lines), "")
+
+    except (Exception, SystemExit) as e:
+        # scanning exits on syntax errors
+        s_message = stdout.getvalue().strip()
+        return ("", s_message if s_message else str(e))
+
+
+def _export_fileStar(t_args):
+    """unpacks an argument tuple for export_file (used by the process pool)"""
+    return export_file(*t_args)
+
+
+def export_files(l_files, file_out, jobs=None, moduleCacheSize=64, l_includeDirs=()):
+    """streams the records of all modules in l_files to file_out as JSON lines (one record per module, in order of l_files)
+    Files are scanned in parallel worker processes, every file's records are written as soon as they arrive, so memory use does not grow with the number of modules.
+
+    :l_files: list of source files (see VerilogCodeGen_Batch.collect_sourceFiles)
+    :file_out: writable text file (e.g. sys.stdout)
+    :jobs: number of worker processes, defaults to the number of cores
+    :moduleCacheSize: size of the module cache in MB (0 disables it)
+    :l_includeDirs: directories searched for `include files (see VerilogFile.scan)
+    :returns: list of tuples (s_fileIn, error message) of all files which could not be exported
+    """
+    l_args = [ (s_file, moduleCacheSize, l_includeDirs) for s_file in l_files ]
+    jobs = jobs if jobs else os.cpu_count()
+
+    l_failed = []
+    with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 and len(l_args) > 1 else nullcontext() as executor:
+        it_results = executor.map( _export_fileStar, l_args, chunksize=max(1, len(l_args) // (jobs * 8)) ) if executor else map( _export_fileStar, l_args )
+        for s_fileIn, (s_lines, s_error) in zip(l_files, it_results):
+            if s_error:
+                l_failed.append( (s_fileIn, s_error) )
+                continue
+            with VerilogCodeGen_Stats.phase("write"):
+                file_out.write(s_lines)
+            VerilogCodeGen_Stats.count("bytesWritten", len(s_lines))
+    file_out.flush()
+
+    # workers added cache entries -> keep the cache within its size limit
+    VerilogModuleCache.load(moduleCacheSize).prune(b_always=True)
+    return l_failed
@@ -5,7 +5,8 @@
 #
 
 from enum import Enum
-import re
+import re, os, shutil
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
 
 class IndentObj:
     """ holds tabwidth and desiredIndentation to be used by all write functions to provide proper indentations and alignments """
@@ -70,23 +71,17 @@ def get_tabbedString(elements, indentObj: IndentObj):
     :returns: tabbed string as described
     """
 
-    desiredTabIndentation = get_desiredTabIndentation(indentObj)
+    tabwidth = indentObj.get_tabwidth()
+    remainingTabs = get_desiredTabIndentation(indentObj)
 
-    list_elements = list(elements)
+    # all but the last element followed by one tab, remaining tabs in front of the last element
+    # (compute remaining tab characters by subtracting the tab characters of each element from desiredTabIndentation; plain string operations -> constant cost per element)
+    s_out = ""
+    for elem in elements[:-1]:
+        remainingTabs -= len(elem) // tabwidth + 1
+        s_out += elem + "\t"
 
-    # compute remaining tab characters 
-    # (determines tab characters for each element in list_elements and subtracts them from desiredTabIndentation)
-    remainingTabs = desiredTabIndentation - sum( map( lambda elem: int( len(elem) / indentObj.get_tabwidth() ) + 1, list_elements[:-1] ) )
-    
-    # insert all but last tabs
-    for i in range (len(list_elements)-1, 0, -1):
-        list_elements.insert(i, "\t")
-
-    # insert remaining tabs
-    for i in range(remainingTabs):
-        list_elements.insert(-1, "\t")
-
-    return "".join(list_elements)
+    return s_out + "\t" * remainingTabs + elements[-1]
 
 
 def get_desiredTabIndentation(indentObj: IndentObj):
@@ -95,15 +90,71 @@ def get_desiredTabIndentation(indentObj: IndentObj):
 
     :returns: number of tab indentation as int
     """
-    return int( indentObj.get_desiredTabIndentation() / indentObj.get_tabwidth() ) 
+    return indentObj.get_desiredTabIndentation() // indentObj.get_tabwidth()
+
+
+# small helper to get a number of blank lines (optionally each starting with leading_string)
+def get_blankLines(number, leading_string=None):
+    return ((leading_string if leading_string else "") + "\n") * number
 
 
 # small helper to write blank lines to an open file
 def writeBlankLines(file_out, number, leading_string=None):
-    for i in range(number):
-        if leading_string: file_out.write(leading_string) 
-        file_out.write("\n")
+    file_out.write( get_blankLines(number, leading_string) )
+
+
+def writeFileAtomic(s_fileOut, s_content):
+    """writes s_content to s_fileOut with a single write to a temporary file in the same directory, which is then renamed to s_fileOut
+    This way, s_fileOut is either completely written or left untouched (e.g. if the process gets killed). The temporary file is synced to disk before the rename and gets the permissions of an existing s_fileOut.
+
+    :s_fileOut: output file path
+    :s_content: complete file content
+    """
+    s_dir, s_name = os.path.split(s_fileOut)
+    s_tmpFile = os.path.join(s_dir, "." + s_name + "." + str(os.getpid()) + ".tmp")
+    with VerilogCodeGen_Stats.phase("write"):
+        try:
+            with open(s_tmpFile, "w") as file_out:
+                file_out.write(s_content)
+                file_out.flush()
+                os.fsync(file_out.fileno())
+            try:
+                shutil.copymode(s_fileOut, s_tmpFile)
+            except FileNotFoundError:
+                # new file -> default permissions
+                pass
+            os.replace(s_tmpFile, s_fileOut)
+        except BaseException:
+            try:
+                os.remove(s_tmpFile)
+            except OSError:
+                pass
+            raise
+    if VerilogCodeGen_Stats.b_enabled:
+        VerilogCodeGen_Stats.count("bytesWritten", len(s_content.encode("utf-8")))
+
+
+def writeDepfile(s_depFile, l_rules):
+    """writes a make/ninja compatible dependency file (like gcc -MD -MP): one rule per generated file plus an empty rule for every prerequisite, so deleting a prerequisite (e.g. an `include file) does not break the build
+
+    :s_depFile: output file path
+    :l_rules: list of tuples (list of targets, list of prerequisites)
+    """
+    def escape(s_path):
+        return re.sub(r"([ #])", r"\\\1", s_path).replace("$", "$$")
+
+    l_out = []
+    l_prerequisites = []
+    for l_targets, l_rulePrerequisites in l_rules:
+        l_out.append( " ".join( map(escape, l_targets) ) + ":" + "".join( " \\\n  " + escape(s_path) for s_path in l_rulePrerequisites ) + "\n" )
+        l_prerequisites.extend(l_rulePrerequisites)
+    for s_path in dict.fromkeys(l_prerequisites):
+        l_out.append( "\n" + escape(s_path) + ":\n" )
+    writeFileAtomic( s_depFile, "".join(l_out) )
+
 
+# io-direction suffixes removed by removeIOSuffix
+re_ioSuffix = re.compile(r"(_i|_in|_input|_o|_out|_output)$")
 
 def removeIOSuffix(s_identifier):
     """removes suffix specifying io-direction ("_i","_o" etc.) from s_identifier
@@ -113,4 +164,4 @@ def removeIOSuffix(s_identifier):
     :returns: s_identifier without trailing io suffix
 
     """
-    return re.sub(r"(_i|_in|_input|_o|_out|_output)$", "", s_identifier)
+    return re_ioSuffix.sub("", s_identifier)
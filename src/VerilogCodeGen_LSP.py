@@ -0,0 +1,416 @@
+#
+# language server (Language Server Protocol over stdio) offering module instantiation completion
+#
+
+import os, sys, io, re, json, bisect, heapq, threading
+from contextlib import redirect_stdout
+from urllib.parse import urlparse, unquote
+
+from VerilogModule import VerilogModule
+from VerilogTokenizer import VerilogTokenizer
+from VerilogModuleIndex import VerilogModuleIndex
+from VerilogModuleCache import VerilogModuleCache
+from Verilog_codeGen_config import Verilog_codeGen_config
+from VerilogCodeGen_Helper import *
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+class VerilogCodeGen_LSP:
+    """language server for editors speaking the Language Server Protocol (JSON-RPC over stdio)
+    Completing a module name inserts the complete instantiation of the module (see VerilogModule.render_instantiation) as snippet, the instance name being the first tab stop. Ambiguous module names (several files) are offered as separate completion items, each showing its file.
+    Module names are kept in an in-memory index: all module files below the workspace root and the searchPaths (file name = module name, same as the module search) are listed once in a background thread, and the modules declared in open documents are updated from didOpen/didChange/didSave/didClose notifications. Completions thereby never touch the file system, except for scanning the (few) offered module files, which are kept in memory as well.
+    Supported messages: initialize, initialized, shutdown, exit, textDocument/didOpen, textDocument/didChange (full sync), textDocument/didSave, textDocument/didClose, textDocument/completion.
+    """
+
+    # CompletionItemKind.Module, InsertTextFormat.Snippet (see LSP specification)
+    __completionKindModule = 9
+    __insertTextFormatSnippet = 2
+    # JSON-RPC error codes
+    __errorParse = -32700
+    __errorInvalidRequest = -32600
+    __errorMethodNotFound = -32601
+    __errorInternal = -32603
+    # maximum number of completion items, the list is marked incomplete if there are more matches (-> the client asks again while typing)
+    __maxCompletions = 20
+    # identifier in front of the cursor
+    __re_prefix = re.compile(r"[A-Za-z_][\w$]*$")
+    # characters with a special meaning in snippets
+    __re_snippetEscape = re.compile(r"([\\$}])")
+
+
+    def __init__(self, file_in=None, file_out=None):
+        """
+        :file_in: binary stream the client messages are read from, defaults to stdin
+        :file_out: binary stream the server messages are written to, defaults to stdout
+        """
+        self.file_in        = file_in if file_in else sys.stdin.buffer
+        self.file_out       = file_out if file_out else sys.stdout.buffer
+        self.config         = None
+        self.moduleCache    = None
+        self.l_roots        = []
+        self.b_shutdown     = False
+        # absolute path -> text of open documents
+        self.__d_documents  = {}
+        # absolute path -> module names of files found below the roots (by file name) and of open documents (declared modules), see __find_names
+        self.__d_fileNames  = {}
+        self.__d_documentNames = {}
+        # sorted list of tuples (module name, absolute path, "") of __d_fileNames, None if it has to be rebuilt
+        self.__l_names      = None
+        # (absolute path, module name within the file) -> (mtime, size, VerilogModule) of scanned files (mtime and size None for open documents, which are scanned from their text)
+        self.__d_scannedModules = {}
+        # the index walk runs in a background thread
+        self.__lock         = threading.Lock()
+
+
+    def run(self):
+        """serves messages until the client sends exit (or closes stdin)
+
+        :returns: exit code (0 if shutdown was requested before exit)
+        """
+        while True:
+            d_message = self.__read_message()
+            if d_message is None:
+                return 1
+            if d_message.get("method") == "exit":
+                return 0 if self.b_shutdown else 1
+            self.handle_message(d_message)
+
+
+    def handle_message(self, d_message):
+        """handles a request or notification, requests are answered (everything printed while handling them is discarded, stdout carries the protocol)
+
+        :d_message: decoded JSON-RPC message
+        """
+        s_method = d_message.get("method", "")
+        d_params = d_message.get("params") or {}
+        b_request = "id" in d_message
+        handler = {
+            "initialize":               self.__initialize,
+            "shutdown":                 self.__shutdown,
+            "textDocument/didOpen":     self.__did_open,
+            "textDocument/didChange":   self.__did_change,
+            "textDocument/didSave":     self.__did_save,
+            "textDocument/didClose":    self.__did_close,
+            "textDocument/completion":  self.__completion,
+            }.get(s_method)
+
+        if not handler:
+            # unknown notifications (e.g. initialized, $/cancelRequest) are ignored
+            if b_request:
+                self.__send( { "jsonrpc": "2.0", "id": d_message["id"], "error": { "code": type(self).__errorMethodNotFound, "message": "unsupported method " + s_method } } )
+            return
+
+        try:
+            with redirect_stdout(io.StringIO()):
+                result = handler(d_params)
+        except (Exception, SystemExit) as e:
+            # scanning errors (e.g. a module header in the middle of an edit) must not stop the server
+            if b_request:
+                self.__send( { "jsonrpc": "2.0", "id": d_message["id"], "error": { "code": type(self).__errorInternal, "message": str(e) } } )
+            return
+        if b_request:
+            self.__send( { "jsonrpc": "2.0", "id": d_message["id"], "result": result } )
+
+
+    #### lifecycle ####
+
+    def __initialize(self, d_params):
+        """loads the configuration and starts listing the module files below the workspace root and the searchPaths
+        """
+        self.config = Verilog_codeGen_config.load()
+        if not self.config:
+            self.config = Verilog_codeGen_config( configFile="" )
+        self.moduleCache = VerilogModuleCache.load( self.config.moduleCacheSize, self.config.includeDirs )
+
+        l_workspaces = [ self.__get_path(d_folder["uri"]) for d_folder in d_params.get("workspaceFolders") or [] ]
+        if not l_workspaces:
+            s_rootUri = d_params.get("rootUri")
+            l_workspaces = [ self.__get_path(s_rootUri) if s_rootUri else (d_params.get("rootPath") or os.getcwd()) ]
+        self.l_roots = [ os.path.abspath(s_root) for s_root in l_workspaces + list(self.config.searchPaths) if s_root ]
+
+        threading.Thread(target=self.__build_index, daemon=True).start()
+        return { "capabilities": { "textDocumentSync": { "openClose": True, "change": 1, "save": { "includeText": False } },
+                                    "completionProvider": { "resolveProvider": False } },
+                "serverInfo": { "name": "verilog_codeGen" } }
+
+
+    def __shutdown(self, d_params):
+        self.b_shutdown = True
+        if self.moduleCache:
+            self.moduleCache.prune()
+        return None
+
+
+    def __build_index(self):
+        """lists all module files below the roots (served by the persistent VerilogModuleIndex, so a warm start only checks the directory mtimes)
+        """
+        d_searchOptions = self.config.get_searchOptions()
+        d_searchOptions.pop("b_stopAtUniqueMatch")
+        moduleIndex = VerilogModuleIndex.load()
+        l_files = moduleIndex.list_files( self.l_roots, **d_searchOptions )
+        moduleIndex.save()
+        d_fileNames = { s_file: [ re.sub(r"\.s?v$", "", os.path.basename(s_file)) ] for s_file in l_files }
+        with self.__lock:
+            # (documents saved in the meantime were added by __did_save)
+            d_fileNames.update(self.__d_fileNames)
+            self.__d_fileNames = d_fileNames
+            self.__l_names = None
+        # (sorted here, so the first completion does not have to)
+        self.__get_names()
+
+
+    #### document synchronization ####
+
+    def __did_open(self, d_params):
+        d_document = d_params["textDocument"]
+        self.__set_document( self.__get_path(d_document["uri"]), d_document["text"] )
+
+
+    def __did_change(self, d_params):
+        # full synchronization -> the last change contains the whole text
+        l_changes = d_params.get("contentChanges") or []
+        if l_changes:
+            self.__set_document( self.__get_path(d_params["textDocument"]["uri"]), l_changes[-1]["text"] )
+
+
+    def __did_save(self, d_params):
+        """a saved document below the roots is found by later module searches as well -> add it to the file names (new files)
+        """
+        s_path = self.__get_path( d_params["textDocument"]["uri"] )
+        if re.search(r"\.s?v$", s_path) and any( s_path.startswith(s_root + "/") for s_root in self.l_roots ):
+            with self.__lock:
+                if s_path not in self.__d_fileNames:
+                    s_name = re.sub(r"\.s?v$", "", os.path.basename(s_path))
+                    self.__d_fileNames[s_path] = [s_name]
+                    if self.__l_names is not None:
+                        bisect.insort( self.__l_names, (s_name, s_path, "") )
+        # (the file on disk now equals the document)
+        for t_key in [ t_key for t_key in self.__d_scannedModules if t_key[0] == s_path ]:
+            del self.__d_scannedModules[t_key]
+
+
+    def __did_close(self, d_params):
+        s_path = self.__get_path( d_params["textDocument"]["uri"] )
+        self.__d_documents.pop(s_path, None)
+        with self.__lock:
+            self.__d_documentNames.pop(s_path, None)
+        for t_key in [ t_key for t_key in self.__d_scannedModules if t_key[0] == s_path ]:
+            del self.__d_scannedModules[t_key]
+
+
+    def __set_document(self, s_path, s_text):
+        """stores the text of an open document and updates the modules it declares (only Verilog/SystemVerilog documents)
+        """
+        self.__d_documents[s_path] = s_text
+        if not re.search(r"\.s?v$", s_path):
+            return
+        # module names are found on bytes level without tokenizing the whole document (see VerilogTokenizer.find_moduleDeclarations)
+        l_names = [ s_value for s_kind, offset, s_value in VerilogTokenizer.find_moduleDeclarations( s_text.encode("utf-8") ) if s_kind == "module" ]
+        with self.__lock:
+            self.__d_documentNames[s_path] = l_names
+        # the interfaces of the document are rescanned from its new text on demand
+        for t_key in [ t_key for t_key in self.__d_scannedModules if t_key[0] == s_path ]:
+            del self.__d_scannedModules[t_key]
+
+
+    #### completion ####
+
+    def __completion(self, d_params):
+        """completes the module name in front of the cursor, every item inserts the instantiation of its module
+
+        :returns: CompletionList
+        """
+        with VerilogCodeGen_Stats.phase("complete"):
+            s_text = self.__d_documents.get( self.__get_path(d_params["textDocument"]["uri"]), "" )
+            line = d_params["position"]["line"]
+            character = d_params["position"]["character"]
+            l_lines = s_text.split("\n", line + 1)
+            s_line = l_lines[line] if line < len(l_lines) else ""
+            mo_prefix = type(self).__re_prefix.search( s_line[:character] )
+            s_prefix = mo_prefix.group(0) if mo_prefix else ""
+
+            l_matches, b_incomplete = self.__find_names(s_prefix)
+            tabwidth = self.config.tabwidth if self.config and self.config.tabwidth else 4
+            indentObj = IndentObj( tabwidth, desiredIndentation=24 )
+            d_range = { "start": { "line": line, "character": character - len(s_prefix) }, "end": { "line": line, "character": character } }
+
+            l_items = []
+            for s_name, s_path, s_moduleInFile in l_matches:
+                verilogModule = self.__get_module(s_path, s_moduleInFile)
+                if not verilogModule:
+                    continue
+                l_items.append( { "label": s_name, "kind": type(self).__completionKindModule, "detail": s_path,
+                                    # (sorted like the candidates, not by the client's own ranking of the labels)
+                                    "sortText": str(len(l_items)).zfill(4), "filterText": s_name,
+                                    "insertTextFormat": type(self).__insertTextFormatSnippet,
+                                    "textEdit": { "range": d_range, "newText": self.__render_snippet(verilogModule, indentObj) } } )
+        return { "isIncomplete": b_incomplete, "items": l_items }
+
+
+    def __find_names(self, s_prefix):
+        """finds the module names starting with s_prefix (then names containing it, ignoring case)
+
+        :returns: tuple (list of tuples (module name, absolute path, module name within the file), True if there are more matches than returned)
+        """
+        maxCompletions = type(self).__maxCompletions
+        l_names = self.__get_names()
+        # the (few) modules of open documents are merged in at every request, so editing a document never re-sorts all names
+        with self.__lock:
+            d_documentNames = dict(self.__d_documentNames)
+        l_documentNames = sorted( (s_name, s_path, s_name) for s_path, l_moduleNames in d_documentNames.items() for s_name in l_moduleNames )
+
+        l_matches = []
+        t_prefix = (s_prefix,)
+        for t_name in heapq.merge( l_documentNames[ bisect.bisect_left(l_documentNames, t_prefix): ],
+                                    ( l_names[i_name] for i_name in range( bisect.bisect_left(l_names, t_prefix), len(l_names) ) ) ):
+            if not t_name[0].startswith(s_prefix):
+                break
+            # (documents override the file names of their path)
+            if not t_name[2] and t_name[1] in d_documentNames:
+                continue
+            if len(l_matches) == maxCompletions:
+                return (self.__rank_matches(l_matches), True)
+            l_matches.append(t_name)
+
+        if s_prefix:
+            s_lowerPrefix = s_prefix.lower()
+            s_matched = set(l_matches)
+            for t_name in l_documentNames + l_names:
+                if s_lowerPrefix in t_name[0].lower() and t_name not in s_matched and (t_name[2] or t_name[1] not in d_documentNames):
+                    if len(l_matches) == maxCompletions:
+                        return (self.__rank_matches(l_matches), True)
+                    l_matches.append(t_name)
+        return (self.__rank_matches(l_matches), False)
+
+
+    def __rank_matches(self, l_matches):
+        """orders the matches of the same module name by their files (see VerilogModuleIndex.rank_files), so the file the module instantiation (--modInst) selects is offered first
+
+        :l_matches: list of tuples (module name, absolute path, module name within the file), sorted by module name
+        :returns: list of tuples
+        """
+        d_groups = {}
+        for t_name in l_matches:
+            d_groups.setdefault(t_name[0], []).append(t_name)
+        l_ranked = []
+        for l_group in d_groups.values():
+            if len(l_group) > 1:
+                d_ranks = { s_path: i_rank for i_rank, s_path in enumerate( VerilogModuleIndex.rank_files( { t_name[1] for t_name in l_group }, self.l_roots ) ) }
+                l_group.sort( key=lambda t_name: d_ranks[t_name[1]] )
+            l_ranked.extend(l_group)
+        return l_ranked
+
+
+    def __get_names(self):
+        """returns the sorted module names of all files below the roots, rebuilt after the listing changed
+
+        :returns: list of tuples (module name, absolute path, "" (-> first module of the file))
+        """
+        with self.__lock:
+            if self.__l_names is None:
+                self.__l_names = sorted( (s_name, s_path, "") for s_path, l_names in self.__d_fileNames.items() for s_name in l_names )
+            return self.__l_names
+
+
+    def __get_module(self, s_path, s_moduleInFile):
+        """returns the scanned module, open documents are scanned from their text (see VerilogModule.scan), all other files through the module cache
+
+        :s_path: absolute path of the module file
+        :s_moduleInFile: module name within the file, "" for the first module
+        :returns: VerilogModule object, None if the module can not be scanned
+        """
+        t_key = (s_path, s_moduleInFile)
+        if s_path in self.__d_documents:
+            if t_key not in self.__d_scannedModules:
+                self.__d_scannedModules[t_key] = (None, None, self.__scan_document(self.__d_documents[s_path], s_moduleInFile))
+            return self.__d_scannedModules[t_key][2]
+
+        try:
+            stat = os.stat(s_path)
+        except OSError:
+            return None
+        t_cached = self.__d_scannedModules.get(t_key)
+        if t_cached and t_cached[0] == stat.st_mtime_ns and t_cached[1] == stat.st_size:
+            return t_cached[2]
+        try:
+            verilogFile = self.moduleCache.scan(s_path, s_moduleInFile)
+        except (Exception, SystemExit):
+            # syntax error -> not offered until the file changes
+            verilogFile = None
+        verilogModule = verilogFile.verilogModule if verilogFile else None
+        self.__d_scannedModules[t_key] = (stat.st_mtime_ns, stat.st_size, verilogModule)
+        return verilogModule
+
+
+    @staticmethod
+    def __scan_document(s_text, s_moduleInFile):
+        """scans a module of an open document from its text (macros of unsaved documents are not expanded)
+
+        :s_moduleInFile: module name, "" for the first module
+        :returns: VerilogModule object, None if the module can not be scanned (e.g. header in the middle of an edit)
+        """
+        b_text = s_text.encode("utf-8")
+        for s_kind, offset, s_value in VerilogTokenizer.find_moduleDeclarations(b_text):
+            if s_kind == "module" and (s_value == s_moduleInFile or not s_moduleInFile):
+                try:
+                    return VerilogModule.scan( [ b_text[offset:].decode("utf-8", "replace") ] )
+                except (Exception, SystemExit):
+                    return None
+        return None
+
+
+    @classmethod
+    def __render_snippet(cls, verilogModule, indentObj):
+        """renders the instantiation of verilogModule as snippet, the instance name is the first tab stop
+
+        :returns: string
+        """
+        s_snippet = cls.__re_snippetEscape.sub( r"\\\1", verilogModule.render_instantiation(indentObj) )
+        s_instanceName = cls.__re_snippetEscape.sub( r"\\\1", "mod_" + verilogModule.moduleName )
+        s_snippet = s_snippet.replace( " " + s_instanceName + " (", " ${1:" + s_instanceName + "} (", 1 )
+        return s_snippet + "$0"
+
+
+    #### protocol ####
+
+    def __read_message(self):
+        """reads one message (header with Content-Length, JSON body)
+
+        :returns: decoded message, None at the end of the input, an empty dictionary for a malformed message (answered with a JSON-RPC error)
+        """
+        contentLength = None
+        try:
+            while True:
+                b_line = self.file_in.readline()
+                if not b_line:
+                    return None
+                b_line = b_line.strip()
+                if not b_line:
+                    break
+                s_key, _, s_value = b_line.decode("ascii").partition(":")
+                if s_key.strip().lower() == "content-length":
+                    contentLength = int(s_value)
+            if contentLength is None:
+                return {}
+            d_message = json.loads( self.file_in.read(contentLength).decode("utf-8") )
+        except ValueError as e:
+            # (a malformed message must not stop the server)
+            self.__send( { "jsonrpc": "2.0", "id": None, "error": { "code": type(self).__errorParse, "message": str(e) } } )
+            return {}
+        if not isinstance(d_message, dict):
+            self.__send( { "jsonrpc": "2.0", "id": None, "error": { "code": type(self).__errorInvalidRequest, "message": "message is no JSON object" } } )
+            return {}
+        return d_message
+
+
+    def __send(self, d_message):
+        b_body = json.dumps(d_message).encode("utf-8")
+        self.file_out.write( b"Content-Length: " + str(len(b_body)).encode("ascii") + b"\r\n\r\n" + b_body )
+        self.file_out.flush()
+
+
+    @staticmethod
+    def __get_path(s_uri):
+        """converts a file uri to an absolute path
+        """
+        return os.path.abspath( unquote( urlparse(s_uri).path ) )
@@ -0,0 +1,270 @@
+
+#
+# resident server mode for verilog code generator
+# (keeps config, module index and scanned files in memory, requests are answered via a unix socket)
+#
+
+import os, sys, io, re, copy, json, socket, socketserver
+from contextlib import redirect_stdout
+
+from VerilogModuleIndex import VerilogModuleIndex
+from VerilogModuleCache import VerilogModuleCache
+from Verilog_codeGen_config import Verilog_codeGen_config
+from VerilogCodeGen_Helper import *
+from VerilogCodeGen_Socket import get_socketPath, check_socket
+
+
+class VerilogCodeGen_Server(socketserver.UnixStreamServer):
+    """resident verilog_codeGen process answering module instantiation, testbench and scan requests
+
+    Each request is a single line containing a json object:
+        { "action": "modInst"/"tb"/"scan"/"complete"/"shutdown", "cwd": <client working directory>, "name": <module/file name>,
+          "file": <selected module file (modInst only, optional)>, "tabwidth": <int>, "author": <string>, "timescale": <string>, "overwrite": <bool>,
+          "module": <module name within the file (optional)> }
+    The answer is a single json line { "exitCode": <int>, "stdout": <string> } (+ "selected": <instantiated file>, "alternatives": <other matching files, best ranked first> for modInst).
+    Requests are handled one after another, so the cached objects need no locking.
+    """
+
+    def __init__(self, s_socketPath=None):
+        """
+        :s_socketPath: socket to listen on, defaults to get_socketPath()
+        """
+        self.s_socketPath   = s_socketPath if s_socketPath else get_socketPath()
+        self.config         = None
+        self.configMtime    = None
+        self.moduleIndex    = VerilogModuleIndex.load()
+        # (absolute file path, module name) -> (mtime, size, scanned VerilogFile object)
+        self.d_scannedFiles = {}
+        # persistent cache behind d_scannedFiles (set up with the config)
+        self.moduleCache    = None
+        self.b_shutdown     = False
+
+        self.__remove_staleSocket()
+        super().__init__(self.s_socketPath, _VerilogCodeGen_RequestHandler)
+
+
+    def server_bind(self):
+        """binds the socket with mode 0600, so at no time other users can connect to it
+        """
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+
+    def __remove_staleSocket(self):
+        """removes a socket left over by a server which was not shut down properly, exits if another server is running
+        """
+        if not os.path.lexists(self.s_socketPath):
+            return
+        if not check_socket(self.s_socketPath):
+            print(self.s_socketPath + " exists, but is no socket of the current user! Exiting...")
+            sys.exit(1)
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.s_socketPath)
+            print("A server is already listening on " + self.s_socketPath + "! Exiting...")
+            sys.exit(1)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(self.s_socketPath)
+
+
+    def run(self):
+        """serves requests until a shutdown request arrives or the process is interrupted
+        """
+        print("verilog_codeGen server listening on " + self.s_socketPath)
+        try:
+            while not self.b_shutdown:
+                self.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.moduleIndex.save()
+            if self.moduleCache:
+                self.moduleCache.prune()
+            self.server_close()
+            try:
+                os.remove(self.s_socketPath)
+            except OSError:
+                pass
+            print("verilog_codeGen server stopped")
+
+
+    def get_config(self):
+        """returns the configuration, the config file is only reloaded if it changed since the last request
+        """
+        try:
+            configMtime = os.stat(self.config.get_configFile()).st_mtime_ns if self.config and self.config.get_configFile() else None
+        except OSError:
+            configMtime = None
+
+        if not self.config or configMtime != self.configMtime:
+            self.config = Verilog_codeGen_config.load()
+            if not self.config:
+                self.config = Verilog_codeGen_config( configFile="" )
+            try:
+                self.configMtime = os.stat(self.config.get_configFile()).st_mtime_ns if self.config.get_configFile() else None
+            except OSError:
+                self.configMtime = None
+            self.moduleCache = VerilogModuleCache.load( self.config.moduleCacheSize, self.config.includeDirs )
+            # scan results may depend on the include directories
+            self.d_scannedFiles = {}
+
+        return self.config
+
+
+    def get_scannedFile(self, s_fileIn, moduleName=""):
+        """returns the VerilogFile for s_fileIn, the file is only scanned again if its mtime or size (or an `include file its macros were expanded from) changed
+
+        :s_fileIn: absolute path of the Verilog/SystemVerilog file
+        :moduleName: module to be scanned in files containing several modules, if empty the first one
+        :returns: VerilogFile object, None if scanning failed
+        """
+        stat = os.stat(s_fileIn)
+        t_cached = self.d_scannedFiles.get( (s_fileIn, moduleName) )
+        if t_cached and t_cached[0] == stat.st_mtime_ns and t_cached[1] == stat.st_size and self.__check_includes(t_cached[2]):
+            return t_cached[2]
+
+        verilogFile = self.moduleCache.scan(s_fileIn, moduleName)
+        if verilogFile:
+            self.d_scannedFiles[ (s_fileIn, moduleName) ] = (stat.st_mtime_ns, stat.st_size, verilogFile)
+        return verilogFile
+
+
+    @staticmethod
+    def __check_includes(verilogFile):
+        """checks whether the `include files verilogFile's macros were expanded from are unchanged
+        """
+        for s_path, mtime in verilogFile.l_includes:
+            try:
+                if os.stat(s_path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+
+    def handle_action(self, d_request):
+        """performs the requested action, everything printed while doing so is returned to the client
+
+        :d_request: decoded request (see class description)
+        :returns: response dictionary
+        """
+        d_response = { "exitCode": 0 }
+        s_action = d_request.get("action")
+
+        if s_action == "shutdown":
+            self.b_shutdown = True
+            d_response["stdout"] = "verilog_codeGen server shutting down\n"
+            return d_response
+
+        config = self.get_config()
+        tabwidth = int(d_request["tabwidth"]) if d_request.get("tabwidth") else (config.tabwidth if config.tabwidth else 4)
+        indentObj = IndentObj( tabwidth, desiredIndentation=24 )
+        s_name = d_request.get("name", "")
+        # file name for testbench generation/scanning, same as in verilog_codeGen.py (SystemVerilog if a .sv file exists)
+        if re.search(r"\.(v|sv)$", s_name):
+            s_fileName = s_name
+        else:
+            s_fileName = s_name + (".sv" if os.path.isfile(os.path.join(d_request.get("cwd", "/"), s_name + ".sv")) else ".v")
+
+        stdout = io.StringIO()
+        try:
+            os.chdir(d_request.get("cwd", "/"))
+            with redirect_stdout(stdout):
+
+                #### module instantiation ####
+                if s_action == "modInst":
+                    if d_request.get("file"):
+                        l_foundModules = [ d_request["file"] ]
+                    elif "/" in s_name and os.path.isfile(s_name):
+                        # explicit file path (e.g. one of the alternatives)
+                        l_foundModules = [ os.path.abspath(s_name) ]
+                    else:
+                        l_foundModules = self.moduleIndex.find( s_name, [os.getcwd()] + list(config.searchPaths), **config.get_searchOptions() )
+                        self.moduleIndex.save()
+
+                    if not l_foundModules:
+                        print("No modules found for module name '" + s_name + "'!")
+                        d_response["exitCode"] = 1
+                    else:
+                        # best ranked file (see VerilogModuleIndex.rank_files)
+                        d_response["selected"] = l_foundModules[0]
+                        d_response["alternatives"] = l_foundModules[1:]
+                        verilogFile = self.get_scannedFile( os.path.abspath(l_foundModules[0]), d_request.get("module", "") )
+                        if verilogFile:
+                            sys.stdout.write( verilogFile.verilogModule.render_instantiation(indentObj) )
+                        else:
+                            print("No module declaration found in " + l_foundModules[0] + "!")
+                            d_response["exitCode"] = 1
+
+                #### testbench generation ####
+                elif s_action == "tb":
+                    verilogFile = self.get_scannedFile( os.path.abspath(s_fileName), d_request.get("module", "") )
+                    if verilogFile:
+                        # per-request output options go to a copy, the cached object keeps the scanned values for later requests
+                        verilogFile = copy.copy(verilogFile)
+                        verilogFile.indentObj = indentObj
+                        verilogFile.s_author = d_request["author"] if d_request.get("author") else config.author
+                        verilogFile.s_timescale = d_request.get("timescale", "")
+                        s_fileOut = "tb_" + verilogFile.verilogModule.moduleName + "." + verilogFile.language.get_fileEnding()
+                        # same up-to-date check as verilog_codeGen --tb, an existing file which would change is only reported (overwrite query is up to the client)
+                        writeOutput = io.StringIO()
+                        with redirect_stdout(writeOutput):
+                            s_status = verilogFile.write_testbenchFile( s_fileOut, s_overwritePolicy="overwrite" if d_request.get("overwrite") else "skip" )
+                        if s_status == "skipped":
+                            d_response["exists"] = s_fileOut
+                            d_response["exitCode"] = 2
+                        else:
+                            print("writing testbench file...")
+                            sys.stdout.write( writeOutput.getvalue() )
+                            print("code generation done")
+                    else:
+                        d_response["exitCode"] = 1
+
+                #### module name completion ####
+                elif s_action == "complete":
+                    d_searchOptions = config.get_searchOptions()
+                    d_searchOptions.pop("b_stopAtUniqueMatch")
+                    l_similar = self.moduleIndex.find_similar( s_name, [os.getcwd()] + list(config.searchPaths), **d_searchOptions )
+                    self.moduleIndex.save()
+                    for s_similarName, l_files in l_similar:
+                        print(s_similarName)
+                    if not l_similar:
+                        d_response["exitCode"] = 1
+
+                #### scan ####
+                elif s_action == "scan":
+                    verilogFile = self.get_scannedFile( os.path.abspath(s_fileName), d_request.get("module", "") )
+                    if verilogFile:
+                        print(verilogFile)
+                    else:
+                        print("No module declaration found in " + s_fileName + "!")
+                        d_response["exitCode"] = 1
+
+                else:
+                    print("Unknown action '" + str(s_action) + "'!")
+                    d_response["exitCode"] = 1
+
+        except (Exception, SystemExit) as e:
+            # scanning errors must not stop the server
+            stdout.write("Error while handling request: " + str(e) + "\n")
+            d_response["exitCode"] = 1
+
+        d_response["stdout"] = stdout.getvalue()
+        return d_response
+
+
+class _VerilogCodeGen_RequestHandler(socketserver.StreamRequestHandler):
+    """reads one json request line and answers with one json response line"""
+
+    def handle(self):
+        try:
+            d_request = json.loads( self.rfile.readline().decode("utf-8") )
+        except ValueError:
+            d_response = { "exitCode": 1, "stdout": "Invalid request!\n" }
+        else:
+            d_response = self.server.handle_action(d_request)
+        self.wfile.write( (json.dumps(d_response) + "\n").encode("utf-8") )
@@ -0,0 +1,52 @@
+
+#
+# unix socket shared by the resident server and its client
+# (standard library only, the client imports this module without the rest of verilog_codeGen)
+#
+
+import os, stat, json, socket
+
+
+def get_socketPath():
+    """socket used for server/client communication: $XDG_RUNTIME_DIR/verilog_codeGen.sock, /tmp/verilog_codeGen-<uid>.sock if $XDG_RUNTIME_DIR is not set
+
+    :returns: socket path as string
+    """
+    s_runtimeDir = os.getenv("XDG_RUNTIME_DIR")
+    if s_runtimeDir:
+        return s_runtimeDir + "/verilog_codeGen.sock"
+    else:
+        return "/tmp/verilog_codeGen-" + str(os.getuid()) + ".sock"
+
+
+def check_socket(s_socketPath):
+    """checks whether s_socketPath is a socket owned by the current user
+    In a shared directory like /tmp, another user could create the socket first to receive the requests (source paths) or to answer them with arbitrary code.
+
+    :returns: bool
+    """
+    try:
+        socketStat = os.lstat(s_socketPath)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(socketStat.st_mode) and socketStat.st_uid == os.getuid()
+
+
+def send_request(d_request, s_socketPath=None):
+    """sends a request to a running server
+
+    :d_request: request dictionary (see VerilogCodeGen_Server)
+    :s_socketPath: server socket, defaults to get_socketPath()
+    :returns: response dictionary, None if no server is reachable (or the socket is not owned by the current user, see check_socket)
+    """
+    s_socketPath = s_socketPath if s_socketPath else get_socketPath()
+    if not check_socket(s_socketPath):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(s_socketPath)
+            sock.sendall( (json.dumps(d_request) + "\n").encode("utf-8") )
+            with sock.makefile("rb") as file_in:
+                return json.loads( file_in.readline().decode("utf-8") )
+    except (OSError, ValueError):
+        return None
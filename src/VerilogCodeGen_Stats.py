@@ -0,0 +1,79 @@
+
+#
+# opt-in instrumentation (per-phase timings and counters) for verilog_codeGen --stats
+#
+
+import sys, json, time
+from contextlib import contextmanager
+
+
+class VerilogCodeGen_Stats:
+    """process-wide collection of per-phase wall times and counters
+    Collection is disabled by default; while disabled, count() is a single attribute check and phase() only measures the time (no dictionary updates), so instrumented code stays as fast as before.
+    Counters used by verilog_codeGen:
+        directoriesVisited, directoriesRead (listing not served by the module index), filesMatched (module search results),
+        filesScanned (actually parsed), filesChanged (new or changed files found by --watch), cacheHits (served by the module cache), macroFilesParsed (files parsed for `define/`include directives), linesRead, regexEvaluations, bytesWritten
+    """
+
+    b_enabled   = False
+    d_counters  = {}
+    # phase name -> accumulated wall time in seconds
+    d_phases    = {}
+    startTime   = time.perf_counter()
+
+
+    @classmethod
+    def enable(cls):
+        """enables collection and resets all timings and counters
+        """
+        cls.b_enabled   = True
+        cls.d_counters  = {}
+        cls.d_phases    = {}
+        cls.startTime   = time.perf_counter()
+
+
+    @classmethod
+    def count(cls, s_counter, value=1):
+        """adds value to counter s_counter (if enabled)
+        """
+        if cls.b_enabled:
+            cls.d_counters[s_counter] = cls.d_counters.get(s_counter, 0) + value
+
+
+    @classmethod
+    @contextmanager
+    def phase(cls, s_phase):
+        """context manager measuring the wall time of a phase, the time of nested or repeated phases with the same name is accumulated
+        example:
+            with VerilogCodeGen_Stats.phase("scan"):
+                ...
+        """
+        if not cls.b_enabled:
+            yield
+            return
+
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.d_phases[s_phase] = cls.d_phases.get(s_phase, 0.0) + time.perf_counter() - startTime
+
+
+    @classmethod
+    def to_dict(cls):
+        """returns all timings (in ms) and counters
+
+        :returns: dictionary with total wall time, phases and counters
+        """
+        return { "total_ms": (time.perf_counter() - cls.startTime) * 1000,
+                "phases_ms": { s_phase: seconds * 1000 for s_phase, seconds in cls.d_phases.items() },
+                "counters": dict(cls.d_counters) }
+
+
+    @classmethod
+    def dump(cls, file_out=None):
+        """writes the collected statistics as one JSON line to file_out (default: stderr, so stdout stays usable, e.g. for --modInst)
+        """
+        file_out = file_out if file_out else sys.stderr
+        file_out.write( json.dumps(cls.to_dict()) + "\n" )
+        file_out.flush()
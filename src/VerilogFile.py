@@ -1,16 +1,31 @@
 
 from time import localtime, strftime
-import re
+import re, os, mmap, json, hashlib
+from contextlib import nullcontext
+from functools import partial
 
 from VerilogModule import VerilogModule
+from VerilogTokenizer import VerilogTokenizer
+from VerilogPreprocessor import VerilogPreprocessor
 from VerilogCodeGen_Helper import *
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+from Verilog_codeGen_config import Verilog_codeGen_config
 
 
 class VerilogFile():
 
     """represents a Verilog file"""
 
-    def __init__(self, verilogModule: VerilogModule, s_timescale="", s_author="", s_creationDate="", includeGuards: bool=False, indentObj: IndentObj=IndentObj(tabwidth=4, desiredIndentation=24), language: HDL_Enum=HDL_Enum.VERILOG ):
+    # files of at least this size (in bytes) are memory-mapped for scanning instead of being read
+    __mmapThreshold = 1024 * 1024
+    # name of the directory inside Verilog_codeGen_config.get_cacheDir() holding the fingerprints of generated files
+    __s_fingerprintDirName = "fingerprints"
+    # version of the rendered output, part of every fingerprint (-> increase whenever a render method changes its output, so existing files are regenerated)
+    __renderVersion = 1
+    # pattern of clock inputs, which get a clock generator in the testbench
+    __re_clk = re.compile(r"(clk|CLK|clock|Clock)")
+
+    def __init__(self, verilogModule: VerilogModule, s_timescale="", s_author="", s_creationDate="", includeGuards: bool=False, indentObj: IndentObj=IndentObj(tabwidth=4, desiredIndentation=24), language: HDL_Enum=HDL_Enum.VERILOG, l_includes=None ):
          
         self.verilogModule  = verilogModule
         self.s_timescale    = s_timescale
@@ -19,6 +34,8 @@ class VerilogFile():
         self.indentObj      = indentObj
         self.language       = language
         self.s_creationDate = s_creationDate if s_creationDate else strftime("%Y-%m-%d", localtime())
+        # headers the module's macros were expanded from, as [absolute path, mtime in ns] (-> cached scans depend on them)
+        self.l_includes     = l_includes if l_includes else []
 
 
     def __str__(self):
@@ -33,96 +50,202 @@ class VerilogFile():
         return "".join( l_print )
 
 
+    def to_dict(self):
+        """serializes the scanned file properties (e.g. for caching or json export)
+
+        :returns: dictionary with module (see VerilogModule.to_dict), timescale, language and included headers
+        """
+        return { "module": self.verilogModule.to_dict(), "timescale": self.s_timescale, "language": self.language.name, "includes": self.l_includes }
+
+
+    @property
+    def l_includes(self):
+        """headers the module's macros were expanded from, as [absolute path, mtime in ns] (a lazy module gets parsed, see scan_moduleAt)
+        """
+        self.verilogModule.load()
+        return self.__l_includes
+
+
+    @l_includes.setter
+    def l_includes(self, l_includes):
+        self.__l_includes = l_includes
+
+
+    def get_includeFiles(self):
+        """returns the `include files the scanned module header depends on (see VerilogPreprocessor.get_includes)
+
+        :returns: list of absolute paths
+        """
+        return [ s_path for s_path, mtime in self.l_includes ]
+
+
+    @classmethod
+    def fromDict(cls, d_file):
+        """creates a VerilogFile from a dictionary as returned by to_dict
+        """
+        return cls( verilogModule=VerilogModule.fromDict(d_file["module"]), s_timescale=d_file["timescale"], language=HDL_Enum[d_file["language"]], l_includes=d_file.get("includes") )
+
+
     @classmethod
-    def scan(cls, s_fileIn):
+    def scan(cls, s_fileIn, moduleName="", l_includeDirs=()):
         """scan s_fileIn for a Verilog module declaration and file properties (timescale, language).
         As I assume that scanning a file will be used to generate a testbench or a module instantiation, the method does not scan for the properties s_author and includeGuards (same with VerilogModule.outputReg). They are not practical to match and not needed in those applications.
+        The file is memory-mapped and searched for the module declaration on bytes level (see VerilogTokenizer.find_moduleDeclarations) in a single pass, only the module header gets decoded. Thereby, even netlists of several hundred MB are scanned with constant memory use. The timescale is the one of the last `timescale directive in front of the module.
 
         :s_fileIn: string representing Verilog/Systemverilog source file to be scanned (gets opened)
+        :moduleName: module to be scanned in files containing several modules (located by scan_moduleDeclarations), if empty the first module declaration is scanned
+        :l_includeDirs: directories searched for `include files, needed if the header uses macros from headers which are not next to s_fileIn
         :returns: VerilogFile object if successful, otherwise None
         """
         # determine language from file ending (or exit if no known ending)
-        mo_fileEnding = re.search(r"\.(v|sv)$", s_fileIn)
-        if mo_fileEnding:
-            s_fileEnding = mo_fileEnding.group(1) 
-#             if s_fileEnding == "v":
-            if s_fileEnding == HDL_Enum.VERILOG.get_fileEnding():
-                language = HDL_Enum.VERILOG
-            else:
-                language = HDL_Enum.SYSTEMVERILOG
-        else:
+        language = cls.__get_language(s_fileIn)
+        if not language:
             print("no valid input file ending!")
             return None
 
-        # regular expression to match timescale definition
-        __re_timescaleDefintion = r"\s*`timescale\s*(\w+\s*/\s*\w+)"
+        if moduleName:
+            for s_moduleName, offset, s_timescale in cls.scan_moduleDeclarations(s_fileIn):
+                if s_moduleName == moduleName:
+                    return cls.scan_moduleAt(s_fileIn, offset, s_timescale, l_includeDirs)
+            return None
 
-        with open(s_fileIn, "r") as file_in: 
-            # scan for module declaration 
-            verilogModule = VerilogModule.scan( file_in )
+        VerilogCodeGen_Stats.count("filesScanned")
+        with open(s_fileIn, "rb") as file_in, cls.__map_file(file_in) as buffer:
+            s_timescale = ""
+            for s_kind, offset, s_value in VerilogTokenizer.find_moduleDeclarations(buffer):
+                if s_kind == "`timescale":
+                    s_timescale = s_value
+                    continue
+
+                # first module declaration -> decode and parse only its header
+                verilogModule, l_includes = cls.__scan_header(s_fileIn, buffer, offset, l_includeDirs)
+                if verilogModule:
+                    return cls( verilogModule=verilogModule, s_timescale=s_timescale, language=language, l_includes=l_includes)
+                return None
 
-            # if module declaration found, rescan file for timescale definition, else return None
-            if verilogModule:
-                # reset read pointer
-                file_in.seek(0)
+        # end of file reached without module declaration
+        return None
 
-                currentLine = file_in.readline()
-                while currentLine:
 
-                    matchObj = re.match( __re_timescaleDefintion , currentLine)
-                    if  matchObj:
-                        # remove whitespaces from identified timescale string
-                        s_timescale = (matchObj.group(1)).replace(" ","")
-                        return cls( verilogModule=verilogModule, s_timescale=s_timescale, language=language)
-                    else:
-                        currentLine = file_in.readline()
+    @classmethod
+    def scan_moduleDeclarations(cls, s_fileIn):
+        """finds all module declarations of s_fileIn in a single pass (e.g. for simulation libraries or netlists containing thousands of modules), without parsing their headers
 
-                # return VerilogFile object without timescale definition
-                return cls( verilogModule=verilogModule, language=language)
+        :s_fileIn: Verilog/SystemVerilog source file
+        :returns: list of tuples (module name, byte offset of the declaration, timescale in effect), in file order; the timescale is the one of the last preceding `timescale directive (same as scan)
+        """
+        l_modules = []
+        s_timescale = ""
+        with open(s_fileIn, "rb") as file_in, cls.__map_file(file_in) as buffer:
+            for s_kind, offset, s_value in VerilogTokenizer.find_moduleDeclarations(buffer):
+                if s_kind == "module":
+                    l_modules.append( (s_value, offset, s_timescale) )
+                else:
+                    s_timescale = s_value
 
-            else:
-                return None
+        return l_modules
 
 
-    def write_moduleFile(self, s_fileOut=""):
-        """writes a complete code body to the specified output file
+    @classmethod
+    def scan_moduleAt(cls, s_fileIn, offset, s_timescale="", l_includeDirs=(), moduleName=""):
+        """scans only the module declaration starting at byte offset (as returned by scan_moduleDeclarations) 
+        If moduleName is given, the header is not parsed right away: the returned file holds a lazy module (see VerilogModule.lazy), which parses the header at offset once its ports, parameters or included headers are accessed.
+
+        :s_fileIn: Verilog/SystemVerilog source file
+        :offset: byte offset of the module keyword
+        :s_timescale: timescale in effect for the module
+        :l_includeDirs: directories searched for `include files (see scan)
+        :moduleName: declared name of the module (as returned by scan_moduleDeclarations), creates a lazy module if not empty
+        :returns: VerilogFile object if successful, otherwise None
+        """
+        language = cls.__get_language(s_fileIn)
+        if not language:
+            print("no valid input file ending!")
+            return None
 
-        :s_fileOut: string identifying output file; if empty, s_fileOut will be set to <verilogModule.moduleName>.v/sv depending on self.language
+        if moduleName:
+            verilogFile = cls( verilogModule=None, s_timescale=s_timescale, language=language )
+            verilogFile.verilogModule = VerilogModule.lazy( moduleName, partial(verilogFile.__load_module, s_fileIn, offset, l_includeDirs) )
+            return verilogFile
+
+        VerilogCodeGen_Stats.count("filesScanned")
+        with open(s_fileIn, "rb") as file_in, cls.__map_file(file_in) as buffer:
+            # jump straight to the module header
+            verilogModule, l_includes = cls.__scan_header(s_fileIn, buffer, offset, l_includeDirs)
+
+        if verilogModule:
+            return cls( verilogModule=verilogModule, s_timescale=s_timescale, language=language, l_includes=l_includes)
+        else:
+            return None
+
+
+    def __load_module(self, s_fileIn, offset, l_includeDirs):
+        """parses the module header of a lazy module (see scan_moduleAt), the included headers are recorded on the way
+
+        :returns: VerilogModule object or None
         """
-        # determine s_fileOut if not passed
-        if not s_fileOut:
-            s_fileOut = self.verilogModule.moduleName + "." + self.language.get_fileEnding()
+        VerilogCodeGen_Stats.count("filesScanned")
+        with open(s_fileIn, "rb") as file_in, type(self).__map_file(file_in) as buffer:
+            verilogModule, self.__l_includes = self.__scan_header(s_fileIn, buffer, offset, l_includeDirs)
+        return verilogModule
 
-        # check for file existance
-        try:
-            with open(s_fileOut, "r") as file_out:
-                # file exists -> query for overwriting
-                overwrite = input("File " + s_fileOut + " exists! Are you sure you want to overwrite it? [y/n]")
-
-                if overwrite == 'y':
-                    print("File " + s_fileOut + " will be overwritten...")
-                else :
-                    print("File " + s_fileOut + " will not be overwritten. Exiting...")
-                    return None
-        except FileNotFoundError: 
-            pass
 
-        ##############################
-        #### write to output file ####
-        ##############################
-        with open(s_fileOut, "w") as file_out:
-                        
-            #### timescale ####
-            self.write_timescale(file_out)
-            writeBlankLines(file_out, 1)
-
-            #### include guards ####
-            if self.includeGuards:
-                self.verilogModule.write_includeGuards(file_out, "top")
-                writeBlankLines(file_out, 1)
-
-            #### file description commentary ####
-            file_out.write("""/*
+    @staticmethod
+    def __scan_header(s_fileIn, buffer, offset, l_includeDirs):
+        """parses the module header at offset in the (mapped) file, macros are expanded with the directives in front of it
+
+        :returns: tuple (VerilogModule object or None, included headers the expanded macros were read from)
+        """
+        preprocessor = VerilogPreprocessor(l_includeDirs)
+        verilogModule = VerilogModule.scan( VerilogTokenizer.iter_chunks(buffer, offset, "utf-8"),
+                                            lambda it_tokens: preprocessor.expand_macros(it_tokens, s_fileIn, offset) )
+        return (verilogModule, preprocessor.get_includes())
+
+
+    @classmethod
+    def __map_file(cls, file_in):
+        """memory-maps a file opened in binary mode (read-only), small files are simply read (mapping them costs more than reading them)
+
+        :returns: context manager providing the mmap object (or bytes for small files)
+        """
+        if os.fstat(file_in.fileno()).st_size < cls.__mmapThreshold:
+            return nullcontext(file_in.read())
+        return mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+    @staticmethod
+    def __get_language(s_fileIn):
+        """determines the language from the file ending of s_fileIn
+
+        :returns: HDL_Enum, None if s_fileIn has no valid file ending
+        """
+        mo_fileEnding = re.search(r"\.(v|sv)$", s_fileIn)
+        if not mo_fileEnding:
+            return None
+        elif mo_fileEnding.group(1) == HDL_Enum.VERILOG.get_fileEnding():
+            return HDL_Enum.VERILOG
+        else:
+            return HDL_Enum.SYSTEMVERILOG
+
+
+    def render_moduleFile(self):
+        """renders a complete code body (see write_moduleFile)
+
+        :returns: file content as string
+        """
+        l_out = []
+
+        #### timescale ####
+        l_out.append( self.render_timescale() )
+        l_out.append( get_blankLines(1) )
+
+        #### include guards ####
+        if self.includeGuards:
+            l_out.append( self.verilogModule.render_includeGuards("top") )
+            l_out.append( get_blankLines(1) )
+
+        #### file description commentary ####
+        l_out.append("""/*
 * company:
 * author/engineer:\t""" + self.s_author + """
 * creation date:\t""" + self.s_creationDate + """
@@ -139,84 +262,79 @@ class VerilogFile():
 *
 *
 """)
-            # fetch port dictionary
-            d_ports = self.verilogModule.ports
-
-            # TODO: maybe use get_tabbedString function to align port/parameter commentaries...
-            # write example line
-            file_out.write("*\t\t[port name]\t\t- [port description]\n")
-            # input ports
-            file_out.write("* * inputs:\n" if d_ports["input"] else "")
-            for port in d_ports["input"]:
-                file_out.write("*\t\t" + port.get_identifier() + "\t\n")
-
-            # output ports
-            file_out.write("* * outputs:\n" if d_ports["output"] else "")
-            for port in d_ports["output"]:
-                file_out.write("*\t\t" + port.get_identifier() + "\t\n")
+        # fetch port dictionary
+        d_ports = self.verilogModule.ports
+
+        # TODO: maybe use get_tabbedString function to align port/parameter commentaries...
+        # write example line
+        l_out.append("*\t\t[port name]\t\t- [port description]\n")
+        # input ports
+        l_out.append("* * inputs:\n" if d_ports["input"] else "")
+        for port in d_ports["input"]:
+            l_out.append("*\t\t" + port.get_identifier() + "\t\n")
+
+        # output ports
+        l_out.append("* * outputs:\n" if d_ports["output"] else "")
+        for port in d_ports["output"]:
+            l_out.append("*\t\t" + port.get_identifier() + "\t\n")
+
+        # inout ports
+        l_out.append("* * inout:\n" if d_ports["inout"] else "")
+        for port in d_ports["inout"]:
+            l_out.append("*\t\t" + port.get_identifier() + "\t\n")
+        
+        # fetch parameter list
+        l_parameters = self.verilogModule.l_parameters 
 
-            # inout ports
-            file_out.write("* * inout:\n" if d_ports["inout"] else "")
-            for port in d_ports["inout"]:
-                file_out.write("*\t\t" + port.get_identifier() + "\t\n")
-            
-            # fetch parameter list
-            l_parameters = self.verilogModule.l_parameters 
+        # parameters
+        if l_parameters:
+            l_out.append( get_blankLines(2, leading_string="*") )
+            l_out.append("* * parameters:\n")
+            for parameter in l_parameters:
+                l_out.append("*\t\t" + parameter.identifier + "\t\n")
 
-            # parameters
-            if l_parameters:
-                writeBlankLines(file_out,2,leading_string="*")
-                file_out.write("* * parameters:\n")
-                for parameter in l_parameters:
-                    file_out.write("*\t\t" + parameter.identifier + "\t\n")
+        l_out.append("*/\n")
 
-            file_out.write("*/\n")
+        l_out.append( get_blankLines(2) )
 
-            writeBlankLines(file_out,2)
+        #### module declaration ####
+        l_out.append( self.verilogModule.render_declaration(indentObj=self.indentObj, language=self.language) )
 
-            #### module declaration ####
-            self.verilogModule.write_declaration(file_out, indentObj=self.indentObj, language=self.language)
+        # end if
+        if self.includeGuards:
+            l_out.append( get_blankLines(1) )
+            l_out.append( self.verilogModule.render_includeGuards("bottom") )
 
-            # end if
-            if self.includeGuards:
-                writeBlankLines(file_out,1)
-                self.verilogModule.write_includeGuards(file_out, "bottom")
+        return "".join(l_out)
 
 
-    def write_testbenchFile(self, s_fileOut="", b_removeIOSuffix=True):
-        """generates a testbench file for self.verilogModule
+    def write_moduleFile(self, s_fileOut="", s_overwritePolicy="ask"):
+        """writes a complete code body to the specified output file (rendered in memory and written at once, so s_fileOut is never left half-written)
 
         :s_fileOut: string identifying output file; if empty, s_fileOut will be set to <verilogModule.moduleName>.v/sv depending on self.language
+        :s_overwritePolicy: handling of an existing s_fileOut: "ask" (query), "skip" (keep existing file) or "overwrite"
+        :returns: "written", "unchanged" (s_fileOut is up to date, see __write_generatedFile) or "skipped"
         """
         # determine s_fileOut if not passed
         if not s_fileOut:
-            s_fileOut = "tb_" + self.verilogModule.moduleName + "." + self.language.get_fileEnding()
+            s_fileOut = self.verilogModule.moduleName + "." + self.language.get_fileEnding()
 
-        # check for file existance
-        try:
-            with open(s_fileOut, "r") as file_out:
-                # file exists -> query for overwriting
-                overwrite = input("File " + s_fileOut + " exists! Are you sure you want to overwrite it? [y/n]")
+        return self.__write_generatedFile( s_fileOut, self.get_fingerprint("module"), self.render_moduleFile, s_overwritePolicy )
 
-                if overwrite == 'y':
-                    print("File " + s_fileOut + " will be overwritten...")
-                else:
-                    print("File " + s_fileOut + " will not be overwritten. Exiting...")
-                    return None
-        except FileNotFoundError: 
-            pass
 
-        ##############################
-        #### write to output file ####
-        ##############################
-        with open(s_fileOut, "w") as file_out:
-                        
-            #### timescale ####
-            self.write_timescale(file_out)
-            writeBlankLines(file_out, 1)
-
-            #### file description commentary ####
-            file_out.write("""/*
+    def render_testbenchFile(self, b_removeIOSuffix=True):
+        """renders a testbench for self.verilogModule (see write_testbenchFile)
+
+        :returns: file content as string
+        """
+        l_out = []
+
+        #### timescale ####
+        l_out.append( self.render_timescale() )
+        l_out.append( get_blankLines(1) )
+
+        #### file description commentary ####
+        l_out.append("""/*
 * testbench for """ + self.verilogModule.moduleName + """
 * 
 * company:
@@ -227,79 +345,189 @@ class VerilogFile():
 */
 """)
 
-            writeBlankLines(file_out, 1)
-
-            #### tb module generation ####
-            file_out.write("module tb_" + self.verilogModule.moduleName + ";\n")
-            writeBlankLines(file_out, 1)
-
-            ## variable declarations ##
-            # fetch port dictionary
-            d_ports = self.verilogModule.ports
-            
-            # input ports
-            file_out.write("\t// dut inputs\n" if d_ports["input"] else "")
-            for port in d_ports["input"]:
-                file_out.write("\t")
-                port.write_connectedVariable(file_out, self.indentObj, self.language, b_removeIOSuffix=b_removeIOSuffix)
-                file_out.write(";\n")
-            if d_ports["input"]: writeBlankLines(file_out, 1)
-            # output ports
-            file_out.write("\t// dut outputs\n" if d_ports["output"] else "")
-            for port in d_ports["output"]:
-                file_out.write("\t")
-                port.write_connectedVariable(file_out, self.indentObj, self.language, b_removeIOSuffix=b_removeIOSuffix)
-                file_out.write(";\n")
-            if d_ports["output"]: writeBlankLines(file_out, 1)
-            # inout ports
-            file_out.write("\t// dut inouts\n" if d_ports["inout"] else "")
-            for port in d_ports["inout"]:
-                file_out.write("\t")
-                port.write_connectedVariable(file_out, self.indentObj, self.language, b_removeIOSuffix=b_removeIOSuffix)
-                file_out.write(";\n")
-                    
-            writeBlankLines(file_out, 2)
-
-            ## clock initialization ##
-            # TODO: maybe deactivate by a parameter
-            # search for clock signal and set up clock 
-            # (I know it may not always be switching at 5 time units, but better that writing nothing)
-            re_clk = r"(clk|CLK|clock|Clock)"
-            for port in d_ports["input"]:
-                mo_clk = re.search(re_clk, port.get_identifier() )
-                if mo_clk:
-                    file_out.writelines(["\talways begin\n", "\t\t #5 "])
-                    s_variableIdentifier = port.get_identifier() if not b_removeIOSuffix else removeIOSuffix(port.get_identifier()) 
-                    file_out.write( "\t\t" + s_variableIdentifier + " <= ~" + s_variableIdentifier+ ";\n")
-                    file_out.write("\tend\n")
-                    writeBlankLines(file_out, 1)
-
-            writeBlankLines(file_out, 1)
-
-            ## empty initial block (with clock initialized to 1 if exists) ##
-            file_out.write("\tinitial begin\n")
-
-            # initialize clock if found
-            for port in d_ports["input"]:
-                mo_clk = re.search(re_clk, port.get_identifier() )
-                if mo_clk:
-                    s_variableIdentifier = port.get_identifier() if not b_removeIOSuffix else removeIOSuffix(port.get_identifier()) 
-                    file_out.write("\t\t" + s_variableIdentifier + " <= 1;\n")
-
-            writeBlankLines(file_out, 2)
-            file_out.writelines(["\t\t$finish\n", "\tend\n"])
-
-            writeBlankLines(file_out, 2)
-
-            ## dut instantiation
-            # TODO: will not be indented
-            self.verilogModule.write_instantiation(file_out, self.indentObj)
-
-            writeBlankLines(file_out, 1)
-
-            ## end module ##
-            file_out.write("endmodule")
+        l_out.append( get_blankLines(1) )
+
+        #### tb module generation ####
+        l_out.append("module tb_" + self.verilogModule.moduleName + ";\n")
+        l_out.append( get_blankLines(1) )
+
+        ## variable declarations ##
+        # fetch port dictionary
+        d_ports = self.verilogModule.ports
         
+        # input ports
+        l_out.append("\t// dut inputs\n" if d_ports["input"] else "")
+        l_out.extend( [ "\t" + port.get_connectedVariable(self.indentObj, self.language, b_removeIOSuffix=b_removeIOSuffix) + ";\n" for port in d_ports["input"] ] )
+        if d_ports["input"]: l_out.append( get_blankLines(1) )
+        # output ports
+        l_out.append("\t// dut outputs\n" if d_ports["output"] else "")
+        l_out.extend( [ "\t" + port.get_connectedVariable(self.indentObj, self.language, b_removeIOSuffix=b_removeIOSuffix) + ";\n" for port in d_ports["output"] ] )
+        if d_ports["output"]: l_out.append( get_blankLines(1) )
+        # inout ports
+        l_out.append("\t// dut inouts\n" if d_ports["inout"] else "")
+        l_out.extend( [ "\t" + port.get_connectedVariable(self.indentObj, self.language, b_removeIOSuffix=b_removeIOSuffix) + ";\n" for port in d_ports["inout"] ] )
+                
+        l_out.append( get_blankLines(2) )
+
+        ## clock initialization ##
+        # TODO: maybe deactivate by a parameter
+        # search for clock signal and set up clock 
+        # (I know it may not always be switching at 5 time units, but better that writing nothing)
+        # (clock inputs determined once, both loops below only visit them)
+        l_clocks = [ port.get_identifier() if not b_removeIOSuffix else removeIOSuffix(port.get_identifier())
+                        for port in d_ports["input"] if type(self).__re_clk.search( port.get_identifier() ) ]
+        for s_variableIdentifier in l_clocks:
+            l_out.extend(["\talways begin\n", "\t\t #5 "])
+            l_out.append( "\t\t" + s_variableIdentifier + " <= ~" + s_variableIdentifier+ ";\n")
+            l_out.append("\tend\n")
+            l_out.append( get_blankLines(1) )
+
+        l_out.append( get_blankLines(1) )
+
+        ## empty initial block (with clock initialized to 1 if exists) ##
+        l_out.append("\tinitial begin\n")
+
+        # initialize clock if found
+        for s_variableIdentifier in l_clocks:
+            l_out.append("\t\t" + s_variableIdentifier + " <= 1;\n")
+
+        l_out.append( get_blankLines(2) )
+        l_out.extend(["\t\t$finish\n", "\tend\n"])
+
+        l_out.append( get_blankLines(2) )
+
+        ## dut instantiation
+        # TODO: will not be indented
+        l_out.append( self.verilogModule.render_instantiation(self.indentObj) )
+
+        l_out.append( get_blankLines(1) )
+
+        ## end module ##
+        l_out.append("endmodule")
+
+        return "".join(l_out)
+
+
+    def write_testbenchFile(self, s_fileOut="", b_removeIOSuffix=True, s_overwritePolicy="ask"):
+        """generates a testbench file for self.verilogModule (rendered in memory and written at once, so s_fileOut is never left half-written)
+
+        :s_fileOut: string identifying output file; if empty, s_fileOut will be set to <verilogModule.moduleName>.v/sv depending on self.language
+        :s_overwritePolicy: handling of an existing s_fileOut: "ask" (query), "skip" (keep existing file) or "overwrite"
+        :returns: "written", "unchanged" (s_fileOut is up to date, see __write_generatedFile) or "skipped"
+        """
+        # determine s_fileOut if not passed
+        if not s_fileOut:
+            s_fileOut = "tb_" + self.verilogModule.moduleName + "." + self.language.get_fileEnding()
+
+        return self.__write_generatedFile( s_fileOut, self.get_fingerprint("testbench", b_removeIOSuffix),
+                                            lambda: self.render_testbenchFile(b_removeIOSuffix=b_removeIOSuffix), s_overwritePolicy )
+
+
+    def get_fingerprint(self, s_kind, b_removeIOSuffix=True):
+        """returns a fingerprint of everything a generated file depends on: module interface, output options and render version
+        The creation date is left out, so a file generated on an earlier day is still up to date.
+
+        :s_kind: "module" or "testbench"
+        :b_removeIOSuffix: see render_testbenchFile
+        :returns: hex digest as string
+        """
+        d_inputs = { "kind": s_kind, "renderVersion": type(self).__renderVersion, "interface": self.verilogModule.get_interfaceHash(),
+                    "outputReg": self.verilogModule.outputReg, "timescale": self.s_timescale, "author": self.s_author,
+                    "includeGuards": self.includeGuards, "language": self.language.name, "tabwidth": self.indentObj.get_tabwidth(),
+                    "desiredIndentation": self.indentObj.get_desiredTabIndentation(), "removeIOSuffix": b_removeIOSuffix }
+        return hashlib.sha1( json.dumps(d_inputs, sort_keys=True).encode("utf-8") ).hexdigest()
+
+
+    @classmethod
+    def __write_generatedFile(cls, s_fileOut, s_fingerprint, render, s_overwritePolicy):
+        """writes a generated file unless it is up to date
+        The fingerprint of every written file is stored in the cache directory (keyed by the absolute output path, together with size and mtime of the written file), so no extra files end up next to the generated ones. If the stored fingerprint matches and the file was not modified since, nothing is rendered at all. Otherwise the file is rendered and compared with the existing one, an identical file is not written again.
+
+        :s_fileOut: output file
+        :s_fingerprint: fingerprint of the content (see get_fingerprint)
+        :render: function returning the file content
+        :s_overwritePolicy: handling of an existing s_fileOut whose content differs: "ask" (query), "skip" (keep existing file) or "overwrite"
+        :returns: "written", "unchanged" or "skipped"
+        """
+        s_fingerprintFile = cls.__get_fingerprintFile(s_fileOut)
+
+        s_content = None
+        try:
+            stat = os.stat(s_fileOut)
+        except OSError:
+            stat = None
+        if stat:
+            #### fast path: stored fingerprint ####
+            try:
+                with open(s_fingerprintFile, "r") as file_in:
+                    d_fingerprint = json.load(file_in)
+            except (OSError, ValueError):
+                d_fingerprint = {}
+            # (path -> (very unlikely) hash collision of two output paths)
+            if ( d_fingerprint.get("fingerprint") == s_fingerprint and d_fingerprint.get("path") == os.path.abspath(s_fileOut) and d_fingerprint.get("size") == stat.st_size
+                    and d_fingerprint.get("mtime") == stat.st_mtime_ns ):
+                print("File " + s_fileOut + " is up to date")
+                return "unchanged"
+
+            #### compare content ####
+            s_content = render()
+            try:
+                with open(s_fileOut, "r") as file_in:
+                    b_identical = file_in.read() == s_content
+            except (OSError, UnicodeDecodeError):
+                b_identical = False
+            if b_identical:
+                cls.__write_fingerprint(s_fingerprintFile, s_fileOut, s_fingerprint)
+                print("File " + s_fileOut + " is up to date")
+                return "unchanged"
+
+            # check for file existance (unless overwriting is forced)
+            if not cls.__check_overwrite(s_fileOut, s_overwritePolicy):
+                return "skipped"
+
+        ##############################
+        #### write to output file ####
+        ##############################
+        writeFileAtomic( s_fileOut, s_content if s_content is not None else render() )
+        cls.__write_fingerprint(s_fingerprintFile, s_fileOut, s_fingerprint)
+        return "written"
+
+
+    @classmethod
+    def __get_fingerprintFile(cls, s_fileOut):
+        """returns the file the fingerprint of s_fileOut is stored in (file name: hash of the absolute output path), empty string if there is no cache directory
+        """
+        s_cacheDir = Verilog_codeGen_config.get_cacheDir()
+        if not s_cacheDir:
+            return ""
+        s_path = os.path.abspath(s_fileOut)
+        return s_cacheDir + "/" + cls.__s_fingerprintDirName + "/" + hashlib.sha1(s_path.encode("utf-8")).hexdigest() + ".json"
+
+
+    @staticmethod
+    def __write_fingerprint(s_fingerprintFile, s_fileOut, s_fingerprint):
+        """stores the fingerprint of s_fileOut (with its current size and mtime), a fingerprint which can not be written only disables the fast path
+        """
+        if not s_fingerprintFile:
+            return
+        try:
+            stat = os.stat(s_fileOut)
+            os.makedirs( os.path.dirname(s_fingerprintFile), exist_ok=True )
+            writeFileAtomic( s_fingerprintFile, json.dumps({ "fingerprint": s_fingerprint, "path": os.path.abspath(s_fileOut),
+                                                            "size": stat.st_size, "mtime": stat.st_mtime_ns }) + "\n" )
+        except OSError:
+            pass
+
+
+    def render_timescale(self):
+        """renders a timescale definition if self.s_timescale is not empty
+
+        :returns: timescale line as string (empty string if no timescale)
+        """
+        if self.s_timescale:
+            return "`timescale " + self.s_timescale + "\n"
+        return ""
+
 
     def write_timescale(self, file_out):
         """writes a timescale definition to fileOut_Descriptor if self.s_timescale is not empty
@@ -310,6 +538,27 @@ class VerilogFile():
             print("file_out must be open!")
             return None
 
-        if self.s_timescale:
-            file_out.write("`timescale " + self.s_timescale + "\n")
+        file_out.write( self.render_timescale() )
+
 
+    @staticmethod
+    def __check_overwrite(s_fileOut, s_overwritePolicy):
+        """checks whether s_fileOut may be written according to s_overwritePolicy, queries the user for "ask"
+
+        :returns: True if s_fileOut shall be written
+        """
+        if s_overwritePolicy == "overwrite" or not os.path.exists(s_fileOut):
+            return True
+
+        # file exists -> query for overwriting (or skip)
+        if s_overwritePolicy == "skip":
+            print("File " + s_fileOut + " exists and will not be overwritten...")
+            return False
+        overwrite = input("File " + s_fileOut + " exists! Are you sure you want to overwrite it? [y/n]")
+
+        if overwrite == 'y':
+            print("File " + s_fileOut + " will be overwritten...")
+            return True
+        else:
+            print("File " + s_fileOut + " will not be overwritten. Exiting...")
+            return False
@@ -0,0 +1,314 @@
+
+#
+# project-wide extraction of the module instantiation hierarchy
+#
+
+import os, re, json, mmap, hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from VerilogFile import VerilogFile
+from VerilogPreprocessor import VerilogPreprocessor
+from VerilogModuleIndex import VerilogModuleIndex
+from Verilog_codeGen_config import Verilog_codeGen_config
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+class VerilogHierarchy:
+    """design hierarchy of a project: every module declaration together with the modules it instantiates
+    Files are scanned in parallel worker processes. The results are kept per file (keyed by path, size and mtime, plus the `include files the module headers depend on), so a rerun only scans new or changed files. Every combination of roots and include directories gets its own cache file, so alternating between projects does not evict the other project's results.
+    """
+
+    # name prefix of the result caches inside Verilog_codeGen_config.get_cacheDir() (completed by a hash of roots and include directories)
+    __s_cacheFilePrefix = "hierarchy_"
+    # version of the cache format and of the scanner producing it
+    __cacheVersion = 2
+    # instantiation statement: start of a statement (behind ";", ")" or a block keyword with optional label), module name (-> group 1),
+    #   optional parameter assignment (up to two levels of nested parentheses), instance name (-> group 2), optional instance array ranges, opening parenthesis of the port connections
+    __re_instantiation = re.compile(r"""(?:[;)]|\b(?:begin|end|generate|endgenerate|else|endcase|endfunction|endtask|join|join_any|join_none)\b)\s*(?::\s*[A-Za-z_]\w*\b\s*)?"""
+                                    r"""([A-Za-z_]\w*)\b\s*(?:#\s*(?:\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\)|[\w.']+)\s*)?([A-Za-z_]\w*|\\\S+)\s*(?:\[[^\]]*\]\s*)*\(""")
+    # reserved words which look like module or instance names in the pattern above (e.g. "else if (", "end assign x (")
+    __s_keywords = frozenset("""
+        alias always always_comb always_ff always_latch and assert assign assume automatic before begin bind bins binsof bit break buf bufif0 bufif1 byte case casex casez
+        cell chandle checker class clocking cmos config const constraint context continue cover covergroup coverpoint cross deassign default defparam design disable dist do
+        edge else end endcase endchecker endclass endclocking endconfig endfunction endgenerate endgroup endinterface endmodule endpackage endprimitive endprogram endproperty
+        endspecify endsequence endtable endtask enum event eventually expect export extends extern final first_match for force foreach forever fork forkjoin function generate
+        genvar global highz0 highz1 if iff ifnone ignore_bins illegal_bins implements implies import incdir include initial inout input inside instance int integer interconnect
+        interface intersect join join_any join_none large let liblist library local localparam logic longint macromodule matches medium modport module nand negedge nettype new
+        nexttime nmos nor noshowcancelled not notif0 notif1 null or output package packed parameter pmos posedge primitive priority program property protected pull0 pull1 pulldown
+        pullup pulsestyle_ondetect pulsestyle_onevent pure rand randc randcase randsequence rcmos real realtime ref reg reject_on release repeat restrict return rnmos rpmos rtran
+        rtranif0 rtranif1 s_always s_eventually s_nexttime s_until s_until_with scalared sequence shortint shortreal showcancelled signed small soft solve specify specparam static
+        string strong strong0 strong1 struct super supply0 supply1 sync_accept_on sync_reject_on table tagged task this throughout time timeprecision timeunit tran tranif0 tranif1
+        tri tri0 tri1 triand trior trireg type typedef union unique unique0 unsigned until until_with untyped use uwire var vectored virtual void wait wait_order wand weak weak0
+        weak1 while wildcard wire with within wor xnor xor
+        """.split())
+
+
+    def __init__(self, d_files=None, l_roots=()):
+        """
+        :d_files: scan results per file: absolute path -> list of module records (see scan_file)
+        :l_roots: root directories the files were found in, in the order of preference (decides between modules declared in several files)
+        """
+        self.d_files = d_files if d_files else {}
+        self.l_roots = list(l_roots)
+
+
+    @classmethod
+    def scan_file(cls, s_fileIn, l_includeDirs=(), b_declarations=True):
+        """scans all module declarations of s_fileIn and the modules each of them instantiates
+        Modules are lazy handles (see VerilogFile.scan_moduleAt), so their headers are only parsed if the declarations are requested.
+
+        :s_fileIn: Verilog/SystemVerilog source file
+        :l_includeDirs: directories searched for `include files (see VerilogFile.scan)
+        :b_declarations: parse the module headers and add their declarations to the records
+        :returns: list of module records (dictionaries with "name", "offset", "declaration" (see VerilogFile.to_dict, only if b_declarations) and "instances" (instantiated module -> number of instantiations, in order of appearance))
+        """
+        l_declarations = VerilogFile.scan_moduleDeclarations(s_fileIn)
+        if not l_declarations:
+            return []
+
+        l_modules = []
+        with open(s_fileIn, "rb") as file_in, mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for i_module, (s_moduleName, offset, s_timescale) in enumerate(l_declarations):
+                verilogFile = VerilogFile.scan_moduleAt(s_fileIn, offset, s_timescale, l_includeDirs, moduleName=s_moduleName)
+                if not verilogFile:
+                    continue
+                d_module = { "offset": offset }
+                if b_declarations:
+                    # (parses the header)
+                    d_module["declaration"] = verilogFile.to_dict()
+                d_module["name"] = verilogFile.verilogModule.moduleName
+                # the module ends at the next module declaration at the latest
+                i_end = l_declarations[i_module + 1][1] if i_module + 1 < len(l_declarations) else len(buffer)
+                d_module["instances"] = cls.__find_instantiations( buffer[offset:i_end].decode("utf-8", "replace") )
+                l_modules.append(d_module)
+        return l_modules
+
+
+    @classmethod
+    def __find_instantiations(cls, s_code):
+        """finds all module instantiations in the code of a module
+
+        :s_code: module source code (header and body)
+        :returns: dictionary instantiated module name -> number of instantiation statements
+        """
+        # comments and strings could contain anything that looks like an instantiation
+        s_code = "".join( VerilogPreprocessor.strip_comments([s_code], b_stripStrings=True) )
+        i_end = s_code.find("endmodule")
+        if i_end >= 0:
+            s_code = s_code[:i_end]
+
+        d_instances = {}
+        s_keywords = cls.__s_keywords
+        for s_moduleName, s_instanceName in cls.__re_instantiation.findall(s_code):
+            if s_moduleName not in s_keywords and s_instanceName not in s_keywords:
+                d_instances[s_moduleName] = d_instances.get(s_moduleName, 0) + 1
+        return d_instances
+
+
+    @classmethod
+    def build(cls, l_roots, d_searchOptions=None, l_includeDirs=(), jobs=None, b_useCache=True, b_declarations=True):
+        """scans all Verilog/SystemVerilog files below l_roots, only new or changed files are scanned (in parallel worker processes)
+
+        :l_roots: root directories (e.g. the current working directory and the search paths)
+        :d_searchOptions: options of the directory walk (see VerilogModuleIndex.list_files), e.g. from Verilog_codeGen_config.get_searchOptions
+        :l_includeDirs: directories searched for `include files
+        :jobs: number of worker processes, defaults to the number of cores
+        :b_useCache: read and update the result cache
+        :b_declarations: include the module declarations (parsed headers), without them only module names and instantiations are determined (e.g. for render_dot)
+        :returns: VerilogHierarchy object
+        """
+        d_searchOptions = dict(d_searchOptions) if d_searchOptions else {}
+        d_searchOptions.pop("b_stopAtUniqueMatch", None)
+        moduleIndex = VerilogModuleIndex.load()
+        l_files = sorted( moduleIndex.list_files(l_roots, **d_searchOptions) )
+        moduleIndex.save()
+
+        l_includeDirs = [ os.path.abspath(s_dir) for s_dir in l_includeDirs ]
+        s_cacheFile = cls.__get_cacheFile(l_roots, l_includeDirs) if b_useCache else ""
+        d_cached = cls.__read_cache(s_cacheFile, l_includeDirs)
+
+        #### files served by the cache ####
+        d_files = {}
+        l_scan = []
+        # mtimes of `include files (shared by many files)
+        d_includeMtimes = {}
+        with VerilogCodeGen_Stats.phase("hierarchyCache"):
+            for s_file in l_files:
+                try:
+                    stat = os.stat(s_file)
+                except OSError:
+                    continue
+                l_cached = d_cached.get(s_file)
+                if l_cached and l_cached[0] == stat.st_size and l_cached[1] == stat.st_mtime_ns and cls.__check_includes(l_cached[2], d_includeMtimes) \
+                        and ( not b_declarations or all( "declaration" in d_module for d_module in l_cached[2] ) ):
+                    VerilogCodeGen_Stats.count("cacheHits")
+                    d_files[s_file] = l_cached
+                else:
+                    l_scan.append( (s_file, stat.st_size, stat.st_mtime_ns) )
+
+        #### scan new and changed files ####
+        with VerilogCodeGen_Stats.phase("scan"):
+            jobs = jobs if jobs else os.cpu_count()
+            l_paths = [ s_file for s_file, size, mtime in l_scan ]
+            if jobs == 1 or len(l_scan) < 2:
+                l_results = [ cls._scan_fileSafe(s_file, l_includeDirs, b_declarations) for s_file in l_paths ]
+            else:
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    l_results = list( executor.map( cls._scan_fileSafe, l_paths, [l_includeDirs] * len(l_paths), [b_declarations] * len(l_paths),
+                                                    chunksize=max(1, len(l_paths) // (jobs * 8)) ) )
+            for (s_file, size, mtime), l_modules in zip(l_scan, l_results):
+                d_files[s_file] = [size, mtime, l_modules]
+
+        if s_cacheFile and (l_scan or len(d_files) != len(d_cached)):
+            cls.__write_cache(s_cacheFile, l_includeDirs, d_files)
+
+        return cls( { s_file: l_entry[2] for s_file, l_entry in d_files.items() }, l_roots )
+
+
+    @classmethod
+    def _scan_fileSafe(cls, s_fileIn, l_includeDirs=(), b_declarations=True):
+        """scan_file for worker processes: files which can not be scanned (e.g. syntax errors, unreadable) yield no modules instead of aborting the whole run
+        """
+        try:
+            return cls.scan_file(s_fileIn, l_includeDirs, b_declarations)
+        except (Exception, SystemExit):
+            return []
+
+
+    def to_dict(self):
+        """returns the hierarchy as dictionary (-> JSON output)
+
+        :returns: dictionary with
+            "modules": module name -> {"file", "offset", "declaration" (None if built without declarations), "instances"} (if a module is declared in several files, the declaration of the best ranked file, the same one the module instantiation selects (see VerilogModuleIndex.rank_files)),
+            "tops": modules which are not instantiated by any other module,
+            "unresolved": instantiated modules without declaration (e.g. vendor primitives),
+            "duplicates": module name -> all files declaring it, best ranked first (only modules declared more than once)
+        """
+        d_declarations = {}
+        d_declaringFiles = {}
+        for s_file in sorted(self.d_files):
+            for d_module in self.d_files[s_file]:
+                d_declaringFiles.setdefault(d_module["name"], []).append(s_file)
+                if d_module["name"] not in d_declarations:
+                    d_declarations[d_module["name"]] = (s_file, d_module)
+
+        # modules declared in several files (only these files are ranked)
+        for s_name, l_files in d_declaringFiles.items():
+            if len(l_files) > 1:
+                l_files[:] = VerilogModuleIndex.rank_files(l_files, self.l_roots)
+                if l_files[0] != d_declarations[s_name][0]:
+                    d_declarations[s_name] = ( l_files[0], next( d_module for d_module in self.d_files[l_files[0]] if d_module["name"] == s_name ) )
+
+        d_modules = { s_name: { "file": s_file, "offset": d_module["offset"], "declaration": d_module.get("declaration"), "instances": d_module["instances"] }
+                        for s_name, (s_file, d_module) in d_declarations.items() }
+
+        s_instantiated = set()
+        for d_module in d_modules.values():
+            s_instantiated.update(d_module["instances"])
+
+        return { "modules": d_modules,
+                "tops": sorted( s_name for s_name in d_modules if s_name not in s_instantiated ),
+                "unresolved": sorted( s_name for s_name in s_instantiated if s_name not in d_modules ),
+                "duplicates": { s_name: l_files for s_name, l_files in sorted(d_declaringFiles.items()) if len(l_files) > 1 } }
+
+
+    def render_json(self):
+        """renders the hierarchy as compact JSON (see to_dict), e.g. to be processed by jq (pretty-printing a large project takes several times longer)
+
+        :returns: string
+        """
+        return json.dumps(self.to_dict(), separators=(",", ":")) + "\n"
+
+
+    def render_dot(self):
+        """renders the hierarchy as graphviz digraph, one node per module and one edge per instantiated module (labelled with the number of instantiations if more than one)
+
+        :returns: string
+        """
+        d_hierarchy = self.to_dict()
+        l_out = ["digraph hierarchy {\n", "\trankdir=LR;\n", "\tnode [shape=box];\n"]
+        for s_name in d_hierarchy["tops"]:
+            l_out.append( "\t" + self.__quote(s_name) + " [style=bold];\n" )
+        for s_name in d_hierarchy["unresolved"]:
+            l_out.append( "\t" + self.__quote(s_name) + " [style=dashed];\n" )
+        for s_name, d_module in d_hierarchy["modules"].items():
+            for s_instance, count in d_module["instances"].items():
+                l_out.append( "\t" + self.__quote(s_name) + " -> " + self.__quote(s_instance)
+                                + (" [label=\"" + str(count) + "\"]" if count > 1 else "") + ";\n" )
+        l_out.append("}\n")
+        return "".join(l_out)
+
+
+    @staticmethod
+    def __quote(s_name):
+        """returns s_name as quoted DOT identifier
+        """
+        return "\"" + s_name.replace("\\", "\\\\").replace("\"", "\\\"") + "\""
+
+
+    @staticmethod
+    def __check_includes(l_modules, d_includeMtimes):
+        """checks whether the `include files the module headers of a cached file depend on are unchanged
+
+        :d_includeMtimes: mtimes of already checked include files (shared by all files of a run)
+        :returns: bool
+        """
+        for d_module in l_modules:
+            for s_path, mtime in d_module.get("declaration", {}).get("includes", ()):
+                if s_path not in d_includeMtimes:
+                    try:
+                        d_includeMtimes[s_path] = os.stat(s_path).st_mtime_ns
+                    except OSError:
+                        d_includeMtimes[s_path] = None
+                if d_includeMtimes[s_path] != mtime:
+                    return False
+        return True
+
+
+    @classmethod
+    def __get_cacheFile(cls, l_roots, l_includeDirs):
+        """returns the path of the result cache for l_roots and l_includeDirs (absolute paths), empty string if there is no cache directory
+        """
+        s_cacheDir = Verilog_codeGen_config.get_cacheDir()
+        if not s_cacheDir:
+            return ""
+        s_key = json.dumps([ [ os.path.abspath(s_root) for s_root in l_roots ], l_includeDirs ])
+        return s_cacheDir + "/" + cls.__s_cacheFilePrefix + hashlib.sha1(s_key.encode("utf-8")).hexdigest() + ".json"
+
+
+    @classmethod
+    def __read_cache(cls, s_cacheFile, l_includeDirs):
+        """reads the result cache
+
+        :returns: dictionary absolute path -> [size, mtime, list of module records], empty if there is no valid cache
+        """
+        if not s_cacheFile:
+            return {}
+        with VerilogCodeGen_Stats.phase("hierarchyCache"):
+            try:
+                with open(s_cacheFile, "r") as file_in:
+                    d_cache = json.load(file_in)
+            except (OSError, ValueError):
+                return {}
+        if d_cache.get("version") != cls.__cacheVersion or d_cache.get("includeDirs") != l_includeDirs:
+            return {}
+        return d_cache["files"]
+
+
+    @classmethod
+    def __write_cache(cls, s_cacheFile, l_includeDirs, d_files):
+        """writes the result cache (to a temporary file first, so concurrent runs never read a partial cache)
+        Only the files of the current run are kept, so deleted files drop out of the cache (the caches of other roots are not affected).
+        """
+        s_tmpFile = s_cacheFile + "." + str(os.getpid()) + ".tmp"
+        with VerilogCodeGen_Stats.phase("hierarchyCache"):
+            try:
+                with open(s_tmpFile, "w") as file_out:
+                    # (json.dumps uses the fast C encoder, json.dump does not)
+                    file_out.write( json.dumps({ "version": cls.__cacheVersion, "includeDirs": l_includeDirs, "files": d_files }) )
+                os.replace(s_tmpFile, s_cacheFile)
+            except OSError:
+                try:
+                    os.remove(s_tmpFile)
+                except OSError:
+                    pass
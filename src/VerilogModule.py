@@ -1,22 +1,80 @@
 
-import re, sys, os
+import sys, os, json, hashlib
 from VerilogPort import VerilogPort
 from VerilogParameter import VerilogParameter
+from VerilogModuleIndex import VerilogModuleIndex
+from VerilogTokenizer import VerilogTokenizer
+from VerilogPreprocessor import VerilogPreprocessor
 from VerilogCodeGen_Helper import *
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
 
 class VerilogModule():
     """
     functionally represents a Verilog module
     """
 
+    # keywords which may precede an identifier in a parameter or port declaration
+    __declarationKeywords = { "parameter", "localparam", "type", "input", "output", "inout", "ref", "var", "wire", "reg", "logic", "bit", "byte", "tri", "wand", "wor", "supply0", "supply1", "signed", "unsigned", "integer", "int", "shortint", "longint", "real", "realtime", "time", "string" }
+    # port types supported by VerilogPort
+    __portTypes = { "input", "output", "inout" }
+
+
     def __init__(self, moduleName, ports, parameters=None, outputReg: bool=False):
 
         self.moduleName     = moduleName
-        self.ports          = { "input": [], "output": [], "inout": [] }
+        self.__ports        = { "input": [], "output": [], "inout": [] }
         for port in ports:
-            self.ports[ port.get_portType() ].append(port)
-        self.l_parameters   = list(parameters) if parameters else []
+            self.__ports[ port.get_portType() ].append(port)
+        self.__l_parameters = list(parameters) if parameters else []
         self.outputReg      = outputReg
+        # function parsing ports and parameters on first access (only lazy modules, see lazy)
+        self.__loader       = None
+
+
+    @property
+    def ports(self):
+        """ports per port type ("input", "output", "inout"), each as list of VerilogPort objects in declaration order
+        """
+        if self.__loader:
+            self.load()
+        return self.__ports
+
+
+    @property
+    def l_parameters(self):
+        """list of VerilogParameter objects (overridable parameters of the header) in declaration order
+        """
+        if self.__loader:
+            self.load()
+        return self.__l_parameters
+
+
+    @classmethod
+    def lazy(cls, moduleName, loader):
+        """creates a module handle which only knows its name, ports and parameters are parsed when ports or l_parameters is first accessed
+        Name-based operations (e.g. listing the modules of a whole project) thereby skip parsing the module headers (see VerilogFile.scan_moduleAt).
+
+        :moduleName: name of the module (e.g. from VerilogFile.scan_moduleDeclarations)
+        :loader: function without arguments returning the parsed VerilogModule, or None if no module declaration is found (-> no ports and parameters)
+        :returns: VerilogModule object
+        """
+        verilogModule = cls(moduleName, [])
+        verilogModule.__loader = loader
+        return verilogModule
+
+
+    def load(self):
+        """parses ports and parameters of a lazy module (see lazy), does nothing if they are already known
+        """
+        if not self.__loader:
+            return
+        parsedModule = self.__loader()
+        self.__loader = None
+        if parsedModule:
+            # (the parsed name differs from the declared one if the name is a macro)
+            self.moduleName = parsedModule.moduleName
+            self.__ports = parsedModule.ports
+            self.__l_parameters = parsedModule.l_parameters
 
     
     def __str__(self):
@@ -37,363 +95,406 @@ class VerilogModule():
         return "".join(l_print)
 
 
-    @classmethod
-    def scan(cls, fileDescriptor):
-        """
-        scans file_in for a Verilog module declaration (looks for the first declaration!)
-        If it finds a declaration, returns a corresponding VerilogModule object, otherwise returns None
+    def to_dict(self):
+        """serializes the module interface (e.g. for caching or json export)
 
-        :fileDescriptor: either a string or a read-open file
-        :returns: VerilogModule object if module declaration is found, else None
+        :returns: dictionary with moduleName, parameters and ports (inputs, outputs, inouts in declaration order per type)
         """
-        
-        # regular expression to match module declaration, parameter declaration beginning/ending and port declaration beginning/ending
-#         __re_moduleDeclaration = r"\s*module\s+([\w-]+)\s*(\(|#\(|)"
-        __re_moduleDeclaration = r"\s*module\s+([\w-]+)"
+        return { "moduleName": self.moduleName,
+                "parameters": [ parameter.to_dict() for parameter in self.l_parameters ],
+                "ports": [ port.to_dict() for portType in ("input", "output", "inout") for port in self.ports[portType] ] }
 
-        l_parameters = []
-        l_ports = []
 
-        # open file if string is passed
-        if isinstance( fileDescriptor, str ):
-            file_in = open(fileDescriptor, "r") 
-        else: 
-            file_in = fileDescriptor
+    def get_interfaceHash(self):
+        """returns a fingerprint of the module interface (name, parameters, ports), equal interfaces yield equal hashes regardless of the rest of the file
 
-        # set file pointer to beginning
-        file_in.seek(0)
-
-        l_ports = []
-        l_parameters = []
+        :returns: hex digest as string
+        """
+        return hashlib.sha1( json.dumps(self.to_dict(), sort_keys=True).encode("utf-8") ).hexdigest()
 
-        currentLine = file_in.readline()
 
-        while currentLine:
-            # matchObj will hold module declaration items in matchObj.group(4-6) (if not empty for sure)
-            matchObj = re.match( __re_moduleDeclaration , currentLine)
+    @classmethod
+    def fromDict(cls, d_module):
+        """creates a VerilogModule from a dictionary as returned by to_dict
+        """
+        return cls( moduleName = d_module["moduleName"],
+                ports = [ VerilogPort.fromDict(d_port) for d_port in d_module["ports"] ],
+                parameters = [ VerilogParameter.fromDict(d_parameter) for d_parameter in d_module["parameters"] ] )
 
-            if matchObj:
-                
-                # set file pointer one line up to repeat readline() in scan subfunctions
-                file_in.seek( file_in.tell() - len(currentLine) )
-                
-                moduleName = matchObj.group(1)
-                # scan for parameters and ports
-                l_parameters = cls.__scanParameters( file_in )
-                l_ports = cls.__scanPorts( file_in )
 
-                return cls( 
-                        moduleName = moduleName, 
-                        ports = l_ports,
-                        parameters = l_parameters )
+    @classmethod
+    def scan(cls, fileDescriptor, tokenFilter=None):
+        """
+        scans file_in for a Verilog module declaration (looks for the first declaration!)
+        If it finds a declaration, returns a corresponding VerilogModule object, otherwise returns None
+        The file is stripped of comments and tokenized in a single forward pass (see VerilogPreprocessor, VerilogTokenizer), reading stops right after the module header.
 
-            currentLine = file_in.readline()
+        :fileDescriptor: either a string or a read-open file (read from the current position) or any other iterable of lines (or chunks ending at line ends)
+        :tokenFilter: optional function wrapping the token iterator, e.g. macro expansion (see VerilogPreprocessor.expand_macros)
+        :returns: VerilogModule object if module declaration is found, else None
+        """
+        # open file if string is passed
+        if isinstance( fileDescriptor, str ):
+            with open(fileDescriptor, "r") as file_in:
+                return cls.scan(file_in, tokenFilter)
 
-        # end of file reached without module declaration found
-        return None
+        it_tokens = VerilogTokenizer.tokenize( VerilogPreprocessor.strip_comments(fileDescriptor) )
+        return cls.__scanHeader( tokenFilter(it_tokens) if tokenFilter else it_tokens )
 
 
-    def write_declaration(self, file_out, indentObj: IndentObj, language: HDL_Enum=HDL_Enum.VERILOG):
-        """writes a complete module declaration to file_out (must be open!) 
+    def render_declaration(self, indentObj: IndentObj, language: HDL_Enum=HDL_Enum.VERILOG):
+        """renders a complete module declaration
 
-        :file_out: output file; may be passed as string or as file object
         :indentObj: IndentObj to handle indentations
         :language: HDL_Enum object to specify HDL language
+        :returns: declaration as string
         """
-        if file_out.closed:
-            print("file_out must be open!")
-            return None
+        l_out = []
 
-        #### write module interface ####
+        #### module interface ####
 
         # parameters
         if self.l_parameters:
-            file_out.write("module " + self.moduleName + " #(\n")
-            for parameter in self.l_parameters:
-                file_out.write("\t")
-                parameter.write_declaration(file_out, indentObj)
-                if not parameter == self.l_parameters[-1]:
-                    file_out.write(",")
-                file_out.write("\n")
-
-            file_out.write(")\n")
-            file_out.write("(\n")
+            l_out.append("module " + self.moduleName + " #(\n")
+            l_out.append( self.__render_list( [ [ parameter.get_declaration(indentObj) for parameter in self.l_parameters ] ], b_blankLines=False ) )
+            l_out.append(")\n")
+            l_out.append("(\n")
         else:
-            file_out.write("module " + self.moduleName + " (\n")
-
-        # inputs
-        for port in self.ports["input"]:
-            file_out.write("\t")
-            port.write_declaration(file_out, indentObj)
-            if not port == self.ports["input"][-1] or self.ports["output"] or self.ports["inout"]:
-                file_out.write(",")
-            file_out.write("\n")
-
-        if self.ports["input"]: writeBlankLines(file_out,1)
-        
-        # outputs
-        for port in self.ports["output"]:
-            file_out.write("\t")
-            port.write_declaration(file_out, indentObj)
-            if not port == self.ports["output"][-1] or self.ports["inout"]:
-                file_out.write(",")
-            file_out.write("\n")
+            l_out.append("module " + self.moduleName + " (\n")
 
-        if self.ports["output"]: writeBlankLines(file_out,1)
-
-        # inout
-        for port in self.ports["inout"]:
-            file_out.write("\t")
-            port.write_declaration(file_out, indentObj)
-            if not port == self.ports["inout"][-1]:
-                file_out.write(",")
-            file_out.write("\n")
+        # inputs, outputs, inouts
+        l_out.append( self.__render_list( [ [ port.get_declaration(indentObj) for port in self.ports[portType] ] for portType in ("input", "output", "inout") ] ) )
 
-        file_out.write(");\n")
+        l_out.append(");\n")
 
         #### output register instantiations ####
 
         if self.outputReg:
 
-            writeBlankLines(file_out,1)
-            file_out.write("\t// output registers\n")
+            l_out.append( get_blankLines(1) )
+            l_out.append("\t// output registers\n")
             for port in self.ports["output"]:
-                file_out.write("\t")
-                port.write_variable(file_out, indentObj, language)
-                file_out.write(";\n")
+                l_out.append("\t")
+                l_out.append( port.get_variable(indentObj, language) )
+                l_out.append(";\n")
         
         #### module body ####
-        writeBlankLines(file_out,3)
+        l_out.append( get_blankLines(3) )
 
         # end module
-        file_out.writelines("endmodule\n")
+        l_out.append("endmodule\n")
 
+        return "".join(l_out)
 
-    def write_instantiation(self, file_out, indentObj: IndentObj):
-        """writes a module istantiation to file_out (must be open!) 
 
-        :file_out: output file; may be passed as string or as file object
+    def render_instantiation(self, indentObj: IndentObj):
+        """renders a module istantiation
+
         :indentObj: IndentObj to handle indentations
+        :returns: instantiation as string
         """
-        if file_out.closed:
-            print("file_out must be open!")
-            return None
+        l_out = []
 
-        #### write module interface ####
+        #### module interface ####
 
         # parameters
         if self.l_parameters:
-            file_out.write(self.moduleName + " #(\n")
-            for parameter in self.l_parameters:
-                file_out.write("\t")
-                parameter.write_instantiation(file_out, indentObj)
-                if not parameter == self.l_parameters[-1]:
-                    file_out.write(",")
-                file_out.write("\n")
-
-            file_out.write(") mod_" + self.moduleName + " (\n")
+            l_out.append(self.moduleName + " #(\n")
+            l_out.append( self.__render_list( [ [ parameter.get_instantiation(indentObj) for parameter in self.l_parameters ] ], b_blankLines=False ) )
+            l_out.append(") mod_" + self.moduleName + " (\n")
         else:
-            file_out.write(self.moduleName + " mod_" + self.moduleName + " (\n")
+            l_out.append(self.moduleName + " mod_" + self.moduleName + " (\n")
 
-        # inputs
-        for port in self.ports["input"]:
-            file_out.write("\t")
-            port.write_instantiation(file_out, indentObj)
-            if not port == self.ports["input"][-1] or self.ports["output"] or self.ports["inout"]:
-                file_out.write(",")
-            file_out.write("\n")
+        # inputs, outputs, inouts
+        l_out.append( self.__render_list( [ [ port.get_instantiation(indentObj) for port in self.ports[portType] ] for portType in ("input", "output", "inout") ] ) )
 
-        if self.ports["input"]: writeBlankLines(file_out,1)
-        
-        # outputs
-        for port in self.ports["output"]:
-            file_out.write("\t")
-            port.write_instantiation(file_out, indentObj)
-            if not port == self.ports["output"][-1] or self.ports["inout"]:
-                file_out.write(",")
-            file_out.write("\n")
+        l_out.append(");\n")
 
-        if self.ports["output"]: writeBlankLines(file_out,1)
+        return "".join(l_out)
 
-        # inout
-        for port in self.ports["inout"]:
-            file_out.write("\t")
-            port.write_instantiation(file_out, indentObj)
-            if not port == self.ports["inout"][-1]:
-                file_out.write(",")
-            file_out.write("\n")
 
-        file_out.write(");\n")
+    @staticmethod
+    def __render_list(l_groups, b_blankLines=True):
+        """renders the items of a port/parameter list, one per line, comma-separated (no comma after the very last item)
+        The separators are determined per group instead of comparing every item with the last one, so rendering is linear in the number of items.
+
+        :l_groups: list of groups (e.g. inputs, outputs, inouts), each a list of rendered items
+        :b_blankLines: insert a blank line after every non-empty group except the last group of l_groups
+        :returns: list as string
+        """
+        l_out = []
+        # index of the last group containing items
+        lastGroup = max( [ i for i, l_items in enumerate(l_groups) if l_items ], default=-1 )
+        for i, l_items in enumerate(l_groups):
+            if l_items:
+                l_out.append("\t")
+                l_out.append( ",\n\t".join(l_items) )
+                l_out.append(",\n" if i < lastGroup else "\n")
+                if b_blankLines and i < len(l_groups) - 1:
+                    l_out.append( get_blankLines(1) )
+        return "".join(l_out)
+
+
+    def render_includeGuards(self, s_topBottom):
+        """renders include guards for top or bottom of file
+
+        :s_topBottom: specify if top or bottom ("`ifndef ..." or "`endif ...") shall be rendered, valid values: "top"/"bottom"
+        :returns: include guard lines as string, empty string for an invalid s_topBottom
+        """
+        if s_topBottom == "top":
+            return "`ifndef " + self.moduleName.upper() + "_H\n" + "`define " + self.moduleName.upper() + "_H\n"
+
+        elif s_topBottom == "bottom":
+            return "`endif\n"
+
+        else:
+            print("invalid file position declarator: " + s_topBottom)
+            return ""
+
+
+    def write_declaration(self, file_out, indentObj: IndentObj, language: HDL_Enum=HDL_Enum.VERILOG):
+        """writes a complete module declaration (see render_declaration) to file_out (must be open!) 
+
+        :file_out: output file object
+        :indentObj: IndentObj to handle indentations
+        :language: HDL_Enum object to specify HDL language
+        """
+        if file_out.closed:
+            print("file_out must be open!")
+            return None
+
+        file_out.write( self.render_declaration(indentObj, language) )
+
+
+    def write_instantiation(self, file_out, indentObj: IndentObj):
+        """writes a module istantiation (see render_instantiation) to file_out (must be open!) 
+
+        :file_out: output file object
+        :indentObj: IndentObj to handle indentations
+        """
+        if file_out.closed:
+            print("file_out must be open!")
+            return None
+
+        file_out.write( self.render_instantiation(indentObj) )
 
 
     def write_includeGuards(self, file_out, s_topBottom):
-        """writes include guards for top or bottom of file
+        """writes include guards for top or bottom of file (see render_includeGuards)
 
         :file_out:  opened output file
         :s_topBottom: specify if top or bottom ("`ifndef ..." or "`endif ...") shall be written, valid values: "top"/"bottom"
         """
         # no file checking here, just a helper function
-        if s_topBottom == "top":
-            file_out.write("`ifndef " + self.moduleName.upper() + "_H\n")
-            file_out.write("`define " + self.moduleName.upper() + "_H\n")
+        file_out.write( self.render_includeGuards(s_topBottom) )
 
-        elif s_topBottom == "bottom":
-            file_out.write("`endif\n")
 
+    @classmethod
+    def __scanHeader(cls, it_tokens):
+        """reads tokens up to the first module declaration and parses its header (name, parameter list and port list)
+        Supported are ANSI-style headers, e.g. "module name #(parameter A = 1, B) (input [A-1:0] a, b, output reg c);"
+
+        :it_tokens: token iterator (see VerilogTokenizer.tokenize)
+        :returns: VerilogModule object if a module declaration is found, else None
+        """
+        # look for module keyword
+        for token in it_tokens:
+            if token in ("module", "macromodule"):
+                break
         else:
-            print("invalid file position declarator: " + s_topBottom)
+            # end of file reached without module declaration found
             return None
 
+        moduleName = next(it_tokens, None)
+        if moduleName in ("static", "automatic"):
+            moduleName = next(it_tokens, None)
+        if not moduleName:
+            print("Module declaration reached end of file! Exiting with syntax error")
+            sys.exit(1)
+
+        l_parameters = []
+        l_ports = []
+
+        for token in it_tokens:
+            if token == "#":
+                # parameter block
+                if next(it_tokens, None) != "(":
+                    print("Parameter declaration of module " + moduleName + " is invalid! Exiting with syntax error")
+                    sys.exit(1)
+                l_parameters = cls.__parse_parameters( cls.__read_list(it_tokens) )
+            elif token == "(":
+                # port block -> end of relevant header part
+                l_ports = cls.__parse_ports( cls.__read_list(it_tokens) )
+                break
+            elif token == ";":
+                # module without port list
+                break
+            elif token == "import":
+                # package import in the header -> skip up to its terminating semicolon
+                for token in it_tokens:
+                    if token == ";":
+                        break
+
+        return cls( 
+                moduleName = moduleName, 
+                ports = l_ports,
+                parameters = l_parameters )
+
 
     @classmethod
-    def __scanParameters(cls, file_in):
-        """scans a module declaration for parameters
+    def __read_list(cls, it_tokens):
+        """reads the items of a parameter or port list whose opening parenthesis was already read
+        Each item is split in its declaration part and its (optional) assignment, and the declared identifier (last top-level identifier before the assignment) is located on the way.
 
-        :file_in: input file, must be read-open with file-pointer at the line before(!) the module declaration 
-        :returns: list of found VerilogParameter objects
+        :it_tokens: token iterator, positioned after the opening parenthesis; afterwards positioned after the closing parenthesis
+        :returns: list of items (separated by top-level commas), each item as tuple (list of declaration tokens, index of the identifier in it (-1 if none), list of assigned tokens)
         """
-        l_parameters = [] 
-        
-        currentLine = file_in.readline()
-        blockTokens = cls.__get_paramPortDeclTokens(currentLine) 
-        
-        # read lines until parameter or port block start is detected
-        while not blockTokens or not blockTokens["paramBegin"]:
-            if blockTokens and (blockTokens["portBegin"] or blockTokens["modDeclarationEnd"]):
-                # no parameter block -> go back one line to allow next scanner to start in same line
-                file_in.seek( file_in.tell() - len(currentLine) )
-                return l_parameters
-            else:
-                currentLine = file_in.readline()
-                blockTokens = cls.__get_paramPortDeclTokens(currentLine) 
-            
-            # prevent endless loop in case of errorneous code
-            if not currentLine:
-                print("Declaration block detection reached end of file! Exiting with syntax error")
-                sys.exit(1)
-
-        # parameter block begin found
-        while True:
-            l_parameters.extend( VerilogParameter.scan(currentLine) ) 
-            if blockTokens and blockTokens["paramOrPortEnd"]:
-                # parameter block ended -> go back one line to allow next scanner to start in same line
-                file_in.seek( file_in.tell() - len(currentLine) )
-                return l_parameters
-            else:
-                currentLine = file_in.readline()
-                blockTokens = cls.__get_paramPortDeclTokens(currentLine) 
-
-            # prevent endless loop in case of errorneous code
-            if not currentLine:
-                print("Parameter detection reached end of file! Exiting with syntax error")
-                sys.exit(1)
+        identifierStart = VerilogTokenizer.get_identifierStart()
+        declarationKeywords = cls.__declarationKeywords
+
+        l_items = []
+        l_declaration = []
+        l_assigned = None
+        # tokens of the current item are appended to l_current (declaration, after "=" the assignment)
+        l_current = l_declaration
+        i_identifier = -1
+        depth = 0
+        for token in it_tokens:
+            if token in ("(", "[", "{"):
+                depth += 1
+            elif token in (")", "]", "}"):
+                if depth == 0:
+                    l_items.append( (l_declaration, i_identifier, l_assigned if l_assigned else []) )
+                    return l_items
+                depth -= 1
+            elif depth == 0:
+                if token == ",":
+                    l_items.append( (l_declaration, i_identifier, l_assigned if l_assigned else []) )
+                    l_declaration = []
+                    l_assigned = None
+                    l_current = l_declaration
+                    i_identifier = -1
+                    continue
+                elif l_assigned is None:
+                    if token == "=":
+                        l_assigned = []
+                        l_current = l_assigned
+                        continue
+                    elif token[0] in identifierStart and token not in declarationKeywords:
+                        i_identifier = len(l_declaration)
+            l_current.append(token)
+
+        # prevent endless loop in case of errorneous code
+        print("Declaration block detection reached end of file! Exiting with syntax error")
+        sys.exit(1)
 
 
     @classmethod
-    def __scanPorts(cls, file_in):
-        """scans a module declaration for ports
+    def __parse_parameters(cls, l_items):
+        """creates VerilogParameter objects from the items of a parameter list
 
-        :file_in: input file, must be read-open with file-pointer at the line before(!) the beginning of the port declaration
-        :returns: list of found VerilogPort objects 
+        :l_items: list items as returned by __read_list
+        :returns: list of VerilogParameter objects
         """
-        l_ports = [] 
-        
-        currentLine = file_in.readline()
-        blockTokens = cls.__get_paramPortDeclTokens(currentLine) 
-        
-        # read lines until port block start is detected
-        while not blockTokens or not blockTokens["portBegin"]:
-            if blockTokens and blockTokens["modDeclarationEnd"]:
-                # no port block -> go back one line to allow next scanner to start in same line
-                file_in.seek( file_in.tell() - len(currentLine) )
-                return l_ports
-            else:
-                currentLine = file_in.readline()
-                blockTokens = cls.__get_paramPortDeclTokens(currentLine) 
-
-        while True:
-            l_ports.extend( VerilogPort.scan(currentLine) ) 
-            if blockTokens and (
-                    (
-                            blockTokens["paramOrPortEnd"] and not 
-                            blockTokens["paramBegin"]
-                    ) or 
-                            blockTokens["paramAndPortEnd"] ) :
-                # port block ended -> go back one line to allow next scanner to start in same line
-                file_in.seek( file_in.tell() - len(currentLine) )
-                return l_ports
-            else:
-                currentLine = file_in.readline()
-                blockTokens = cls.__get_paramPortDeclTokens(currentLine) 
-
-            # just to prevent endless loop in case of errorneous code
-            if not currentLine:
-                print("Port detection reached end of file! Exiting with syntax error")
-                sys.exit(1)
+        l_parameters = []
+        b_localparam = False
+        for l_declaration, i_identifier, l_default in l_items:
+            # local parameters can not be overridden -> not part of the interface
+            if l_declaration and l_declaration[0] in ("parameter", "localparam"):
+                b_localparam = l_declaration[0] == "localparam"
+            if b_localparam:
+                continue
+            if i_identifier >= 0:
+                l_parameters.append( VerilogParameter(l_declaration[i_identifier], VerilogTokenizer.join_tokens(l_default)) )
+        return l_parameters
 
 
     @classmethod
-    def __get_paramPortDeclTokens(cls, s_lineIn):
-        """looks for begin/end identifiers for port ar parameter declaration blocks in s_lineIn
+    def __parse_ports(cls, l_items):
+        """creates VerilogPort objects from the items of an (ANSI-style) port list
+        Items without port type (e.g. "b" in "input [7:0] a, b") inherit port type and width of the previous item. Items of non-ANSI port lists (only identifiers) are skipped.
 
-        :s_lineIn: one line of code
-        :returns: dictionary containing boolean values for paramBegin, paramEnd, portBegin, portEnd
+        :l_items: list items as returned by __read_list
+        :returns: list of VerilogPort objects
         """
-         
-        # regex to identify beginning/ending parameter and port declaration blocks by boolean combinations of the 4 l_blockTokens values
-        __re_paramPortDeclBegin = r"(#\(|\(|\)|;)"
-        l_blockTokens = re.findall( __re_paramPortDeclBegin, s_lineIn )
-
-        if l_blockTokens:
-            return  {   "paramBegin": "#(" in l_blockTokens,
-                        "portBegin": "(" in l_blockTokens, 
-                        "paramOrPortEnd": ")" in l_blockTokens,
-                        "paramAndPortEnd": l_blockTokens.count(")") == 2,
-                        "modDeclarationEnd": ";" in l_blockTokens, 
-                    }
-        else:
-            return None
+        l_ports = []
+        portType = None
+        s_portWidthDeclaration = None
+        # port widths are usually repeated many times -> join each distinct width only once
+        d_widths = {}
+        for l_declaration, i_identifier, l_default in l_items:
+            if i_identifier < 0:
+                continue
+
+            # new port type and/or data type -> determine (packed) width in front of the identifier
+            if i_identifier > 0:
+                if l_declaration[0] in cls.__portTypes:
+                    portType = l_declaration[0]
+                l_width = []
+                depth = 0
+                for token in l_declaration[:i_identifier]:
+                    if depth == 0 and len(token) > 1 and token[0] == "[":
+                        # simple range token
+                        l_width.append(token)
+                        continue
+                    if token == "[":
+                        depth += 1
+                    if depth > 0:
+                        l_width.append(token)
+                    if token == "]":
+                        depth -= 1
+                if l_width:
+                    t_width = tuple(l_width)
+                    s_portWidthDeclaration = d_widths.get(t_width)
+                    if not s_portWidthDeclaration:
+                        s_portWidthDeclaration = d_widths[t_width] = VerilogTokenizer.join_tokens(l_width)
+                else:
+                    s_portWidthDeclaration = None
+
+            if portType:
+                l_ports.append( VerilogPort(portType, l_declaration[i_identifier], s_portWidthDeclaration) )
+        return l_ports
+
 
-        
     @classmethod
-    def generate_instantiationFromSearch(cls, moduleName, configObj, fileDescriptor=None, indentObj=None ):
-        """searches the configObj's searchPaths for an instantiation matching moduleName, queries if multiple module files were found and afterwords either writes an instantiation to file_out or, if empty, simply prints it to be redirected e.g. via the text editor
+    def generate_instantiationFromSearch(cls, moduleName, configObj, fileDescriptor=None, indentObj=None, moduleNameInFile="", file_alternatives=None ):
+        """searches the configObj's searchPaths for an instantiation matching moduleName and afterwords either writes an instantiation to file_out or, if empty, simply prints it to be redirected e.g. via the text editor
+        If multiple module files are found, the best ranked one is instantiated without asking (see VerilogModuleIndex.rank_files: working directory first, then the search paths in their order, shallower directories, newer files), so an editor reading the output never waits for input.
 
         :moduleName: name of the module (may optionally contain ".v/.sv" ending)
         :configObj: Verilog_codeGen_config whose searchPaths is used
         :indentObj: IndentObj which overrides configObj.tabwidth
+        :moduleNameInFile: module to be instantiated if the found file contains several modules, defaults to the first one
+        :file_alternatives: writable text file (e.g. sys.stderr) receiving the selection as one JSON line {"module", "selected", "alternatives" (all other matching files, best ranked first)}
+        :returns: tuple (selected module file, VerilogFile) if an instantiation was written, otherwise None
         """
         if not indentObj:
             indentObj = IndentObj(tabwidth = configObj.tabwidth if configObj.tabwidth else 4)
 
-        # determine module to be instantiated
-        l_foundModules = cls.__find_moduleFiles(moduleName, configObj)
+        from VerilogModuleDB import VerilogModuleDB
+        from VerilogModuleCache import VerilogModuleCache
+        moduleDB = VerilogModuleDB.load( configObj.moduleDB, configObj.includeDirs )
+
+        # determine module to be instantiated (found files are ranked, best first)
+        l_foundModules = cls.__find_moduleFiles(moduleName, configObj, moduleDB)
 
         if not l_foundModules:
-            print("No modules found for module name '" + moduleName + "'!")
             return None
-        elif len(l_foundModules) == 1:
-            s_selectedModule = l_foundModules[0]
-        else:
-            print("Multiple module were found:")
-            count = 0
-            for moduleFile in l_foundModules:
-                print( str(count) + ") " + moduleFile )
-                count += 1
-                
-            i_selectedModule = input("Please enter the number of the desired module (any other character to abort):")
-            
-            try:
-                if int(i_selectedModule) in range(len(l_foundModules)):
-                    # valid module selection
-                    s_selectedModule = l_foundModules[int(i_selectedModule)]
-                else:
-                    return None
-            except Exception:
-                return None
-
-        # generate module object from s_selectedModule 
-        selectedModule = cls.scan( s_selectedModule )
+        s_selectedModule = l_foundModules[0]
+        if file_alternatives:
+            file_alternatives.write( json.dumps( { "module": moduleName, "selected": s_selectedModule, "alternatives": l_foundModules[1:] } ) + "\n" )
+            file_alternatives.flush()
+
+        # generate module object from s_selectedModule (served by the module database or the module cache if unchanged since the last scan)
+        selectedFile = moduleDB.scan( s_selectedModule, moduleNameInFile ) if moduleDB else None
+        if not selectedFile:
+            moduleCache = VerilogModuleCache.load( configObj.moduleCacheSize, configObj.includeDirs )
+            selectedFile = moduleCache.scan( s_selectedModule, moduleNameInFile )
+            moduleCache.prune()
+        if not selectedFile:
+            print("No module declaration " + (moduleNameInFile + " " if moduleNameInFile else "") + "found in " + s_selectedModule + "!")
+            return None
+        selectedModule = selectedFile.verilogModule
 
         # write instantiation to file_out or print it
         if fileDescriptor:
@@ -404,36 +505,52 @@ class VerilogModule():
         else:
             file_out = sys.stdout
 
-        selectedModule.write_instantiation( file_out, indentObj )
+        s_instantiation = selectedModule.render_instantiation(indentObj)
+        with VerilogCodeGen_Stats.phase("write"):
+            file_out.write( s_instantiation )
+        VerilogCodeGen_Stats.count("bytesWritten", len(s_instantiation.encode("utf-8")))
+        return (s_selectedModule, selectedFile)
             
 
     @classmethod
-    def __find_moduleFiles(cls, moduleName, configObj):
+    def __find_moduleFiles(cls, moduleName, configObj, moduleDB=None):
         """recursively searches the moduleName in current working directory and in configObj.searchPaths
+        The search is served by the persistent VerilogModuleIndex, which only rereads directories that changed since the last search. Excluded directories, maximum depth etc. are taken from configObj (see Verilog_codeGen_config.get_searchOptions).
+        A module database (see VerilogModuleDB) replaces the walk of the search paths only: the working directory is always searched, both results are ranked together, so the database never changes which file is selected. The search paths are walked if the database does not know the module (e.g. a file added since its last update).
 
-        :moduleName: name of the module (may optionally contain ".v/.sv" ending)
+        :moduleName: name of the module (may optionally contain ".v/.sv" ending) or path of a module file (containing "/")
         :configObj: Verilog_codeGen_config whose searchPaths is used
-        :returns: list of found matches
+        :moduleDB: VerilogModuleDB object (configObj.moduleDB) or None
+        :returns: list of found matches, best ranked first
         """
-        # determine string to be searched dependant on file ending if given
-        if re.search(r"(\.v|\.sv)\s*$", moduleName):
-            re_searchModule = r"^" + moduleName
-        else:
-            re_searchModule = r"^" + moduleName + r"(\.v|\.sv)\s*$"
+        # explicit file path (e.g. one of the alternatives of a previous search) -> no search
+        if "/" in moduleName and os.path.isfile(moduleName):
+            return [ os.path.abspath(moduleName) ]
+
+        l_roots = [os.getcwd()] + list(configObj.searchPaths)
+        moduleIndex = VerilogModuleIndex.load()
+        d_searchOptions = configObj.get_searchOptions()
 
         l_foundModules = []
+        if moduleDB:
+            l_foundModules = moduleIndex.find( moduleName, l_roots[:1], **d_searchOptions )
+            # (searchStopAtUniqueMatch: a unique match in the working directory ends the search, as for the walk)
+            if not (d_searchOptions["b_stopAtUniqueMatch"] and len(l_foundModules) == 1):
+                l_dbModules = moduleDB.find( moduleName, l_roots )
+                if l_dbModules:
+                    l_foundModules = VerilogModuleIndex.rank_files( set(l_foundModules).union(l_dbModules), l_roots )
+                else:
+                    l_foundModules = []
+        if not l_foundModules:
+            l_foundModules = moduleIndex.find( moduleName, l_roots, **d_searchOptions )
+        moduleIndex.save()
 
-        # iterate through current working directory to find modules
-        for (path, directories, filenames) in os.walk( os.getcwd() ):
-            # covering the unusual case that a module exists in both Verilog and SystemVerilog
-            l_foundModules.extend(
-                    [ path + "/" + filename for filename in filenames if re.search(re_searchModule, filename) ] )
-
-        # iterate through searchPaths and find re_searchModule recursively
-        for searchPath in configObj.searchPaths:
-            for (path, directories, filenames) in os.walk(searchPath):
-                # covering the unusual case that a module exists in both Verilog and SystemVerilog
-                l_foundModules.extend(
-                        [ path + "/" + filename for filename in filenames if re.search(re_searchModule, filename) ] )
+        if not l_foundModules:
+            print("No modules found for module name '" + moduleName + "'!")
+            # suggestions from the index just refreshed by find (-> no second walk)
+            d_searchOptions.pop("b_stopAtUniqueMatch")
+            l_similar = moduleIndex.find_similar( moduleName, l_roots, maxResults=5, b_refresh=False, **d_searchOptions )
+            if l_similar:
+                print("Did you mean: " + ", ".join( s_similarName for s_similarName, l_files in l_similar ) + "?")
         
         return l_foundModules
@@ -0,0 +1,261 @@
+
+#
+# persistent cache of scanned module interfaces
+#
+
+import os, json, hashlib
+from VerilogFile import VerilogFile
+from Verilog_codeGen_config import Verilog_codeGen_config
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+class VerilogModuleCache:
+    """size-bounded persistent cache of scanned Verilog/SystemVerilog files (module interface, timescale, language)
+    Every scanned file gets its own entry file in the cache directory (file name: hash of the absolute source path), so a lookup reads exactly one small file. Files containing several modules additionally store the byte offsets of all module declarations, so any module is scanned straight from its header. An entry is valid if size and mtime of the source still match; if only the mtime changed (e.g. after a checkout), the content hash decides. The hash is computed on the first mtime change of a file with unchanged size (that change still rescans the file), never on a cold scan, so huge files are not read completely just for the cache. Modules whose macros were expanded from `include files are rescanned if one of these headers changed (or the include directories differ). Entries are touched on every hit, prune() removes the least recently used ones once the cache exceeds its size limit.
+    """
+
+    # name of the cache directory inside Verilog_codeGen_config.get_cacheDir()
+    __s_cacheDirName = "modules"
+    # version of the entry format and of the scanner producing it, entries with a different version are rescanned
+    __cacheVersion = 6
+
+
+    def __init__(self, s_cacheDir="", maxSize=64, l_includeDirs=()):
+        """
+        :s_cacheDir: directory holding the entry files, if empty caching is disabled
+        :maxSize: maximum size of all entry files in MB
+        :l_includeDirs: directories searched for `include files (see VerilogFile.scan)
+        """
+        self.__s_cacheDir = s_cacheDir
+        self.__maxSize = maxSize * 1024 * 1024
+        self.__l_includeDirs = [ os.path.abspath(s_dir) for s_dir in l_includeDirs ]
+        self.__b_modified = False
+
+
+    def __str__(self):
+        return "module cache: " + (self.__s_cacheDir if self.__s_cacheDir else "(disabled)") + ", max size: " + str(self.__maxSize // (1024 * 1024)) + " MB"
+
+
+    @classmethod
+    def load(cls, maxSize=64, l_includeDirs=()):
+        """creates the module cache in Verilog_codeGen_config.get_cacheDir()
+
+        :maxSize: maximum cache size in MB (-> Verilog_codeGen_config.moduleCacheSize), 0 disables the cache
+        :l_includeDirs: directories searched for `include files (-> Verilog_codeGen_config.includeDirs)
+        :returns: VerilogModuleCache object
+        """
+        s_cacheDir = Verilog_codeGen_config.get_cacheDir() if maxSize > 0 else ""
+        if s_cacheDir:
+            s_cacheDir = s_cacheDir + "/" + cls.__s_cacheDirName
+            try:
+                os.makedirs(s_cacheDir, exist_ok=True)
+            except OSError:
+                s_cacheDir = ""
+        return cls(s_cacheDir, maxSize, l_includeDirs)
+
+
+    def scan(self, s_fileIn, moduleName=""):
+        """returns the VerilogFile for s_fileIn from the cache, scanning (and caching) it only if it changed
+
+        :s_fileIn: Verilog/SystemVerilog source file
+        :moduleName: module to be scanned in files containing several modules, if empty the first module declaration (see VerilogFile.scan)
+        :returns: VerilogFile object if successful, otherwise None (same as VerilogFile.scan)
+        """
+        # (no module name given on the command line -> None)
+        moduleName = moduleName if moduleName else ""
+        with VerilogCodeGen_Stats.phase("scan"):
+            s_entryFile, d_entry = self.__get_entry(s_fileIn)
+            if d_entry is None:
+                return VerilogFile.scan(s_fileIn, moduleName, self.__l_includeDirs)
+
+            if moduleName in d_entry["files"] and self.__check_includes(d_entry["files"][moduleName]):
+                VerilogCodeGen_Stats.count("cacheHits")
+                return VerilogFile.fromDict( d_entry["files"][moduleName] )
+
+            if not moduleName:
+                verilogFile = VerilogFile.scan(s_fileIn, l_includeDirs=self.__l_includeDirs)
+            else:
+                # the offsets of all modules are determined once, afterwards every module is scanned straight from its offset
+                if "modules" not in d_entry:
+                    d_entry["modules"] = VerilogFile.scan_moduleDeclarations(s_fileIn)
+                verilogFile = None
+                for s_moduleName, offset, s_timescale in d_entry["modules"]:
+                    if s_moduleName == moduleName:
+                        verilogFile = VerilogFile.scan_moduleAt(s_fileIn, offset, s_timescale, self.__l_includeDirs)
+                        break
+
+            if verilogFile:
+                d_entry["files"][moduleName] = verilogFile.to_dict()
+            self.__write_entry(s_entryFile, d_entry)
+            return verilogFile
+
+
+    def get_moduleDeclarations(self, s_fileIn):
+        """returns all module declarations of s_fileIn from the cache (see VerilogFile.scan_moduleDeclarations)
+
+        :s_fileIn: Verilog/SystemVerilog source file
+        :returns: list of tuples (module name, byte offset, timescale)
+        """
+        with VerilogCodeGen_Stats.phase("scan"):
+            s_entryFile, d_entry = self.__get_entry(s_fileIn)
+            if d_entry is None:
+                return VerilogFile.scan_moduleDeclarations(s_fileIn)
+
+            if "modules" in d_entry:
+                VerilogCodeGen_Stats.count("cacheHits")
+            else:
+                d_entry["modules"] = VerilogFile.scan_moduleDeclarations(s_fileIn)
+                self.__write_entry(s_entryFile, d_entry)
+            return [ tuple(l_module) for l_module in d_entry["modules"] ]
+
+
+    def __get_entry(self, s_fileIn):
+        """reads the cache entry of s_fileIn, an entry of a changed source file is replaced by an empty one
+        An entry contains the scanned files per module name ("" for the first module) and, once determined, the module declarations of the file.
+
+        :s_fileIn: Verilog/SystemVerilog source file
+        :returns: tuple (entry file, entry dictionary), entry dictionary is None if caching is disabled or s_fileIn can not be accessed
+        """
+        if not self.__s_cacheDir:
+            return (None, None)
+
+        s_path = os.path.abspath(s_fileIn)
+        try:
+            stat = os.stat(s_path)
+        except OSError:
+            return (None, None)
+
+        s_entryFile = self.__s_cacheDir + "/" + hashlib.sha1(s_path.encode("utf-8")).hexdigest() + ".json"
+        d_entry = self.__read_entry(s_entryFile, s_path)
+
+        # module headers may depend on the include directories
+        if d_entry and d_entry.get("includeDirs") != self.__l_includeDirs:
+            d_entry = None
+
+        #### valid by size and mtime ####
+        if d_entry and d_entry["size"] == stat.st_size and d_entry["mtime"] == stat.st_mtime_ns:
+            self.__touch(s_entryFile)
+            return (s_entryFile, d_entry)
+
+        #### valid by content ####
+        # (the content hash is only computed if the mtime of a file with unchanged size changed, a cold scan never reads the whole file)
+        s_hash = None
+        if d_entry and d_entry["size"] == stat.st_size:
+            s_hash = self.__get_hash(s_path)
+            if d_entry["hash"] == s_hash:
+                d_entry["mtime"] = stat.st_mtime_ns
+                self.__write_entry(s_entryFile, d_entry)
+                return (s_entryFile, d_entry)
+
+        #### changed (or new) source file ####
+        return (s_entryFile, { "version": type(self).__cacheVersion, "path": s_path,
+                                "size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": s_hash,
+                                "includeDirs": self.__l_includeDirs, "files": {} })
+
+
+    def prune(self, b_always=False):
+        """removes least recently used entries until the cache does not exceed its size limit
+
+        :b_always: if False, the cache is only checked if entries were written by this object (e.g. set to True after parallel workers wrote entries)
+        """
+        if not self.__s_cacheDir or not (self.__b_modified or b_always):
+            return
+
+        l_entries = []
+        totalSize = 0
+        try:
+            with os.scandir(self.__s_cacheDir) as it_entries:
+                for entry in it_entries:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    l_entries.append( (stat.st_mtime_ns, stat.st_size, entry.path) )
+                    totalSize += stat.st_size
+        except OSError:
+            return
+
+        # oldest entries first
+        l_entries.sort()
+        for mtime, size, s_entryFile in l_entries:
+            if totalSize <= self.__maxSize:
+                break
+            try:
+                os.remove(s_entryFile)
+            except OSError:
+                pass
+            totalSize -= size
+
+        self.__b_modified = False
+
+
+    def __read_entry(self, s_entryFile, s_path):
+        """reads a cache entry
+
+        :returns: entry dictionary, None if the entry does not exist or is invalid
+        """
+        try:
+            with open(s_entryFile, "r") as file_in:
+                d_entry = json.load(file_in)
+        except (OSError, ValueError):
+            return None
+        # different version or (very unlikely) hash collision of two paths
+        if d_entry.get("version") != type(self).__cacheVersion or d_entry.get("path") != s_path:
+            return None
+        return d_entry
+
+
+    def __write_entry(self, s_entryFile, d_entry):
+        """writes a cache entry (to a temporary file first, so concurrent readers never see a partial entry)
+        """
+        s_tmpFile = s_entryFile + "." + str(os.getpid()) + ".tmp"
+        try:
+            # (json.dumps uses the C encoder, json.dump does not)
+            with open(s_tmpFile, "w") as file_out:
+                file_out.write( json.dumps(d_entry) )
+            os.replace(s_tmpFile, s_entryFile)
+            self.__b_modified = True
+        except OSError:
+            try:
+                os.remove(s_tmpFile)
+            except OSError:
+                pass
+
+
+    @staticmethod
+    def __check_includes(d_file):
+        """checks whether the `include files a cached scan result depends on are unchanged
+
+        :d_file: cached file dictionary (see VerilogFile.to_dict)
+        :returns: bool
+        """
+        for s_path, mtime in d_file.get("includes", ()):
+            try:
+                if os.stat(s_path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+
+    @staticmethod
+    def __touch(s_entryFile):
+        """marks an entry as recently used
+        """
+        try:
+            os.utime(s_entryFile)
+        except OSError:
+            pass
+
+
+    @staticmethod
+    def __get_hash(s_path):
+        """computes the content hash of a source file
+
+        :returns: hex digest as string
+        """
+        fileHash = hashlib.sha1()
+        with open(s_path, "rb") as file_in:
+            for chunk in iter(lambda: file_in.read(1024 * 1024), b""):
+                fileHash.update(chunk)
+        return fileHash.hexdigest()
@@ -0,0 +1,353 @@
+
+#
+# shared SQLite database of module files and scanned module interfaces (e.g. one database for a whole team or CI)
+#
+
+import os, re, json, sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from VerilogFile import VerilogFile
+from VerilogModuleIndex import VerilogModuleIndex
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+class VerilogModuleDB:
+    """SQLite database of all module files below a set of root directories (typically the searchPaths) and the interfaces of all their modules (tables files, modules, ports, parameters, plus a full-text index on module names)
+    A single updater (update, e.g. run by a cron or CI job) keeps the database fresh: only new and changed files (size, mtime or `include files) are rescanned, all changes of a run are committed in one transaction. The database is kept in WAL mode, so any number of readers (module lookups, testbench generation) query it concurrently while it is updated and always see a consistent state.
+    Readers never trust the database blindly: a file which changed since the last update (size or mtime) is not served, so callers fall back to scanning the file itself (see scan).
+    """
+
+    # version of the schema and of the scanner producing the interfaces, a database with a different version is ignored by readers and rebuilt by the updater
+    __schemaVersion = 1
+    # seconds a connection waits for a lock held by another connection
+    __timeout = 30
+    # pattern to match module files (-> group(1): module name)
+    __re_moduleFile = re.compile(r"^(.+)\.(v|sv)$")
+    __l_schema = [
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+        "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, fileName TEXT NOT NULL, size INTEGER, mtime INTEGER, language TEXT)",
+        "CREATE INDEX IF NOT EXISTS files_fileName ON files (fileName)",
+        "CREATE TABLE IF NOT EXISTS modules (id INTEGER PRIMARY KEY, fileId INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE, position INTEGER, name TEXT NOT NULL, offset INTEGER, timescale TEXT, includes TEXT)",
+        "CREATE INDEX IF NOT EXISTS modules_name ON modules (name)",
+        "CREATE INDEX IF NOT EXISTS modules_fileId ON modules (fileId)",
+        "CREATE TABLE IF NOT EXISTS ports (moduleId INTEGER NOT NULL REFERENCES modules (id) ON DELETE CASCADE, position INTEGER, portType TEXT, identifier TEXT, portWidth TEXT)",
+        "CREATE INDEX IF NOT EXISTS ports_moduleId ON ports (moduleId)",
+        "CREATE TABLE IF NOT EXISTS parameters (moduleId INTEGER NOT NULL REFERENCES modules (id) ON DELETE CASCADE, position INTEGER, identifier TEXT, defaultValue TEXT)",
+        "CREATE INDEX IF NOT EXISTS parameters_moduleId ON parameters (moduleId)",
+        # full-text index on module names (rowid: modules.id), names are split into tokens at underscores (-> "fifo" finds axi_fifo_ctrl)
+        "CREATE VIRTUAL TABLE IF NOT EXISTS moduleNames USING fts5 (name)" ]
+
+
+    def __init__(self, connection, s_dbFile, l_includeDirs=()):
+        """
+        :connection: open sqlite3 connection
+        :s_dbFile: database file
+        :l_includeDirs: directories searched for `include files (see VerilogFile.scan), interfaces scanned with other include directories are not served
+        """
+        self.__connection = connection
+        self.__s_dbFile = s_dbFile
+        self.__l_includeDirs = [ os.path.abspath(s_dir) for s_dir in l_includeDirs ]
+        self.__b_includeDirsMatch = self.__get_meta("includeDirs") == json.dumps(self.__l_includeDirs)
+
+
+    def __str__(self):
+        return "module database: " + self.__s_dbFile
+
+
+    @classmethod
+    def load(cls, s_dbFile, l_includeDirs=()):
+        """opens an existing database for reading
+
+        :s_dbFile: database file (-> Verilog_codeGen_config.moduleDB), may be empty
+        :l_includeDirs: directories searched for `include files (-> Verilog_codeGen_config.includeDirs)
+        :returns: VerilogModuleDB object, None if no database is configured or it can not be read (not built yet, different version, ...)
+        """
+        if not s_dbFile or not os.path.isfile(s_dbFile):
+            return None
+        with VerilogCodeGen_Stats.phase("dbLoad"):
+            try:
+                connection = sqlite3.connect( "file:" + os.path.abspath(s_dbFile) + "?mode=ro", uri=True, timeout=cls.__timeout )
+                moduleDB = cls(connection, s_dbFile, l_includeDirs)
+                if moduleDB.__get_meta("version") == str(cls.__schemaVersion):
+                    return moduleDB
+                connection.close()
+            except sqlite3.Error:
+                pass
+        return None
+
+
+    @classmethod
+    def create(cls, s_dbFile, l_includeDirs=()):
+        """opens (and if necessary creates) a database for updating, a database with a different version or different include directories is cleared
+
+        :s_dbFile: database file
+        :l_includeDirs: directories searched for `include files
+        :returns: VerilogModuleDB object
+        """
+        s_dbDir = os.path.dirname( os.path.abspath(s_dbFile) )
+        os.makedirs(s_dbDir, exist_ok=True)
+        # (transactions are controlled explicitly, see update)
+        connection = sqlite3.connect( s_dbFile, timeout=cls.__timeout, isolation_level=None )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        for s_statement in cls.__l_schema:
+            connection.execute(s_statement)
+
+        moduleDB = cls(connection, s_dbFile, l_includeDirs)
+        if moduleDB.__get_meta("version") != str(cls.__schemaVersion) or not moduleDB.__b_includeDirsMatch:
+            connection.execute("BEGIN IMMEDIATE")
+            for s_table in ("moduleNames", "parameters", "ports", "modules", "files", "meta"):
+                connection.execute("DELETE FROM " + s_table)
+            connection.executemany( "INSERT INTO meta (key, value) VALUES (?, ?)",
+                                    [ ("version", str(cls.__schemaVersion)), ("includeDirs", json.dumps(moduleDB.__l_includeDirs)) ] )
+            connection.execute("COMMIT")
+            moduleDB.__b_includeDirsMatch = True
+        return moduleDB
+
+
+    def close(self):
+        self.__connection.close()
+
+
+    def update(self, l_roots, d_searchOptions=None, jobs=None):
+        """brings the database up to date with all module files below l_roots: new and changed files are scanned (in parallel worker processes), files which no longer exist below l_roots are removed
+        The whole update is one transaction, concurrent updaters wait for each other (-> one of them does the work, the others find everything up to date).
+
+        :l_roots: root directories (e.g. the search paths)
+        :d_searchOptions: options of the directory walk (see VerilogModuleIndex.list_files), e.g. from Verilog_codeGen_config.get_searchOptions
+        :jobs: number of worker processes, defaults to the number of cores
+        :returns: dictionary with the numbers of "files" (below l_roots), "scanned" and "removed" files
+        """
+        d_searchOptions = dict(d_searchOptions) if d_searchOptions else {}
+        d_searchOptions.pop("b_stopAtUniqueMatch", None)
+        l_roots = [ os.path.abspath(s_root) for s_root in l_roots ]
+        moduleIndex = VerilogModuleIndex.load()
+        l_files = sorted( moduleIndex.list_files(l_roots, **d_searchOptions) )
+        moduleIndex.save()
+
+        connection = self.__connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            #### unchanged, changed and removed files ####
+            d_known = { s_path: (fileId, size, mtime) for fileId, s_path, size, mtime in connection.execute("SELECT id, path, size, mtime FROM files")
+                            if self.__is_below(s_path, l_roots) }
+            d_includeMtimes = {}
+            l_scan = []
+            for s_file in l_files:
+                try:
+                    stat = os.stat(s_file)
+                except OSError:
+                    continue
+                t_known = d_known.pop(s_file, None)
+                if t_known and t_known[1] == stat.st_size and t_known[2] == stat.st_mtime_ns and self.__check_includes(t_known[0], d_includeMtimes):
+                    continue
+                if t_known:
+                    self.__delete_file(t_known[0])
+                l_scan.append( (s_file, stat.st_size, stat.st_mtime_ns) )
+            # (remaining known files were not listed)
+            for fileId, size, mtime in d_known.values():
+                self.__delete_file(fileId)
+
+            #### scan new and changed files ####
+            with VerilogCodeGen_Stats.phase("scan"):
+                jobs = jobs if jobs else os.cpu_count()
+                l_paths = [ s_file for s_file, size, mtime in l_scan ]
+                if jobs == 1 or len(l_scan) < 2:
+                    l_results = [ type(self)._scan_fileSafe(s_file, self.__l_includeDirs) for s_file in l_paths ]
+                else:
+                    with ProcessPoolExecutor(max_workers=jobs) as executor:
+                        l_results = list( executor.map( type(self)._scan_fileSafe, l_paths, [self.__l_includeDirs] * len(l_paths),
+                                                        chunksize=max(1, len(l_paths) // (jobs * 8)) ) )
+
+            with VerilogCodeGen_Stats.phase("dbWrite"):
+                for (s_file, size, mtime), l_modules in zip(l_scan, l_results):
+                    self.__insert_file(s_file, size, mtime, l_modules)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        return { "files": len(l_files), "scanned": len(l_scan), "removed": len(d_known) }
+
+
+    @classmethod
+    def _scan_fileSafe(cls, s_fileIn, l_includeDirs=()):
+        """scans all modules of s_fileIn (for worker processes), files which can not be scanned (e.g. syntax errors) yield no modules instead of aborting the whole update
+
+        :returns: list of tuples (module name, byte offset, file dictionary (see VerilogFile.to_dict))
+        """
+        try:
+            l_modules = []
+            for s_moduleName, offset, s_timescale in VerilogFile.scan_moduleDeclarations(s_fileIn):
+                verilogFile = VerilogFile.scan_moduleAt(s_fileIn, offset, s_timescale, l_includeDirs)
+                if verilogFile:
+                    l_modules.append( (verilogFile.verilogModule.moduleName, offset, verilogFile.to_dict()) )
+            return l_modules
+        except (Exception, SystemExit):
+            return []
+
+
+    def find(self, moduleName, l_roots):
+        """finds all module files matching moduleName below l_roots (same matching as VerilogModuleIndex.find), files deleted since the last update are left out
+
+        :moduleName: name of the module (may optionally contain ".v/.sv" ending)
+        :l_roots: iterable of root directories
+        :returns: list of file paths, best ranked first (see VerilogModuleIndex.rank_files)
+        """
+        mo_moduleFile = type(self).__re_moduleFile.match(moduleName)
+        l_fileNames = [moduleName] if mo_moduleFile else [moduleName + ".v", moduleName + ".sv"]
+        with VerilogCodeGen_Stats.phase("dbQuery"):
+            l_paths = [ s_path for (s_path,) in self.__connection.execute( "SELECT path FROM files WHERE fileName IN (" + ", ".join( ["?"] * len(l_fileNames) ) + ") ORDER BY path", l_fileNames ) ]
+
+        l_roots = [ os.path.abspath(s_root) for s_root in l_roots if s_root ]
+        l_foundModules = [ s_path for s_path in l_paths if self.__is_below(s_path, l_roots) and os.path.isfile(s_path) ]
+        VerilogCodeGen_Stats.count("filesMatched", len(l_foundModules))
+        return VerilogModuleIndex.rank_files(l_foundModules, l_roots)
+
+
+    def find_similar(self, s_query, l_roots, maxResults=10):
+        """finds modules whose name starts with s_query or contains all of its words (full-text index, words are separated by underscores), e.g. for completion or "did you mean"
+        Prefix matches come first (alphabetically), followed by the full-text matches (best match first).
+
+        :s_query: (partial) module name
+        :l_roots: only modules declared below these directories are returned
+        :maxResults: maximum number of results
+        :returns: list of tuples (module name, list of declaring files), same as VerilogModuleIndex.find_similar
+        """
+        l_roots = [ os.path.abspath(s_root) for s_root in l_roots ]
+        l_words = re.findall(r"[A-Za-z0-9]+", s_query)
+        d_results = {}
+        with VerilogCodeGen_Stats.phase("dbQuery"):
+            # (GLOB with a constant prefix uses the index on the module names)
+            s_pattern = re.sub(r"([*?\[])", r"[\1]", s_query) + "*"
+            it_rows = self.__connection.execute( "SELECT modules.name, files.path FROM modules JOIN files ON files.id = modules.fileId WHERE modules.name GLOB ? ORDER BY modules.name", (s_pattern,) )
+            self.__add_similar(d_results, it_rows, l_roots, maxResults)
+            if l_words and len(d_results) < maxResults:
+                s_match = " AND ".join( "\"" + s_word + "\"*" for s_word in l_words )
+                it_rows = self.__connection.execute( "SELECT modules.name, files.path FROM moduleNames JOIN modules ON modules.id = moduleNames.rowid JOIN files ON files.id = modules.fileId"
+                                                        + " WHERE moduleNames MATCH ? ORDER BY moduleNames.rank, length(modules.name), modules.name", (s_match,) )
+                self.__add_similar(d_results, it_rows, l_roots, maxResults)
+        return list( d_results.items() )
+
+
+    def __add_similar(self, d_results, it_rows, l_roots, maxResults):
+        """adds (module name, file) rows below l_roots to d_results (module name -> list of files) until it holds maxResults names
+        """
+        for s_name, s_path in it_rows:
+            if not self.__is_below(s_path, l_roots):
+                continue
+            if s_name in d_results:
+                if s_path not in d_results[s_name]:
+                    d_results[s_name].append(s_path)
+            elif len(d_results) < maxResults:
+                d_results[s_name] = [s_path]
+
+
+    def scan(self, s_fileIn, moduleName=""):
+        """returns the scanned interface of s_fileIn from the database (same as VerilogModuleCache.scan), if the file did not change since the last update
+
+        :s_fileIn: Verilog/SystemVerilog source file
+        :moduleName: module in files containing several modules, if empty the first module declaration
+        :returns: VerilogFile object, None if the database can not serve the file (not in the database, changed since the last update, scanned with other include directories)
+        """
+        if not self.__b_includeDirsMatch:
+            return None
+        # (no module name given on the command line -> None)
+        moduleName = moduleName if moduleName else ""
+        s_path = os.path.abspath(s_fileIn)
+        with VerilogCodeGen_Stats.phase("dbQuery"):
+            t_module = self.__connection.execute( "SELECT files.size, files.mtime, files.language, modules.id, modules.name, modules.timescale, modules.includes"
+                                                    + " FROM files JOIN modules ON modules.fileId = files.id WHERE files.path = ? AND (? = '' OR modules.name = ?)"
+                                                    + " ORDER BY modules.position LIMIT 1", (s_path, moduleName, moduleName) ).fetchone()
+            if not t_module:
+                return None
+            size, mtime, s_language, moduleId, s_moduleName, s_timescale, s_includes = t_module
+            try:
+                stat = os.stat(s_path)
+            except OSError:
+                return None
+            l_includes = json.loads(s_includes)
+            if stat.st_size != size or stat.st_mtime_ns != mtime or not self.__check_includeMtimes(l_includes, {}):
+                return None
+
+            l_parameters = [ { "identifier": s_identifier, "defaultValue": s_defaultValue } for s_identifier, s_defaultValue
+                                in self.__connection.execute( "SELECT identifier, defaultValue FROM parameters WHERE moduleId = ? ORDER BY position", (moduleId,) ) ]
+            l_ports = [ { "portType": s_portType, "identifier": s_identifier, "portWidth": s_portWidth } for s_portType, s_identifier, s_portWidth
+                                in self.__connection.execute( "SELECT portType, identifier, portWidth FROM ports WHERE moduleId = ? ORDER BY position", (moduleId,) ) ]
+        VerilogCodeGen_Stats.count("cacheHits")
+        return VerilogFile.fromDict( { "module": { "moduleName": s_moduleName, "parameters": l_parameters, "ports": l_ports },
+                                        "timescale": s_timescale, "language": s_language, "includes": l_includes } )
+
+
+    def __insert_file(self, s_file, size, mtime, l_modules):
+        """inserts a scanned file with all its modules (see _scan_fileSafe)
+        """
+        connection = self.__connection
+        s_language = l_modules[0][2]["language"] if l_modules else None
+        fileId = connection.execute( "INSERT INTO files (path, fileName, size, mtime, language) VALUES (?, ?, ?, ?, ?)",
+                                        (s_file, os.path.basename(s_file), size, mtime, s_language) ).lastrowid
+        for position, (s_moduleName, offset, d_file) in enumerate(l_modules):
+            moduleId = connection.execute( "INSERT INTO modules (fileId, position, name, offset, timescale, includes) VALUES (?, ?, ?, ?, ?, ?)",
+                                            (fileId, position, s_moduleName, offset, d_file["timescale"], json.dumps(d_file["includes"])) ).lastrowid
+            connection.execute( "INSERT INTO moduleNames (rowid, name) VALUES (?, ?)", (moduleId, s_moduleName) )
+            connection.executemany( "INSERT INTO ports (moduleId, position, portType, identifier, portWidth) VALUES (?, ?, ?, ?, ?)",
+                                    [ (moduleId, i, d_port["portType"], d_port["identifier"], d_port["portWidth"]) for i, d_port in enumerate(d_file["module"]["ports"]) ] )
+            connection.executemany( "INSERT INTO parameters (moduleId, position, identifier, defaultValue) VALUES (?, ?, ?, ?)",
+                                    [ (moduleId, i, d_parameter["identifier"], d_parameter["defaultValue"]) for i, d_parameter in enumerate(d_file["module"]["parameters"]) ] )
+
+
+    def __delete_file(self, fileId):
+        """deletes a file with all its modules (ports and parameters are deleted by the foreign keys, the full-text index is not)
+        """
+        self.__connection.execute( "DELETE FROM moduleNames WHERE rowid IN (SELECT id FROM modules WHERE fileId = ?)", (fileId,) )
+        self.__connection.execute( "DELETE FROM files WHERE id = ?", (fileId,) )
+
+
+    def __check_includes(self, fileId, d_includeMtimes):
+        """checks whether the `include files the module headers of a stored file depend on are unchanged
+
+        :d_includeMtimes: mtimes of already checked include files (shared by all files of an update)
+        :returns: bool
+        """
+        for (s_includes,) in self.__connection.execute( "SELECT includes FROM modules WHERE fileId = ?", (fileId,) ):
+            if not self.__check_includeMtimes( json.loads(s_includes), d_includeMtimes ):
+                return False
+        return True
+
+
+    @staticmethod
+    def __check_includeMtimes(l_includes, d_includeMtimes):
+        """checks list of [path, mtime] pairs (see VerilogFile.l_includes) against the file system
+
+        :d_includeMtimes: mtimes of already checked include files
+        :returns: bool
+        """
+        for s_path, mtime in l_includes:
+            if s_path not in d_includeMtimes:
+                try:
+                    d_includeMtimes[s_path] = os.stat(s_path).st_mtime_ns
+                except OSError:
+                    d_includeMtimes[s_path] = None
+            if d_includeMtimes[s_path] != mtime:
+                return False
+        return True
+
+
+    def __get_meta(self, s_key):
+        """returns a value of the meta table, None if not set (or the database has no schema yet)
+        """
+        try:
+            t_row = self.__connection.execute( "SELECT value FROM meta WHERE key = ?", (s_key,) ).fetchone()
+        except sqlite3.Error:
+            return None
+        return t_row[0] if t_row else None
+
+
+    @staticmethod
+    def __is_below(s_path, l_roots):
+        """checks whether s_path lies below one of the (absolute) root directories
+        """
+        for s_root in l_roots:
+            if s_path.startswith(s_root.rstrip("/") + "/"):
+                return True
+        return False
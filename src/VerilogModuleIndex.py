@@ -0,0 +1,479 @@
+
+#
+# persistent index of Verilog/SystemVerilog module files in the search paths
+#
+
+import os, re, json, fnmatch, bisect, itertools, math
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from Verilog_codeGen_config import Verilog_codeGen_config
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+class VerilogModuleIndex:
+    """persistent index of module files (module name -> file paths) below a set of root directories
+    For each visited directory, the index stores the directory's mtime, the contained Verilog/SystemVerilog files and the subdirectories. A directory's mtime changes whenever an entry is added, removed or renamed, so an unchanged mtime means that the cached listing is still valid and the directory does not need to be read again. A warm lookup thereby only costs one stat call per directory.
+    For fuzzy and prefix lookups (find_similar), a name index (sorted module names, plus a trigram index for fuzzy matches) is built from the indexed listings on first use and kept until a listing changes, so e.g. the resident server answers completions without touching the file system again.
+    """
+
+    # name of the index file inside the cache directory
+    __s_indexFileName = "moduleIndex.json"
+    # version of the on-disk format, an index with a different version is discarded
+    __indexVersion = 2
+    # pattern to match module files (-> group(1): module name)
+    __re_moduleFile = re.compile(r"^(.+)\.(v|sv)$")
+    # minimum trigram similarity (dice coefficient) of a fuzzy match
+    __minSimilarity = 0.3
+
+
+    def __init__(self, s_indexFile=""):
+        """
+        :s_indexFile: file with absolute path the index is stored to, if empty the index is only kept in memory
+        """
+        self.__s_indexFile = s_indexFile
+        # directory path -> [mtime in ns, list of module file names, list of subdirectory names, list of symlinked subdirectory names]
+        self.__d_directories = {}
+        self.__b_modified = False
+        # name and trigram index for find_similar (see __get_nameIndex), None until built or after a listing changed
+        self.__t_nameIndex = None
+        self.__d_trigrams = None
+
+
+    def __str__(self):
+        return "module index: " + (self.__s_indexFile if self.__s_indexFile else "(in memory)") + ", " + str(len(self.__d_directories)) + " directories"
+
+
+    @classmethod
+    def load(cls, s_indexFile=None):
+        """loads the index from s_indexFile; a missing or unreadable index file results in an empty index which is (re)built on the first lookup
+
+        :s_indexFile: index file, defaults to moduleIndex.json in Verilog_codeGen_config.get_cacheDir()
+        :returns: VerilogModuleIndex object
+        """
+        if s_indexFile is None:
+            s_cacheDir = Verilog_codeGen_config.get_cacheDir()
+            s_indexFile = s_cacheDir + "/" + cls.__s_indexFileName if s_cacheDir else ""
+
+        moduleIndex = cls(s_indexFile)
+        if s_indexFile:
+            with VerilogCodeGen_Stats.phase("indexLoad"):
+                try:
+                    with open(s_indexFile, "r") as file_in:
+                        jsonObj = json.load(file_in)
+                    if jsonObj.get("version") == cls.__indexVersion:
+                        moduleIndex.__d_directories = jsonObj["directories"]
+                except (OSError, ValueError, KeyError):
+                    # no (valid) index yet
+                    pass
+
+        return moduleIndex
+
+
+    def save(self):
+        """writes the index to its index file if anything changed since loading (written to a temporary file first and renamed, so concurrent lookups never read a partial index)
+        """
+        if not self.__s_indexFile or not self.__b_modified:
+            return
+
+        s_tmpFile = self.__s_indexFile + "." + str(os.getpid()) + ".tmp"
+        with VerilogCodeGen_Stats.phase("indexSave"):
+            try:
+                with open(s_tmpFile, "w") as file_out:
+                    json.dump( {"version": type(self).__indexVersion, "directories": self.__d_directories}, file_out )
+                os.replace(s_tmpFile, self.__s_indexFile)
+                self.__b_modified = False
+            except OSError:
+                # index can not be stored -> next lookup simply rebuilds it
+                try:
+                    os.remove(s_tmpFile)
+                except OSError:
+                    pass
+
+
+    def find(self, moduleName, l_roots, l_excludes=(), maxDepth=-1, b_followSymlinks=False, b_stopAtUniqueMatch=False, threads=0):
+        """finds all module files matching moduleName below l_roots, refreshing the index on the way for all directories whose mtime changed
+        Every physical directory is visited only once (identified by device and inode), so overlapping roots (e.g. the current working directory inside a search path) and symlink loops are walked only once.
+        The found files are ranked (see rank_files), so the first one is the best choice if a single file has to be selected without asking.
+
+        :moduleName: name of the module (may optionally contain ".v/.sv" ending)
+        :l_roots: iterable of root directories, searched in the given order
+        :l_excludes: glob patterns of directories which are not descended into, patterns containing "/" are matched against the absolute path, all others against the directory name
+        :maxDepth: maximum directory depth below each root, -1 for unlimited
+        :b_followSymlinks: descend into symlinked directories
+        :b_stopAtUniqueMatch: do not search the remaining roots once the roots searched so far yielded exactly one match
+        :threads: number of threads reading directories concurrently, 0 to choose automatically
+        :returns: list of found file paths, best ranked first
+        """
+        mo_moduleFile = type(self).__re_moduleFile.match(moduleName)
+        if mo_moduleFile:
+            s_fileNames = {moduleName}
+        else:
+            s_fileNames = {moduleName + ".v", moduleName + ".sv"}
+
+        l_foundModules = self.__search( l_roots, s_fileNames, l_excludes, maxDepth, b_followSymlinks, b_stopAtUniqueMatch, threads )
+        VerilogCodeGen_Stats.count("filesMatched", len(l_foundModules))
+        return self.rank_files(l_foundModules, l_roots) if len(l_foundModules) > 1 else l_foundModules
+
+
+    @staticmethod
+    def rank_files(l_files, l_roots):
+        """orders matching module files by preference (deterministic, e.g. to select one of several files without asking): files below an earlier root first (the working directory before the search paths, search paths in their configured order), then files in shallower directories below that root, then newer files (mtime), finally alphabetically
+        Only the matching files are stat'ed (their mtimes are not part of the index, a file edited in place does not change its directory's mtime).
+
+        :l_files: absolute file paths (e.g. found by find)
+        :l_roots: root directories in the order of preference
+        :returns: sorted list of file paths
+        """
+        l_rootPrefixes = [ os.path.abspath(os.path.expanduser(s_root)).rstrip("/") + "/" for s_root in l_roots if s_root ]
+
+        def get_rank(s_file):
+            for i_root, s_rootPrefix in enumerate(l_rootPrefixes):
+                if s_file.startswith(s_rootPrefix):
+                    break
+            else:
+                i_root, s_rootPrefix = len(l_rootPrefixes), "/"
+            try:
+                mtime = os.stat(s_file).st_mtime_ns
+            except OSError:
+                mtime = 0
+            return ( i_root, s_file.count("/", len(s_rootPrefix)), -mtime, s_file )
+
+        return sorted(l_files, key=get_rank)
+
+
+    def list_files(self, l_roots, l_excludes=(), maxDepth=-1, b_followSymlinks=False, threads=0):
+        """lists all Verilog/SystemVerilog files below l_roots (e.g. to scan a whole project), refreshing the index on the way (same walk as find)
+
+        :l_roots: iterable of root directories
+        :l_excludes/maxDepth/b_followSymlinks/threads: see find
+        :returns: list of file paths, every physical file only once
+        """
+        return self.__search( l_roots, None, l_excludes, maxDepth, b_followSymlinks, False, threads )
+
+
+    def find_similar(self, s_query, l_roots, maxResults=10, b_refresh=True, l_excludes=(), maxDepth=-1, b_followSymlinks=False, threads=0):
+        """finds module files whose module name is similar to s_query (e.g. for completion or "did you mean" after a failed find)
+        Candidates are ranked: exact match (ignoring case), prefix matches (alphabetically), substring matches, then by trigram similarity (shorter names first within each class). The trigram index is only built and searched if the prefix matches do not fill maxResults.
+
+        :s_query: (partial or misspelled) module name, a ".v/.sv" ending is ignored
+        :l_roots: iterable of root directories
+        :maxResults: maximum number of returned module names
+        :b_refresh: refresh the index below l_roots first (same walk as find), False to answer from the index as is (e.g. right after find)
+        :l_excludes/maxDepth/b_followSymlinks/threads: see find
+        :returns: list of tuples (module name, list of file paths), best match first
+        """
+        if b_refresh:
+            self.__search( l_roots, set(), l_excludes, maxDepth, b_followSymlinks, False, threads )
+
+        mo_moduleFile = type(self).__re_moduleFile.match(s_query)
+        s_query = (mo_moduleFile.group(1) if mo_moduleFile else s_query).lower()
+        if not s_query:
+            return []
+
+        re_excludeName, re_excludePath = self.__compile_excludes(l_excludes)
+        l_roots = [ os.path.abspath(os.path.expanduser(s_root)) for s_root in l_roots if s_root ]
+        l_results = []
+        s_seen = set()
+
+        def add_results(it_names):
+            """adds the files of it_names below l_roots to l_results until maxResults are found
+            """
+            for s_name in it_names:
+                s_seen.add(s_name)
+                d_files = {}
+                for s_moduleName, s_path in d_names[s_name]:
+                    if self.__is_searched(s_path, l_roots, re_excludeName, re_excludePath, maxDepth, b_followSymlinks):
+                        d_files.setdefault(s_moduleName, []).append(s_path)
+                l_results.extend( sorted(d_files.items()) )
+                if len(l_results) >= maxResults:
+                    return
+
+        with VerilogCodeGen_Stats.phase("lookup"):
+            d_names, l_sortedNames = self.__get_nameIndex()
+
+            #### exact and prefix matches (sorted names) ####
+            index = bisect.bisect_left(l_sortedNames, s_query)
+            add_results( itertools.takewhile( lambda s_name: s_name.startswith(s_query), itertools.islice(l_sortedNames, index, None) ) )
+
+            #### substring and fuzzy matches (trigram index) ####
+            if len(l_results) < maxResults:
+                d_trigrams = self.__get_trigramIndex()
+                s_queryTrigrams = self.__get_trigrams(s_query)
+                counter_shared = Counter()
+                for s_trigram in s_queryTrigrams:
+                    counter_shared.update( d_trigrams.get(s_trigram, ()) )
+
+                # a substring match shares all inner trigrams of s_query, a fuzzy match at least __minSimilarity/2 * (trigrams of s_query + trigrams of a name (>= 2))
+                minShared = min( max(1, len(s_query) - 2), math.ceil( type(self).__minSimilarity / 2 * (len(s_queryTrigrams) + 2) ) )
+                d_candidates = {}
+                for s_name, shared in counter_shared.items():
+                    if shared < minShared or s_name in s_seen:
+                        continue
+                    if s_query in s_name:
+                        d_candidates[s_name] = 0.0
+                        continue
+                    # (a name has len + 1 padded trigrams, repeated trigrams aside)
+                    similarity = 2 * shared / (len(s_queryTrigrams) + len(s_name) + 1)
+                    if similarity >= type(self).__minSimilarity:
+                        d_candidates[s_name] = 1.0 - similarity
+                add_results( sorted( d_candidates, key=lambda s_name: (d_candidates[s_name], len(s_name), s_name) ) )
+
+        return l_results[:maxResults]
+
+
+    def __get_nameIndex(self):
+        """returns the names of all indexed module files, built from the indexed listings if necessary
+
+        :returns: tuple (lower case module name -> list of (module name, file path), sorted list of lower case module names)
+        """
+        if self.__t_nameIndex is None:
+            d_names = {}
+            for s_dir, l_entry in self.__d_directories.items():
+                for s_file in l_entry[1]:
+                    s_moduleName = s_file.rpartition(".")[0]
+                    d_names.setdefault(s_moduleName.lower(), []).append( (s_moduleName, s_dir + "/" + s_file) )
+            self.__t_nameIndex = (d_names, sorted(d_names))
+            self.__d_trigrams = None
+
+        return self.__t_nameIndex
+
+
+    def __get_trigramIndex(self):
+        """returns the trigram index of all indexed module names (built on first use after __get_nameIndex)
+
+        :returns: dictionary trigram -> list of lower case module names
+        """
+        if self.__d_trigrams is None:
+            d_trigrams = {}
+            for s_name in self.__t_nameIndex[1]:
+                for s_trigram in self.__get_trigrams(s_name):
+                    d_trigrams.setdefault(s_trigram, []).append(s_name)
+            self.__d_trigrams = d_trigrams
+
+        return self.__d_trigrams
+
+
+    @staticmethod
+    def __get_trigrams(s_name):
+        """returns the set of trigrams of s_name (padded, so short names and the name's beginning count as well)
+        """
+        s_padded = "  " + s_name + " "
+        return { s_padded[i:i+3] for i in range(len(s_padded) - 2) }
+
+
+    def __is_searched(self, s_path, l_roots, re_excludeName, re_excludePath, maxDepth, b_followSymlinks):
+        """checks (on the indexed listings only) whether the walk of l_roots (see __search) covers the indexed file s_path
+
+        :returns: bool
+        """
+        for s_root in l_roots:
+            if not s_path.startswith(s_root + "/"):
+                continue
+            l_subdirs = s_path[len(s_root)+1:].split("/")[:-1]
+            if maxDepth >= 0 and len(l_subdirs) > maxDepth:
+                continue
+            s_dir = s_root
+            for s_subdir in l_subdirs:
+                if (re_excludeName and re_excludeName.match(s_subdir)) or (re_excludePath and re_excludePath.match(s_dir + "/" + s_subdir)):
+                    break
+                if not b_followSymlinks and s_subdir in self.__d_directories.get(s_dir, (0, (), (), ()))[3]:
+                    break
+                s_dir = s_dir + "/" + s_subdir
+            else:
+                return True
+        return False
+
+
+    def __search(self, l_roots, s_fileNames, l_excludes, maxDepth, b_followSymlinks, b_stopAtUniqueMatch, threads):
+        """walks l_roots and collects the module files whose name is in s_fileNames (all module files if s_fileNames is None)
+
+        :returns: list of file paths
+        """
+        re_excludeName, re_excludePath = self.__compile_excludes(l_excludes)
+        threads = threads if threads > 0 else min(32, (os.cpu_count() or 1) + 4)
+        # (device, inode) of all visited directories
+        s_visited = set()
+
+        l_foundModules = []
+        with VerilogCodeGen_Stats.phase("search"), ThreadPoolExecutor(max_workers=threads) as executor:
+            for s_root in l_roots:
+                # an empty search path (e.g. from the config template) is no valid root
+                if not s_root:
+                    continue
+                if b_stopAtUniqueMatch and len(l_foundModules) == 1:
+                    break
+
+                for s_path, l_files in self.__walk( os.path.abspath(os.path.expanduser(s_root)), executor, s_visited,
+                                                    re_excludeName, re_excludePath, maxDepth, b_followSymlinks ):
+                    l_foundModules.extend( [ s_path + "/" + s_file for s_file in l_files if s_fileNames is None or s_file in s_fileNames ] )
+
+        return l_foundModules
+
+
+    def __walk(self, s_root, executor, s_visited, re_excludeName, re_excludePath, maxDepth, b_followSymlinks):
+        """generator over all directories below s_root, level by level; the directories of one level are read concurrently by executor, and every directory is listed only if its mtime differs from the indexed one
+
+        :s_root: absolute root directory
+        :executor: ThreadPoolExecutor for reading directories
+        :s_visited: set of (device, inode) of already visited directories, extended by this walk
+        :re_excludeName/re_excludePath: compiled exclude patterns (see __compile_excludes)
+        :maxDepth: maximum depth below s_root, -1 for unlimited
+        :b_followSymlinks: descend into symlinked directories
+        :returns: tuples of (directory path, list of module file names)
+        """
+        l_level = [s_root]
+        depth = 0
+        while l_level:
+            l_cachedMtimes = [ self.__d_directories[s_path][0] if s_path in self.__d_directories else None for s_path in l_level ]
+            if len(l_level) > 1:
+                it_results = executor.map( self.__read_directory, l_level, l_cachedMtimes )
+            else:
+                it_results = [ self.__read_directory(l_level[0], l_cachedMtimes[0]) ]
+
+            l_nextLevel = []
+            for s_path, t_result in zip(l_level, it_results):
+                if t_result is None:
+                    self.__remove_directory(s_path)
+                    continue
+
+                # same directory reached twice (overlapping roots, bind mounts or symlink loops)
+                t_inode, mtime, t_listing = t_result
+                if t_inode in s_visited:
+                    continue
+                s_visited.add(t_inode)
+
+                VerilogCodeGen_Stats.count("directoriesVisited")
+                if t_listing is None:
+                    l_entry = self.__d_directories[s_path]
+                else:
+                    VerilogCodeGen_Stats.count("directoriesRead")
+                    l_entry = self.__update_directory(s_path, mtime, *t_listing)
+
+                yield s_path, l_entry[1]
+
+                if maxDepth >= 0 and depth >= maxDepth:
+                    continue
+                l_subdirs = sorted(l_entry[2] + l_entry[3]) if b_followSymlinks else l_entry[2]
+                for s_subdir in l_subdirs:
+                    s_subdirPath = s_path + "/" + s_subdir
+                    if re_excludeName and re_excludeName.match(s_subdir):
+                        continue
+                    if re_excludePath and re_excludePath.match(s_subdirPath):
+                        continue
+                    l_nextLevel.append(s_subdirPath)
+
+            l_level = l_nextLevel
+            depth += 1
+
+
+    @classmethod
+    def __read_directory(cls, s_path, cachedMtime):
+        """reads a directory, unless its mtime equals cachedMtime (called concurrently, therefore without touching the index)
+
+        :s_path: absolute directory path
+        :cachedMtime: mtime of the indexed listing, None if s_path is not indexed yet
+        :returns: tuple ((device, inode), mtime, listing), listing is None if the mtime did not change and otherwise a tuple of (module file names, subdirectory names, symlinked subdirectory names); None if s_path is no readable directory
+        """
+        try:
+            stat = os.stat(s_path)
+        except OSError:
+            return None
+
+        t_inode = (stat.st_dev, stat.st_ino)
+        if stat.st_mtime_ns == cachedMtime:
+            return (t_inode, cachedMtime, None)
+
+        l_files = []
+        l_subdirs = []
+        l_symlinks = []
+        try:
+            with os.scandir(s_path) as it_entries:
+                for entry in it_entries:
+                    try:
+                        if entry.is_dir():
+                            if entry.is_symlink():
+                                l_symlinks.append(entry.name)
+                            else:
+                                l_subdirs.append(entry.name)
+                        elif cls.__re_moduleFile.match(entry.name):
+                            l_files.append(entry.name)
+                    except OSError:
+                        pass
+        except OSError:
+            return None
+
+        l_files.sort()
+        l_subdirs.sort()
+        l_symlinks.sort()
+        return (t_inode, stat.st_mtime_ns, (l_files, l_subdirs, l_symlinks))
+
+
+    def __update_directory(self, s_path, mtime, l_files, l_subdirs, l_symlinks):
+        """stores a freshly read directory listing in the index
+
+        :returns: new index entry
+        """
+        # drop index entries of subdirectories which do not exist anymore
+        l_entry = self.__d_directories.get(s_path)
+        if l_entry:
+            for s_subdir in set(l_entry[2] + l_entry[3]).difference(l_subdirs, l_symlinks):
+                self.__remove_directory(s_path + "/" + s_subdir)
+
+        l_entry = [mtime, l_files, l_subdirs, l_symlinks]
+        self.__d_directories[s_path] = l_entry
+        self.__b_modified = True
+        self.__t_nameIndex = None
+        return l_entry
+
+
+    @classmethod
+    def filter_excluded(cls, l_files, s_root, l_excludes=()):
+        """removes the files lying in an excluded directory below s_root (same matching as the directory walk, e.g. for files found by a glob pattern)
+
+        :l_files: file paths below s_root
+        :s_root: directory the files were searched in (its own path and the directories above it are not matched)
+        :l_excludes: see find
+        :returns: list of the remaining file paths
+        """
+        re_excludeName, re_excludePath = cls.__compile_excludes(l_excludes)
+        if not re_excludeName and not re_excludePath:
+            return list(l_files)
+        s_root = os.path.abspath(s_root)
+
+        l_remaining = []
+        for s_file in l_files:
+            s_dir = os.path.dirname( os.path.abspath(s_file) )
+            b_excluded = False
+            while len(s_dir) > len(s_root) and s_dir.startswith(s_root):
+                if ( re_excludeName and re_excludeName.match(os.path.basename(s_dir)) ) or ( re_excludePath and re_excludePath.match(s_dir) ):
+                    b_excluded = True
+                    break
+                s_dir = os.path.dirname(s_dir)
+            if not b_excluded:
+                l_remaining.append(s_file)
+        return l_remaining
+
+
+    @staticmethod
+    def __compile_excludes(l_excludes):
+        """compiles exclude glob patterns
+
+        :l_excludes: iterable of glob patterns
+        :returns: tuple of compiled regular expressions (name patterns, path patterns), None where no pattern is given
+        """
+        l_namePatterns = [ fnmatch.translate(s_pattern) for s_pattern in l_excludes if s_pattern and "/" not in s_pattern ]
+        l_pathPatterns = [ fnmatch.translate(os.path.expanduser(s_pattern)) for s_pattern in l_excludes if s_pattern and "/" in s_pattern ]
+        return ( re.compile("|".join(l_namePatterns)) if l_namePatterns else None,
+                 re.compile("|".join(l_pathPatterns)) if l_pathPatterns else None )
+
+
+    def __remove_directory(self, s_path):
+        """removes s_path and all directories below it from the index (e.g. because it was deleted)
+        """
+        s_prefix = s_path + "/"
+        l_removed = [ s_dir for s_dir in self.__d_directories if s_dir == s_path or s_dir.startswith(s_prefix) ]
+        for s_dir in l_removed:
+            del self.__d_directories[s_dir]
+        if l_removed:
+            self.__b_modified = True
+            self.__t_nameIndex = None
@@ -3,21 +3,18 @@
 # represent a Verilog Port
 #
 
-import re
+import re, sys
 from VerilogCodeGen_Helper import *
 
 class VerilogPort:
     """represents a Verilog Port
+    Ports are slotted records (no per-object __dict__), port types and width declarations are interned, so the many ports of an indexed IP library share these strings.
     """
 
+    __slots__ = ("__portType", "__identifier", "__s_portWidthDeclaration")
+
     # valid port types for comparison in instantiation/scanning
     __validPortTypes = ("input","output","inout")
-    # (TODO:) maybe move those patterns as static parameters to the scan method, if they don't get used somewhere else
-    # pattern to match a port declaration 
-    # -> group(1): portType, group(2): variable type (if given), group(3): s_portWidthDeclaration (if given)
-    __re_validPortDeclaration = r".*(input|output|inout)\s+(reg|wire|logic|)\s*(\[[\w-]+:[\w-]+\]|)"
-    # pattern to look for identifiers in a port declaration (with declaration part deleted by re.sub -> string starting with port name(s) )
-    __re_portIdentifier = r"[\w-]"
 
 
     def __init__(self, portType, identifier, portWidthDeclaration=None):
@@ -35,9 +32,10 @@ class VerilogPort:
             print("Identifier must not be empty!")
             return None
 
-        self.__portType   = portType
+        self.__portType   = sys.intern(portType)
         self.__identifier = identifier
-        self.__s_portWidthDeclaration = self.__parse_portWidthDeclaration(portWidthDeclaration)
+        s_portWidthDeclaration = self.__parse_portWidthDeclaration(portWidthDeclaration)
+        self.__s_portWidthDeclaration = sys.intern(s_portWidthDeclaration) if s_portWidthDeclaration else s_portWidthDeclaration
         
 
     @classmethod
@@ -57,7 +55,10 @@ class VerilogPort:
         :portWidthDeclaration: can be passed as int, as full declaration or as string e.g. representing a parameter
         :returns: string containing a valid parameter width declaration
         """
-        if portWidthDeclaration:
+        if isinstance(portWidthDeclaration, str) and portWidthDeclaration.startswith("["):
+            # full declaration passed
+            s_portWidthDeclaration = portWidthDeclaration
+        elif portWidthDeclaration:
             try:
                 # check for int value
                 s_portWidthDeclaration = "[" + str(int(portWidthDeclaration) - 1) + ":0]"
@@ -86,47 +87,41 @@ class VerilogPort:
         return self.__portType
 
 
-    @classmethod
-    def scan(cls, s_lineIn):
-        """scans s_lineIn (intended to be a line of Verilog module declaration) for a port declaration
+    def get_portWidthDeclaration(self):
+        return self.__s_portWidthDeclaration
+
+
+    def to_dict(self):
+        """serializes the port (e.g. for caching or json export)
 
-        :s_lineIn: line of Verilog code 
-        :returns: VerilogPort object if s_lineIn declared a port; empty list if not
+        :returns: dictionary with portType, identifier and portWidth (None if not given)
         """
-        # check for port declaration and assign if declaration found
-        matchObj = re.search(cls.__re_validPortDeclaration, s_lineIn)
-        if matchObj:
-            portType = matchObj.group(1)
-            s_portWidthDeclaration = matchObj.group(3) if matchObj.group(3) else None
-            # find identifiers (may be multiple ones) in reduced input string (declaration removed by re.sub)
-            identifiers = re.findall( r"[\w-]+", re.sub( cls.__re_validPortDeclaration, "", s_lineIn, count=1 ) )
-             
-#             for identifier in re.findall( cls.__re_portIdentifier, re.sub( cls.__re_validPortDeclaration, "", s_lineIn ) ):
-#                 identifiers.append(identifier)
-            
-            return [ cls(portType, identifier, s_portWidthDeclaration) for identifier in identifiers ]
-
-        else: 
-            return []
+        return { "portType": self.__portType, "identifier": self.__identifier, "portWidth": self.__s_portWidthDeclaration }
 
 
-    def write_declaration(self, file_out, indentObj: IndentObj):
-        """writes a port declaration (without leading or trailing whitespace characters) to the given output file (must be open)
+    @classmethod
+    def fromDict(cls, d_port):
+        """creates a VerilogPort from a dictionary as returned by to_dict
+        """
+        return cls(d_port["portType"], d_port["identifier"], d_port["portWidth"])
+
+
+    def get_declaration(self, indentObj: IndentObj):
+        """returns a port declaration (without leading or trailing whitespace characters)
 
-        :file_out: output file
         :indentObj: IndentObj specifying tabwidth and desiredIndentation 
-        :language: "Verilog" or "SystemVerilog"
+        :returns: declaration string
         """
         if self.__s_portWidthDeclaration:
             t_declaration = (self.__portType, self.__s_portWidthDeclaration, self.__identifier)
         else:
             t_declaration = (self.__portType, self.__identifier)
 
-        file_out.write( get_tabbedString(t_declaration, indentObj) )
+        return get_tabbedString(t_declaration, indentObj)
 
 
-    def write_variable(self, file_out, indentObj: IndentObj, language: HDL_Enum, b_removeIOSuffix: bool=False):
-        """write a variable declaration to file_out according to the given language and port type (input, inout -> wire; output -> reg)
+    def get_variable(self, indentObj: IndentObj, language: HDL_Enum, b_removeIOSuffix: bool=False):
+        """returns a variable declaration according to the given language and port type (input, inout -> wire; output -> reg)
         """
         s_variableIdentifier = self.__identifier if not b_removeIOSuffix else removeIOSuffix(self.__identifier)
 
@@ -135,11 +130,11 @@ class VerilogPort:
         else:
             t_declaration = (language.get_variableType(self.__portType), s_variableIdentifier)
         
-        file_out.write( get_tabbedString(t_declaration, indentObj) )
+        return get_tabbedString(t_declaration, indentObj)
 
 
-    def write_connectedVariable(self, file_out, indentObj: IndentObj, language: HDL_Enum, b_removeIOSuffix: bool=True):
-        """write a variable declaration for a connected variable (e.g. in a testbench) to file_out according to the given language and port type (input -> reg, output, inout -> wire)
+    def get_connectedVariable(self, indentObj: IndentObj, language: HDL_Enum, b_removeIOSuffix: bool=True):
+        """returns a variable declaration for a connected variable (e.g. in a testbench) according to the given language and port type (input -> reg, output, inout -> wire)
         """
         s_variableIdentifier = self.__identifier if not b_removeIOSuffix else removeIOSuffix(self.__identifier)
 
@@ -148,14 +143,14 @@ class VerilogPort:
         else:
             t_declaration = (language.get_connectionType(self.__portType), s_variableIdentifier)
         
-        file_out.write( get_tabbedString(t_declaration, indentObj) )
+        return get_tabbedString(t_declaration, indentObj)
 
 
-    def write_instantiation(self, file_out, indentObj, b_removeIOSuffix=True):
-        """writes a port instantiation (without leading or trailing characters) to the given output file (must be open)
+    def get_instantiation(self, indentObj, b_removeIOSuffix=True):
+        """returns a port instantiation (without leading or trailing characters)
 
-        :file_out: output file
         :indentObj: IndentObj specifying tabwidth and desiredIndentation 
+        :returns: instantiation string
         """
         if b_removeIOSuffix :
             s_instantiationName = removeIOSuffix(self.__identifier)
@@ -163,4 +158,28 @@ class VerilogPort:
             s_instantiationName = self.__identifier
 
         t_declaration = ("." + self.__identifier, "(" + s_instantiationName + ")") 
-        file_out.write( get_tabbedString(t_declaration, indentObj) )
+        return get_tabbedString(t_declaration, indentObj)
+
+
+    def write_declaration(self, file_out, indentObj: IndentObj):
+        """writes a port declaration (see get_declaration) to the given output file (must be open)
+        """
+        file_out.write( self.get_declaration(indentObj) )
+
+
+    def write_variable(self, file_out, indentObj: IndentObj, language: HDL_Enum, b_removeIOSuffix: bool=False):
+        """writes a variable declaration (see get_variable) to the given output file (must be open)
+        """
+        file_out.write( self.get_variable(indentObj, language, b_removeIOSuffix) )
+
+
+    def write_connectedVariable(self, file_out, indentObj: IndentObj, language: HDL_Enum, b_removeIOSuffix: bool=True):
+        """writes a connected variable declaration (see get_connectedVariable) to the given output file (must be open)
+        """
+        file_out.write( self.get_connectedVariable(indentObj, language, b_removeIOSuffix) )
+
+
+    def write_instantiation(self, file_out, indentObj, b_removeIOSuffix=True):
+        """writes a port instantiation (see get_instantiation) to the given output file (must be open)
+        """
+        file_out.write( self.get_instantiation(indentObj, b_removeIOSuffix) )
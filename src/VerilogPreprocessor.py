@@ -0,0 +1,301 @@
+
+#
+# streaming preprocessor stage in front of the tokenizer
+#
+
+import re, os, mmap, itertools
+from VerilogTokenizer import VerilogTokenizer
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+class VerilogPreprocessor:
+    """streaming preprocessing of Verilog/SystemVerilog source code, chunk by chunk
+    Comments are removed before the code reaches VerilogTokenizer, so comments containing '(', ')', ';' or quotes can not confuse declaration scanning. The stage is a generator: it holds one chunk (and a single flag for a block comment spanning chunks) at a time, so memory use does not depend on the file size, and every character is looked at once.
+    Macros used in a module header (e.g. port widths like "[`DATA_W-1:0]") are expanded with the `define directives in front of the module, `include directives are resolved relative to the including file and in the include directories. The directives of every file (source or header) are parsed once per process and kept until the file's mtime changes, so scanning many modules sharing the same headers parses each header only once. Conditional compilation (`ifdef etc.) is not evaluated, i.e. all `define directives are effective.
+    """
+
+    # line comment | complete block comment | begin of a block comment ending in a later chunk (-> group 1) | string (-> group 2)
+    # strings are matched as a whole, so comment delimiters inside strings are left alone (and vice versa)
+    __re_commentOrString = re.compile(r"""//[^\n]*|/\*.*?\*/|(/\*)|("(?:\\.|[^"\\\n])*")""", re.S)
+    # comment | string | macro directive (-> group 1), on bytes level
+    __re_directive = re.compile(rb"""//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|`(define|undef|include)\b""", re.S)
+    # arguments of the directives, matched behind the directive keyword
+    #   `define: name (-> group 1), formal arguments if directly following the name (-> group 2), body including line continuations (-> group 3)
+    __re_define = re.compile(rb"""[ \t]+([A-Za-z_]\w*)(\([^)]*\))?((?:[^\n\\]|\\\r?\n|\\.)*)""", re.S)
+    __re_undef = re.compile(rb"""[ \t]+([A-Za-z_]\w*)""")
+    __re_include = re.compile(rb"""[ \t]*["<]([^">\n]+)[">]""")
+    # identifiers in macro bodies (-> substitution of formal arguments)
+    __re_identifier = re.compile(r"[A-Za-z_]\w*")
+    # parsed directives per file: absolute path -> (mtime, size, list of directives), shared by all instances
+    __d_fileDirectives = {}
+
+
+    def __init__(self, l_includeDirs=()):
+        """
+        :l_includeDirs: directories searched for `include files (after the directory of the including file)
+        """
+        self.l_includeDirs = [ os.path.abspath(s_dir) for s_dir in l_includeDirs ]
+        # headers the expanded macros were read from: absolute path -> mtime (see get_includes)
+        self.__d_includes = {}
+        # (file name, directory of the including file) -> resolved path
+        self.__d_resolvedIncludes = {}
+
+
+    @classmethod
+    def strip_comments(cls, it_chunks, b_stripStrings=False):
+        """generator over the chunks of it_chunks with all comments removed
+        Every comment is replaced by a single space (line endings are kept), so tokens on both sides of a comment stay separated.
+
+        :it_chunks: iterable of source code chunks, every chunk (except the last one) has to end at a line end, e.g. the lines of a read-open file or VerilogTokenizer.iter_chunks
+        :b_stripStrings: if True, string literals are replaced by an empty string literal as well (scanning keeps them by default, they can be parameter values)
+        :returns: source code chunks without comments
+        """
+        re_findCommentOrString = cls.__re_commentOrString.finditer
+        b_inComment = False
+
+        for s_chunk in it_chunks:
+            i_start = 0
+            if b_inComment:
+                # skip the rest of a block comment started in a previous chunk
+                i_commentEnd = s_chunk.find("*/")
+                if i_commentEnd < 0:
+                    continue
+                i_start = i_commentEnd + 2
+                b_inComment = False
+
+            l_code = []
+            for mo in re_findCommentOrString(s_chunk, i_start):
+                l_code.append( s_chunk[i_start:mo.start()] )
+                if mo.group(2) is not None:
+                    l_code.append( '""' if b_stripStrings else mo.group(2) )
+                elif mo.group(1) is not None:
+                    # block comment does not end in this chunk -> everything after it belongs to the comment
+                    b_inComment = True
+                    i_start = len(s_chunk)
+                    break
+                else:
+                    l_code.append(" ")
+                i_start = mo.end()
+            l_code.append( s_chunk[i_start:] )
+
+            yield "".join(l_code)
+
+
+    def expand_macros(self, it_tokens, s_fileIn, offset=0):
+        """generator over the tokens of it_tokens with all macros defined in front of offset in s_fileIn (including `include files) expanded
+        The directives are only collected once the first macro is used, so headers without macros cost nothing. Undefined macros and other directives are passed on unchanged.
+
+        :it_tokens: token iterator (see VerilogTokenizer.tokenize)
+        :s_fileIn: source file the tokens are read from
+        :offset: byte offset of the tokens in s_fileIn (directives behind it are not effective)
+        :returns: token strings
+        """
+        d_macros = None
+        for token in it_tokens:
+            if "`" in token:
+                if d_macros is None:
+                    d_macros = self.get_macros(s_fileIn, offset)
+                yield from self.__expand( itertools.chain([token], it_tokens), d_macros, frozenset(), b_single=True )
+            else:
+                yield token
+
+
+    def get_macros(self, s_fileIn, offset=-1):
+        """collects all macros defined in front of offset in s_fileIn, `include directives are followed recursively
+
+        :s_fileIn: source file
+        :offset: byte offset up to which directives are effective, -1 for the whole file
+        :returns: dictionary macro name -> (list of formal arguments (tuples (name, default value or None)) or None, body)
+        """
+        d_macros = {}
+        self.__apply_directives( os.path.abspath(s_fileIn), offset, d_macros, [] )
+        return d_macros
+
+
+    def get_includes(self):
+        """returns the headers read by get_macros so far (e.g. to invalidate cached scan results if a header changes)
+
+        :returns: list of [absolute path, mtime in ns]
+        """
+        return [ [s_path, mtime] for s_path, mtime in self.__d_includes.items() ]
+
+
+    def __apply_directives(self, s_path, offset, d_macros, l_stack):
+        """applies the directives of s_path in front of offset to d_macros
+
+        :l_stack: files currently being applied (-> recursive includes are skipped)
+        :returns: False if s_path can not be read (like a missing `include file, nothing is applied), otherwise True
+        """
+        l_directives = self.__get_directives(s_path)
+        if l_directives is None:
+            return False
+        l_stack.append(s_path)
+        for directiveOffset, s_directive, value in l_directives:
+            if offset >= 0 and directiveOffset >= offset:
+                break
+            if s_directive == "define":
+                d_macros[value[0]] = value[1:]
+            elif s_directive == "undef":
+                d_macros.pop(value, None)
+            else:
+                s_header = self.__resolve_include(value, os.path.dirname(s_path))
+                if s_header and s_header not in l_stack and self.__apply_directives(s_header, -1, d_macros, l_stack):
+                    self.__d_includes.setdefault( s_header, type(self).__d_fileDirectives[s_header][0] )
+        l_stack.pop()
+        return True
+
+
+    def __resolve_include(self, s_fileName, s_dir):
+        """finds an `include file in s_dir or in the include directories
+
+        :returns: absolute path, empty string if not found
+        """
+        t_key = (s_fileName, s_dir)
+        if t_key not in self.__d_resolvedIncludes:
+            s_resolved = ""
+            if os.path.isabs(s_fileName):
+                s_resolved = s_fileName if os.path.isfile(s_fileName) else ""
+            else:
+                for s_includeDir in [s_dir] + self.l_includeDirs:
+                    s_candidate = os.path.join(s_includeDir, s_fileName)
+                    if os.path.isfile(s_candidate):
+                        s_resolved = os.path.abspath(s_candidate)
+                        break
+            self.__d_resolvedIncludes[t_key] = s_resolved
+        return self.__d_resolvedIncludes[t_key]
+
+
+    @classmethod
+    def __get_directives(cls, s_path):
+        """returns the parsed `define, `undef and `include directives of s_path, parsed only if s_path is new or changed
+
+        :s_path: absolute file path
+        :returns: list of tuples (byte offset, directive, value) in file order, value is (name, formal arguments, body) for `define, the name for `undef and the file name for `include; None if s_path can not be read
+        """
+        try:
+            stat = os.stat(s_path)
+        except OSError:
+            return None
+        t_cached = cls.__d_fileDirectives.get(s_path)
+        if t_cached and t_cached[0] == stat.st_mtime_ns and t_cached[1] == stat.st_size:
+            return t_cached[2]
+
+        VerilogCodeGen_Stats.count("macroFilesParsed")
+        l_directives = []
+        try:
+            with open(s_path, "rb") as file_in:
+                if stat.st_size:
+                    with mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                        # most files do not contain any macro directive -> plain search first
+                        if buffer.find(b"`define") >= 0 or buffer.find(b"`include") >= 0:
+                            l_directives = cls.__parse_directives(buffer)
+        except (OSError, ValueError):
+            return None
+
+        cls.__d_fileDirectives[s_path] = (stat.st_mtime_ns, stat.st_size, l_directives)
+        return l_directives
+
+
+    @classmethod
+    def __parse_directives(cls, buffer):
+        """parses all macro directives of buffer, skipping comments and strings
+
+        :buffer: bytes-like object (bytes, mmap.mmap)
+        :returns: see __get_directives
+        """
+        l_directives = []
+        pos = 0
+        while True:
+            mo = cls.__re_directive.search(buffer, pos)
+            if not mo:
+                return l_directives
+            pos = mo.end()
+            if not mo.group(1):
+                # comment or string
+                continue
+
+            s_directive = mo.group(1).decode()
+            if s_directive == "define":
+                mo_define = cls.__re_define.match(buffer, pos)
+                if not mo_define:
+                    continue
+                s_body = re.sub( r"\\\r?\n", " ", mo_define.group(3).decode("utf-8", "replace") )
+                s_body = "".join( cls.strip_comments([s_body]) ).strip()
+                l_arguments = None
+                if mo_define.group(2) is not None:
+                    l_arguments = []
+                    for s_argument in mo_define.group(2).decode("utf-8", "replace")[1:-1].split(","):
+                        s_name, b_default, s_default = s_argument.partition("=")
+                        if s_name.strip():
+                            l_arguments.append( (s_name.strip(), s_default.strip() if b_default else None) )
+                l_directives.append( (mo.start(), "define", (mo_define.group(1).decode(), l_arguments, s_body)) )
+                pos = mo_define.end()
+            else:
+                mo_argument = (cls.__re_undef if s_directive == "undef" else cls.__re_include).match(buffer, pos)
+                if mo_argument:
+                    l_directives.append( (mo.start(), s_directive, mo_argument.group(1).decode("utf-8", "replace")) )
+                    pos = mo_argument.end()
+
+
+    def __expand(self, it_tokens, d_macros, s_active, b_single=False):
+        """generator expanding the macros in it_tokens
+
+        :d_macros: macro table (see get_macros)
+        :s_active: names of the macros currently being expanded (-> recursive macros are not expanded again)
+        :b_single: only expand the first token (and the arguments it consumes), the rest of it_tokens is left to the caller
+        """
+        it_tokens = iter(it_tokens)
+        while True:
+            token = next(it_tokens, None)
+            if token is None:
+                return
+            if token[0] == "[" and len(token) > 1 and "`" in token:
+                # simple range token -> expand its content
+                l_range = list( self.__expand(VerilogTokenizer.tokenize([token[1:-1]]), d_macros, s_active) )
+                yield "[" + VerilogTokenizer.join_tokens(l_range) + "]"
+            elif token[0] == "`" and token[1:] in d_macros and token[1:] not in s_active:
+                l_arguments, s_body = d_macros[token[1:]]
+                s_lookahead = None
+                if l_arguments is not None:
+                    l_actual, s_lookahead = self.__read_arguments(it_tokens)
+                    d_substitutes = {}
+                    for i_argument, (s_name, s_default) in enumerate(l_arguments):
+                        if i_argument < len(l_actual) and l_actual[i_argument]:
+                            d_substitutes[s_name] = VerilogTokenizer.join_tokens(l_actual[i_argument])
+                        else:
+                            d_substitutes[s_name] = s_default if s_default is not None else ""
+                    s_body = type(self).__re_identifier.sub( lambda mo: d_substitutes.get(mo.group(0), mo.group(0)), s_body )
+                yield from self.__expand( VerilogTokenizer.tokenize([s_body]), d_macros, s_active | {token[1:]} )
+                if s_lookahead is not None:
+                    # function-like macro used without argument list -> the token read behind it is processed next (also if b_single, it was taken from the caller's tokens)
+                    it_tokens = itertools.chain([s_lookahead], it_tokens)
+                    continue
+            else:
+                yield token
+            if b_single:
+                return
+
+
+    @staticmethod
+    def __read_arguments(it_tokens):
+        """reads the actual arguments of a macro call (if the next token opens an argument list)
+
+        :returns: tuple (list of arguments, each as list of tokens; token read behind the macro name if it does not open an argument list (-> to be processed by the caller), otherwise None)
+        """
+        token = next(it_tokens, None)
+        if token != "(":
+            return ([], token)
+        l_arguments = [[]]
+        depth = 0
+        for token in it_tokens:
+            if token in ("(", "[", "{"):
+                depth += 1
+            elif token in (")", "]", "}"):
+                if depth == 0:
+                    break
+                depth -= 1
+            elif token == "," and depth == 0:
+                l_arguments.append([])
+                continue
+            l_arguments[-1].append(token)
+        return (l_arguments, None)
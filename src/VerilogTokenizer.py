@@ -0,0 +1,213 @@
+
+#
+# forward-only tokenizer for Verilog/SystemVerilog source code
+#
+
+import re, mmap
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+class VerilogTokenizer:
+    """splits Verilog/SystemVerilog source code into tokens in a single forward pass
+    Attributes and whitespace are dropped (as well as comments, which find_moduleDeclarations has to recognize in raw code; for tokenize they are removed by VerilogPreprocessor in front), everything else (identifiers, keywords, numbers, strings, compiler directives, simple ranges and operators) is returned as token string. Operators are returned character by character (except for "::"), which is sufficient for scanning declarations.
+    """
+
+    # one alternation for all tokens, only the last group captures (-> re.findall returns an empty string for skipped matches)
+    #   whitespace | line comment | complete block comment | attribute (not "(*)") | (
+    #   begin of a multi-line block comment | string | identifier/keyword/directive | escaped identifier | number | based number | simple range | "::" | any other character )
+    # simple ranges (no nested brackets, comments or strings, e.g. "[WIDTH-1:0]") are returned as one token to speed up declaration scanning
+    __re_token = re.compile(r"""\s+|//.*|/\*.*?\*/|\(\*(?!\)).*?\*\)|(/\*|"(?:\\.|[^"\\\n])*"|`?[A-Za-z_$][\w$]*|\\\S+|[0-9][\w.']*|'[sS]?[bBoOdDhH]?\w*|\[[^\[\]/"]*\]|::|.)""")
+    # first characters of identifiers (and keywords)
+    __identifierStart = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_\\")
+    # spaces which join_tokens removes again (-> all spaces which are not between two word characters)
+    __re_separatingSpace = re.compile(r" (?![\w$`'])|(?<![\w$`']) ")
+    # timescale directive (-> group(1): timescale value)
+    __re_timescale = re.compile(r"`timescale\s*(\w+\s*/\s*\w+)")
+    # substrings find_moduleDeclarations searches for (module keyword, block comment start, timescale directive)
+    __l_declarationTriggers = (b"module", b"/*", b"`timescale")
+    # size of the windows find_moduleDeclarations searches (and releases) memory-mapped buffers in
+    __searchWindowSize = 16 * 1024 * 1024
+
+
+    @classmethod
+    def tokenize(cls, it_chunks):
+        """generator over all tokens in it_chunks
+        Chunks are only read as far as tokens are requested, so a caller which stops iterating early does not read the rest of the file. Comments have to be removed in front of the tokenizer (see VerilogPreprocessor.strip_comments).
+
+        :it_chunks: iterable of comment-free source code chunks, every chunk (except the last one) ending at a line end
+        :returns: token strings
+        """
+        re_findTokens = cls.__re_token.findall
+        # statistics (-> VerilogCodeGen_Stats), counted locally and added when the generator is finished or closed
+        numLines = 0
+        numRegexEvaluations = 0
+
+        try:
+            for s_chunk in it_chunks:
+                numLines += s_chunk.count("\n")
+                numRegexEvaluations += 1
+                for token in re_findTokens(s_chunk):
+                    if token:
+                        yield token
+        finally:
+            VerilogCodeGen_Stats.count("linesRead", numLines)
+            VerilogCodeGen_Stats.count("regexEvaluations", numRegexEvaluations)
+
+
+    @classmethod
+    def find_moduleDeclarations(cls, buffer, offset=0):
+        """generator over all module declarations and timescale directives of buffer (e.g. a memory-mapped file), with their byte offsets, in a single forward pass
+        Instead of tokenizing every line, the buffer is searched on bytes level for "module", "`timescale" and block comment starts. Only the code in front of a candidate (back to the line start or the end of the last skipped comment) is tokenized to sort out candidates inside line comments, strings or identifiers, and block comments are skipped by searching their end. Therefore only a tiny fraction of the buffer is decoded (latin-1, so string positions equal byte offsets).
+        The buffer is searched window by window; pages of a memory-mapped buffer are released once the search has passed them, so memory use does not grow with the buffer size.
+
+        :buffer: bytes-like object supporting find/rfind and slicing (bytes, mmap.mmap)
+        :offset: byte offset to start at
+        :returns: tuples (kind, byte offset, value): ("module", offset of the module keyword, module name) or ("`timescale", offset of the directive, timescale without whitespaces)
+        """
+        # (imported here, the preprocessor itself tokenizes macro bodies)
+        from VerilogPreprocessor import VerilogPreprocessor
+        re_findTokens = cls.__re_token.finditer
+        l_triggers = cls.__l_declarationTriggers
+        size = len(buffer)
+        b_release = isinstance(buffer, mmap.mmap)
+        # candidates in front of i_codeStart are known to be no code (e.g. skipped block comment), tokenizing starts there at the earliest
+        i_codeStart = offset
+        # next occurrence of each trigger in the current window (-1 if none)
+        i_windowEnd = min(size, offset + cls.__searchWindowSize)
+        l_next = [ buffer.find(b_trigger, offset, i_windowEnd) for b_trigger in l_triggers ]
+        # statistics (-> VerilogCodeGen_Stats)
+        numRegexEvaluations = 0
+
+        try:
+            while True:
+                i_candidate = min( [ i_next for i_next in l_next if i_next >= 0 ], default=-1 )
+                if i_candidate < 0:
+                    if i_windowEnd >= size:
+                        return
+                    # next window, overlapping by the trigger length (-> triggers crossing the window border are found exactly once)
+                    l_starts = [ max(i_windowEnd - len(b_trigger) + 1, i_codeStart) for b_trigger in l_triggers ]
+                    if b_release:
+                        cls.__release_pages(buffer, min(l_starts))
+                    i_windowEnd = min(size, i_windowEnd + cls.__searchWindowSize)
+                    l_next = [ buffer.find(b_trigger, i_start, i_windowEnd) for b_trigger, i_start in zip(l_triggers, l_starts) ]
+                    continue
+
+                i_trigger = l_next.index(i_candidate)
+                l_next[i_trigger] = buffer.find(l_triggers[i_trigger], i_candidate + 1, i_windowEnd)
+                if i_candidate < i_codeStart:
+                    # inside an already skipped comment, string or directive
+                    continue
+
+                # tokenize the code in front of the candidate up to the end of its line, and find the token covering the candidate
+                i_lineStart = max( buffer.rfind(b"\n", i_codeStart, i_candidate) + 1, i_codeStart )
+                i_lineEnd = buffer.find(b"\n", i_candidate)
+                s_line = buffer[i_lineStart : i_lineEnd if i_lineEnd >= 0 else size].decode("latin-1")
+                i_relative = i_candidate - i_lineStart
+                numRegexEvaluations += 1
+                for mo_token in re_findTokens(s_line):
+                    if mo_token.end() > i_relative:
+                        break
+                else:
+                    continue
+                token = mo_token.group(1)
+
+                if i_trigger == 0:
+                    # module keyword (also matches "macromodule"; "endmodule" or "a_module" are other tokens)
+                    if token not in ("module", "macromodule") or mo_token.end() != i_relative + 6:
+                        i_codeStart = i_lineStart + mo_token.end()
+                        continue
+                    i_moduleOffset = i_lineStart + mo_token.start(1)
+                    i_codeStart = i_moduleOffset + len(token)
+                    for token in cls.tokenize( VerilogPreprocessor.strip_comments(cls.iter_chunks(buffer, i_codeStart, chunkSize=256)) ):
+                        if token not in ("static", "automatic"):
+                            yield ("module", i_moduleOffset, token)
+                            break
+
+                elif i_trigger == 1:
+                    # block comment start -> continue behind its end
+                    if mo_token.start() != i_relative or not mo_token.group(0).startswith("/*"):
+                        i_codeStart = i_lineStart + mo_token.end()
+                        continue
+                    i_commentEnd = buffer.find(b"*/", i_candidate + 2)
+                    if i_commentEnd < 0:
+                        return
+                    i_codeStart = i_commentEnd + 2
+                    if i_codeStart >= i_windowEnd:
+                        # comment reaches beyond the window -> new window behind the comment
+                        if b_release:
+                            cls.__release_pages(buffer, i_codeStart)
+                        i_windowEnd = min(size, i_codeStart + cls.__searchWindowSize)
+                        l_next = [ buffer.find(b_trigger, i_codeStart, i_windowEnd) for b_trigger in l_triggers ]
+                    else:
+                        l_next = [ i_next if i_next < 0 or i_next >= i_codeStart else buffer.find(l_triggers[i], i_codeStart, i_windowEnd)
+                                    for i, i_next in enumerate(l_next) ]
+
+                else:
+                    # timescale directive
+                    if token != "`timescale" or mo_token.start(1) != i_relative:
+                        i_codeStart = i_lineStart + mo_token.end()
+                        continue
+                    mo_timescale = cls.__re_timescale.match(s_line, i_relative)
+                    if mo_timescale:
+                        yield ("`timescale", i_candidate, re.sub(r"\s", "", mo_timescale.group(1)))
+                    i_codeStart = i_lineStart + (mo_timescale.end() if mo_timescale else mo_token.end())
+        finally:
+            VerilogCodeGen_Stats.count("regexEvaluations", numRegexEvaluations)
+
+
+    @staticmethod
+    def __release_pages(buffer, i_end):
+        """releases the pages of a memory-mapped buffer in front of i_end (they are read again from the file if accessed later)
+        """
+        length = i_end - i_end % mmap.PAGESIZE
+        if length > 0:
+            buffer.madvise(mmap.MADV_DONTNEED, 0, length)
+
+
+    @staticmethod
+    def iter_chunks(buffer, offset=0, s_encoding="latin-1", chunkSize=512, maxChunkSize=262144):
+        """generator over decoded chunks of buffer starting at offset, decoded only as far as they are requested (e.g. by tokenize)
+        Chunks end at line ends and double in size up to maxChunkSize, so a short module header costs a single small chunk while long headers are still decoded in few steps.
+
+        :buffer: bytes-like object supporting find and slicing (bytes, mmap.mmap)
+        :offset: byte offset of the first chunk
+        :s_encoding: encoding used to decode the chunks (undecodable bytes are replaced)
+        :chunkSize: minimum number of bytes of the first chunk (chunks are extended to the next line end)
+        :maxChunkSize: upper limit of the doubled chunk size
+        :returns: decoded chunks (including line endings)
+        """
+        size = len(buffer)
+        while offset < size:
+            i_chunkEnd = buffer.find(b"\n", offset + chunkSize)
+            i_chunkEnd = i_chunkEnd + 1 if i_chunkEnd >= 0 else size
+            yield buffer[offset:i_chunkEnd].decode(s_encoding, "replace")
+            offset = i_chunkEnd
+            chunkSize = min(2 * chunkSize, maxChunkSize)
+
+
+    @classmethod
+    def get_identifierStart(cls):
+        """returns the set of characters an identifier (or keyword) starts with, for time-critical loops which check tokens inline
+        """
+        return cls.__identifierStart
+
+
+    @classmethod
+    def is_identifier(cls, token):
+        """checks whether token is an identifier (or a keyword)
+
+        :token: token string as returned by tokenize
+        :returns: bool
+        """
+        return token[0] in cls.__identifierStart
+
+
+    @classmethod
+    def join_tokens(cls, l_tokens):
+        """reassembles source code from tokens, tokens are only separated by a space where two words would merge otherwise
+        example: ["[", "WIDTH", "-", "1", ":", "0", "]"] -> "[WIDTH-1:0]"
+
+        :l_tokens: list of token strings
+        :returns: string
+        """
+        return cls.__re_separatingSpace.sub( "", " ".join(l_tokens) )
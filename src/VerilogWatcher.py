@@ -0,0 +1,155 @@
+
+#
+# watch mode: regenerates testbenches (and instantiation snippets) when module interfaces change
+#
+
+import os, time
+
+from VerilogModuleIndex import VerilogModuleIndex
+from VerilogModuleCache import VerilogModuleCache
+from VerilogCodeGen_Batch import generate_testbench
+from VerilogCodeGen_Helper import *
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+class VerilogWatcher:
+    """polls directory trees for changed Verilog/SystemVerilog files and regenerates the outputs of modules whose interface changed
+    Changed files (size or mtime of the file or of an `include file its module header depends on) only get their module header rescanned; the interface hash of the scanned module (see VerilogModule.get_interfaceHash) decides whether anything is regenerated, so edits of a module body cost a header scan and nothing else. The first poll only records the current interfaces.
+    """
+
+    def __init__(self, l_roots, d_searchOptions=None, l_includeDirs=(), moduleCacheSize=64, s_outputDir="", s_snippetDir="",
+                    s_author="", s_timescale="", tabwidth=4, s_overwritePolicy="overwrite"):
+        """
+        :l_roots: directories to watch (recursively)
+        :d_searchOptions: options of the directory walk (see VerilogModuleIndex.list_files)
+        :l_includeDirs: directories searched for `include files
+        :moduleCacheSize: size of the module cache in MB (0 disables it)
+        :s_outputDir: directory testbenches are written to, defaults to the directory of each source file
+        :s_snippetDir: directory instantiation snippets (<module>.inst) are written to, no snippets if empty
+        :s_author/s_timescale/tabwidth: see VerilogCodeGen_Batch.generate_testbench
+        :s_overwritePolicy: "overwrite" or "skip" (policy for existing testbench files)
+        """
+        self.l_roots = [ os.path.abspath(s_root) for s_root in l_roots ]
+        self.d_searchOptions = dict(d_searchOptions) if d_searchOptions else {}
+        self.d_searchOptions.pop("b_stopAtUniqueMatch", None)
+        self.l_includeDirs = list(l_includeDirs)
+        self.moduleCacheSize = moduleCacheSize
+        self.s_outputDir = s_outputDir
+        self.s_snippetDir = s_snippetDir
+        self.s_author = s_author
+        self.s_timescale = s_timescale
+        self.tabwidth = tabwidth
+        self.s_overwritePolicy = s_overwritePolicy
+
+        self.__moduleIndex = VerilogModuleIndex.load()
+        self.__moduleCache = VerilogModuleCache.load(moduleCacheSize, l_includeDirs)
+        # absolute path -> (size, mtime, interface hash or None if the file contains no (valid) module, list of tuples (`include file, mtime) of the module header)
+        self.__d_files = {}
+        self.__b_initialized = False
+
+
+    def poll(self):
+        """checks all files once and regenerates the outputs of modules whose interface changed (or which are new)
+
+        :returns: list of tuples (source file, status, message) of all regenerations, status as in VerilogCodeGen_Batch.generate_testbench
+        """
+        l_files = self.__moduleIndex.list_files(self.l_roots, **self.d_searchOptions)
+        self.__moduleIndex.save()
+
+        l_results = []
+        d_files = {}
+        # `include file -> mtime (headers are usually shared by many files, each is stat'ed once per poll)
+        d_includeMtimes = {}
+        for s_file in l_files:
+            # generated testbenches are no sources
+            if os.path.basename(s_file).startswith("tb_"):
+                continue
+            try:
+                stat = os.stat(s_file)
+            except OSError:
+                continue
+
+            t_known = self.__d_files.get(s_file)
+            if t_known and t_known[0] == stat.st_size and t_known[1] == stat.st_mtime_ns and self.__check_includes(t_known[3], d_includeMtimes):
+                d_files[s_file] = t_known
+                continue
+
+            # new or changed file (or `include file) -> rescan the header only
+            VerilogCodeGen_Stats.count("filesChanged")
+            s_interfaceHash, l_includes = self.__get_interfaceHash(s_file)
+            d_files[s_file] = (stat.st_size, stat.st_mtime_ns, s_interfaceHash, l_includes)
+            if self.__b_initialized and s_interfaceHash and (not t_known or t_known[2] != s_interfaceHash):
+                l_results.extend( self.__regenerate(s_file) )
+
+        self.__d_files = d_files
+        self.__b_initialized = True
+        self.__moduleCache.prune()
+        return l_results
+
+
+    def run(self, interval=1.0):
+        """polls every interval seconds until interrupted (Ctrl-C)
+
+        :interval: time between two polls in seconds
+        """
+        self.poll()
+        print("watching " + str(len(self.__d_files)) + " files in " + ", ".join(self.l_roots) + " (Ctrl-C to stop)")
+        try:
+            while True:
+                time.sleep(interval)
+                for s_fileIn, s_status, s_message in self.poll():
+                    print(s_status + ": " + s_fileIn + " (" + s_message + ")", flush=True)
+        except KeyboardInterrupt:
+            print("watch stopped")
+
+
+    def __get_interfaceHash(self, s_file):
+        """scans the header of s_file
+
+        :returns: tuple (interface hash of its (first) module, None if no module declaration can be scanned; list of tuples (`include file, mtime) the header depends on)
+        """
+        try:
+            verilogFile = self.__moduleCache.scan(s_file)
+        except (Exception, SystemExit):
+            # syntax error (e.g. file saved in the middle of an edit) -> treated like a file without module, rescanned on the next change
+            return (None, [])
+        if not verilogFile:
+            return (None, [])
+        return ( verilogFile.verilogModule.get_interfaceHash(), [ tuple(t_include) for t_include in verilogFile.l_includes ] )
+
+
+    @staticmethod
+    def __check_includes(l_includes, d_includeMtimes):
+        """checks whether the `include files of a module header are unchanged
+
+        :l_includes: list of tuples (`include file, mtime when the header was scanned)
+        :d_includeMtimes: `include file -> current mtime (None if it can not be accessed), filled on the way
+        :returns: bool
+        """
+        for s_path, mtime in l_includes:
+            if s_path not in d_includeMtimes:
+                try:
+                    d_includeMtimes[s_path] = os.stat(s_path).st_mtime_ns
+                except OSError:
+                    d_includeMtimes[s_path] = None
+            if d_includeMtimes[s_path] != mtime:
+                return False
+        return True
+
+
+    def __regenerate(self, s_file):
+        """regenerates testbench and instantiation snippet of s_file
+
+        :returns: list of result tuples (see poll)
+        """
+        if self.s_outputDir:
+            os.makedirs(self.s_outputDir, exist_ok=True)
+        l_results = [ generate_testbench(s_file, self.s_overwritePolicy, self.s_outputDir, self.s_author, self.s_timescale,
+                                            self.tabwidth, self.moduleCacheSize, self.l_includeDirs) ]
+        if self.s_snippetDir:
+            verilogFile = self.__moduleCache.scan(s_file)
+            s_snippetFile = os.path.join(self.s_snippetDir, verilogFile.verilogModule.moduleName + ".inst")
+            os.makedirs(self.s_snippetDir, exist_ok=True)
+            writeFileAtomic( s_snippetFile, verilogFile.verilogModule.render_instantiation(IndentObj(self.tabwidth, desiredIndentation=24)) )
+            l_results.append( (s_file, "generated", s_snippetFile) )
+        return l_results
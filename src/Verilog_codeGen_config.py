@@ -8,30 +8,65 @@ from pathlib import Path
 class Verilog_codeGen_config(JSONEncoder):
     """verilog code generator config"""
 
+    # directories which are not searched for modules by default (version control)
+    l_defaultSearchExcludes = [".git", ".svn", ".hg", "__pycache__"]
+    # simulator work and tool output directories, only excluded if configured (part of the configuration template)
+    l_toolSearchExcludes = ["work", "xsim.dir", "xcelium.d", "INCA_libs", "csrc", "simv.daidir", "*.cache", "*.runs", "*.sim", "*.Xil"]
 
-    def __init__(self, configFile, searchPaths=[], author="", tabwidth=0):
+    def __init__(self, configFile, searchPaths=[], author="", tabwidth=0, moduleCacheSize=64, searchExcludes=None, searchMaxDepth=-1, searchFollowSymlinks=False, searchThreads=0, searchStopAtUniqueMatch=False, includeDirs=[], moduleDB=""):
         """
         :configFile: config file with absolute path which is used for this config object
         :searchPaths: search paths used for module instantiation, passed as iterable containing full absolut path strings
         :author: string used as file author
         :tabwidth: preferred tabwidth used to create global IndentObj
+        :moduleCacheSize: maximum size of the cache of scanned module interfaces in MB, 0 disables the cache
+        :searchExcludes: glob patterns of directories which are not searched for modules (patterns containing "/" match the absolute path, all others the directory name), defaults to l_defaultSearchExcludes
+        :searchMaxDepth: maximum directory depth of the module search below each search path, -1 for unlimited
+        :searchFollowSymlinks: descend into symlinked directories during the module search
+        :searchThreads: number of threads reading directories during the module search, 0 to choose automatically
+        :searchStopAtUniqueMatch: skip the remaining search paths once the current working directory (or the search paths searched so far) yielded exactly one module file
+        :includeDirs: directories searched for `include files when macros in scanned module headers are expanded (after the directory of the including file)
+        :moduleDB: shared module database (SQLite file, see VerilogModuleDB) queried by module lookups and testbench generation before the file system, empty to disable
         """
 
         self.__configFile = configFile
         self.searchPaths = searchPaths
         self.author = author
         self.tabwidth = tabwidth
+        self.moduleCacheSize = moduleCacheSize
+        self.searchExcludes = searchExcludes if searchExcludes is not None else list(type(self).l_defaultSearchExcludes)
+        self.searchMaxDepth = searchMaxDepth
+        self.searchFollowSymlinks = searchFollowSymlinks
+        self.searchThreads = searchThreads
+        self.searchStopAtUniqueMatch = searchStopAtUniqueMatch
+        self.includeDirs = includeDirs
+        self.moduleDB = moduleDB
 
 
     def get_configFile(self):
         return self.__configFile
 
 
+    def get_searchOptions(self):
+        """returns the module search options as keyword arguments for VerilogModuleIndex.find
+        """
+        return { "l_excludes": self.searchExcludes, "maxDepth": self.searchMaxDepth, "b_followSymlinks": self.searchFollowSymlinks,
+                 "threads": self.searchThreads, "b_stopAtUniqueMatch": self.searchStopAtUniqueMatch }
+
+
     def __str__(self):
         return "".join( ["configuration file: ", str(self.__configFile), "\n",
                         "search paths: ", str(self.searchPaths), "\n",
                         "author: ", self.author, "\n",
-                        "tabwidth: ", str(self.tabwidth) ] )
+                        "tabwidth: ", str(self.tabwidth), "\n",
+                        "module cache size: ", str(self.moduleCacheSize), " MB", "\n",
+                        "search excludes: ", str(self.searchExcludes), "\n",
+                        "search max depth: ", str(self.searchMaxDepth), "\n",
+                        "search follows symlinks: ", str(self.searchFollowSymlinks), "\n",
+                        "search threads: ", str(self.searchThreads), "\n",
+                        "search stops at unique match: ", str(self.searchStopAtUniqueMatch), "\n",
+                        "include directories: ", str(self.includeDirs), "\n",
+                        "module database: ", self.moduleDB ] )
 
 
     def write_config(self):
@@ -74,7 +109,8 @@ class Verilog_codeGen_config(JSONEncoder):
                 dir_out = "/".join( os.path.abspath(__file__).split("/")[:-2] )
         
         # create empty config object
-        emptyConfig = cls( dir_out + "/config.json", searchPaths=["",""], author="", tabwidth=4 )
+        emptyConfig = cls( dir_out + "/config.json", searchPaths=["",""], author="", tabwidth=4, moduleCacheSize=64,
+                            searchExcludes=cls.l_defaultSearchExcludes + cls.l_toolSearchExcludes )
         emptyConfig.write_config()
         print("Empty configuration file has been written to: " + dir_out + "/config.json")
 
@@ -93,7 +129,16 @@ class Verilog_codeGen_config(JSONEncoder):
                     searchPaths = jsonObj["searchPaths"] if "searchPaths" in jsonObj else []
                     author = jsonObj["author"] if "author" in jsonObj else ""
                     tabwidth = int(jsonObj["tabwidth"]) if "tabwidth" in jsonObj else 0
-                    return cls(s_configFile, searchPaths, author, tabwidth)
+                    moduleCacheSize = int(jsonObj["moduleCacheSize"]) if "moduleCacheSize" in jsonObj else 64
+                    searchExcludes = jsonObj["searchExcludes"] if "searchExcludes" in jsonObj else None
+                    searchMaxDepth = int(jsonObj["searchMaxDepth"]) if "searchMaxDepth" in jsonObj else -1
+                    searchFollowSymlinks = bool(jsonObj["searchFollowSymlinks"]) if "searchFollowSymlinks" in jsonObj else False
+                    searchThreads = int(jsonObj["searchThreads"]) if "searchThreads" in jsonObj else 0
+                    searchStopAtUniqueMatch = bool(jsonObj["searchStopAtUniqueMatch"]) if "searchStopAtUniqueMatch" in jsonObj else False
+                    includeDirs = jsonObj["includeDirs"] if "includeDirs" in jsonObj else []
+                    moduleDB = os.path.expanduser(jsonObj["moduleDB"]) if jsonObj.get("moduleDB") else ""
+                    return cls(s_configFile, searchPaths, author, tabwidth, moduleCacheSize,
+                                searchExcludes, searchMaxDepth, searchFollowSymlinks, searchThreads, searchStopAtUniqueMatch, includeDirs, moduleDB)
             except Exception as e:
                 print("Error while reading configuration from " + s_configFile + "!")
                 return None
@@ -101,6 +146,20 @@ class Verilog_codeGen_config(JSONEncoder):
             return None
 
 
+    @staticmethod
+    def get_cacheDir():
+        """determine the directory for persistent caches (e.g. the module index): $XDG_CACHE_HOME/verilog_codeGen or $HOME/.cache/verilog_codeGen, created if it does not exist
+        :returns: string with absolute path of the cache directory, empty string if it can not be created
+        """
+        s_cacheHome = os.getenv("XDG_CACHE_HOME") or str(Path.home()) + "/.cache"
+        s_cacheDir = s_cacheHome + "/verilog_codeGen"
+        try:
+            os.makedirs( s_cacheDir, exist_ok=True )
+        except OSError:
+            return ""
+        return s_cacheDir
+
+
     @staticmethod
     def __find_config():
         """find config files in in $HOME/.config/verilog_codeGen or top-level directory (.config directory has higher priority)
@@ -129,10 +188,13 @@ class Verilog_codeGen_config(JSONEncoder):
         """specific json encoder for Verilog_codeGen_config"""
 
         def default(self, configObj):
-            """override default method of JSONEncoder -> return a dictionary containing searchPaths, author and tabwidth 
+            """override default method of JSONEncoder -> return a dictionary containing all configuration options
 
            :configObj: Verilog_codeGen_config to be serialized
             """
-            return { "searchPaths": configObj.searchPaths, "author": configObj.author, "tabwidth": configObj.tabwidth}
+            return { "searchPaths": configObj.searchPaths, "author": configObj.author, "tabwidth": configObj.tabwidth, "moduleCacheSize": configObj.moduleCacheSize,
+                        "searchExcludes": configObj.searchExcludes, "searchMaxDepth": configObj.searchMaxDepth, "searchFollowSymlinks": configObj.searchFollowSymlinks,
+                        "searchThreads": configObj.searchThreads, "searchStopAtUniqueMatch": configObj.searchStopAtUniqueMatch,
+                        "includeDirs": configObj.includeDirs, "moduleDB": configObj.moduleDB }
 
             
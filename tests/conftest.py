@@ -0,0 +1,43 @@
+
+#
+# shared fixtures of the verilog_codeGen tests (run with "python -m pytest" in the top level directory)
+#
+
+import os, sys
+import pytest
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ), "src" ) )
+
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
+
+
+@pytest.fixture(autouse=True)
+def cacheHome(tmp_path, monkeypatch):
+    """every test gets its own (empty) cache directory (module index, module cache, hierarchy cache)
+    """
+    s_cacheHome = str(tmp_path / "cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", s_cacheHome)
+    return s_cacheHome
+
+
+@pytest.fixture
+def stats():
+    """enables VerilogCodeGen_Stats for one test (counters start at 0)
+    """
+    VerilogCodeGen_Stats.enable()
+    yield VerilogCodeGen_Stats
+    VerilogCodeGen_Stats.b_enabled = False
+
+
+def write_module(s_path, s_name, s_ports="input clk", s_body="", mtime=None):
+    """writes a module file (directories are created)
+
+    :mtime: mtime in seconds to be set, None to keep the current time
+    :returns: s_path
+    """
+    os.makedirs( os.path.dirname(s_path), exist_ok=True )
+    with open(s_path, "w") as file_out:
+        file_out.write( "module " + s_name + " (" + s_ports + ");\n" + s_body + "endmodule\n" )
+    if mtime is not None:
+        os.utime(s_path, (mtime, mtime))
+    return s_path
@@ -0,0 +1,55 @@
+
+#
+# batch testbench generation: source collection (VerilogCodeGen_Batch) and batch mode detection (verilog_codeGen.py)
+#
+
+import os, sys, subprocess
+
+from VerilogCodeGen_Batch import collect_sourceFiles
+from Verilog_codeGen_config import Verilog_codeGen_config
+from conftest import write_module
+
+
+s_script = os.path.join( os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ), "verilog_codeGen.py" )
+
+
+def run_testbench(tmp_path, l_args):
+    """runs verilog_codeGen --tb l_args in tmp_path (without configuration file)
+
+    :returns: completed process (text output)
+    """
+    d_env = dict(os.environ, HOME=str(tmp_path / "home"))
+    return subprocess.run( [sys.executable, s_script, "--tb", "-a", "author"] + l_args, cwd=str(tmp_path), env=d_env,
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True )
+
+
+def test_batchSourcesHonourExcludes(tmp_path):
+    write_module(str(tmp_path / "rtl" / "a.v"), "a")
+    write_module(str(tmp_path / ".git" / "g.v"), "g")
+    write_module(str(tmp_path / "rtl" / "work" / "w.v"), "w")
+    s_root = str(tmp_path)
+
+    # default excludes: version control only
+    d_searchOptions = Verilog_codeGen_config("").get_searchOptions()
+    assert collect_sourceFiles( [s_root], d_searchOptions=d_searchOptions ) == [ s_root + "/rtl/a.v", s_root + "/rtl/work/w.v" ]
+
+    d_searchOptions = Verilog_codeGen_config( "", searchExcludes=[".git", "work"] ).get_searchOptions()
+    assert collect_sourceFiles( [s_root], d_searchOptions=d_searchOptions ) == [ s_root + "/rtl/a.v" ]
+    assert collect_sourceFiles( [s_root + "/**/*.v"], d_searchOptions=d_searchOptions ) == [ s_root + "/rtl/a.v" ]
+
+
+def test_noSource(tmp_path):
+    process = run_testbench(tmp_path, [])
+    assert process.returncode == 1 and "Please specify a module/file name!" in process.stdout
+
+
+def test_moduleNameNextToDirectory(tmp_path):
+    # fifo.v and a directory fifo -> the module, unless the directory is explicitly given
+    write_module(str(tmp_path / "fifo.v"), "fifo")
+    write_module(str(tmp_path / "fifo" / "inner.v"), "inner")
+
+    assert run_testbench(tmp_path, ["fifo"]).returncode == 0
+    assert os.path.isfile(tmp_path / "tb_fifo.v") and not os.path.exists(tmp_path / "fifo" / "tb_inner.v")
+
+    assert run_testbench(tmp_path, ["fifo/"]).returncode == 0
+    assert os.path.isfile(tmp_path / "fifo" / "tb_inner.v")
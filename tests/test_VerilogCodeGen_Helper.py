@@ -0,0 +1,24 @@
+
+#
+# helper functions (VerilogCodeGen_Helper)
+#
+
+import os, stat
+
+from VerilogCodeGen_Helper import writeFileAtomic
+
+
+def test_writeFileAtomic(tmp_path):
+    s_file = str(tmp_path / "tb_dut.v")
+    writeFileAtomic(s_file, "first\n")
+    with open(s_file) as file_in:
+        assert file_in.read() == "first\n"
+
+    # overwriting keeps the permissions of the existing file
+    os.chmod(s_file, 0o775)
+    writeFileAtomic(s_file, "second\n")
+    with open(s_file) as file_in:
+        assert file_in.read() == "second\n"
+    assert stat.S_IMODE( os.stat(s_file).st_mode ) == 0o775
+    # (no temporary files left)
+    assert os.listdir(tmp_path) == ["tb_dut.v"]
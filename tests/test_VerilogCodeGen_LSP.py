@@ -0,0 +1,67 @@
+
+#
+# language server (VerilogCodeGen_LSP)
+#
+
+import io, os, json, time
+
+from VerilogCodeGen_LSP import VerilogCodeGen_LSP
+from conftest import write_module
+
+
+def encode(d_message):
+    b_body = json.dumps(d_message).encode("utf-8")
+    return b"Content-Length: " + str(len(b_body)).encode("ascii") + b"\r\n\r\n" + b_body
+
+
+def decode(b_output):
+    """:returns: list of all messages written by the server"""
+    l_messages = []
+    for b_part in b_output.split(b"Content-Length: ")[1:]:
+        l_messages.append( json.loads( b_part.split(b"\r\n\r\n", 1)[1] ) )
+    return l_messages
+
+
+def test_malformedMessages():
+    file_in = io.BytesIO( b"Content-Length: 5\r\n\r\n{bad}" + encode([1, 2]) + encode({ "jsonrpc": "2.0", "id": 1, "method": "shutdown" })
+                            + encode({ "jsonrpc": "2.0", "method": "exit" }) )
+    file_out = io.BytesIO()
+    # (the server keeps running after malformed messages)
+    assert VerilogCodeGen_LSP(file_in, file_out).run() == 0
+
+    l_messages = decode( file_out.getvalue() )
+    assert [ d_message.get("error", {}).get("code") for d_message in l_messages ] == [ -32700, -32600, None ]
+    assert l_messages[2]["id"] == 1
+
+
+def test_completionRanking(tmp_path, monkeypatch):
+    # the workspace file is offered first although the search path sorts before it
+    s_workspace = str(tmp_path / "z_workspace")
+    s_library = str(tmp_path / "a_library")
+    write_module(s_workspace + "/fifo.v", "fifo", "input clk")
+    write_module(s_library + "/fifo.v", "fifo", "input clk")
+    s_configDir = str(tmp_path / "home" / ".config" / "verilog_codeGen")
+    os.makedirs(s_configDir)
+    with open(s_configDir + "/config.json", "w") as file_out:
+        json.dump({ "searchPaths": [s_library] }, file_out)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+
+    file_out = io.BytesIO()
+    lsp = VerilogCodeGen_LSP(io.BytesIO(), file_out)
+    lsp.handle_message({ "jsonrpc": "2.0", "id": 1, "method": "initialize", "params": { "rootUri": "file://" + s_workspace } })
+    s_uri = "file://" + s_workspace + "/top.v"
+    lsp.handle_message({ "jsonrpc": "2.0", "method": "textDocument/didOpen", "params": { "textDocument": { "uri": s_uri, "text": "fif" } } })
+
+    # (module files are listed in a background thread)
+    for i in range(100):
+        file_out.seek(0)
+        file_out.truncate()
+        lsp.handle_message({ "jsonrpc": "2.0", "id": 2, "method": "textDocument/completion",
+                                "params": { "textDocument": { "uri": s_uri }, "position": { "line": 0, "character": 3 } } })
+        l_items = decode( file_out.getvalue() )[0]["result"]["items"]
+        if len(l_items) == 2:
+            break
+        time.sleep(0.05)
+
+    assert [ d_item["detail"] for d_item in l_items ] == [ s_workspace + "/fifo.v", s_library + "/fifo.v" ]
+    assert l_items[0]["textEdit"]["newText"].startswith("fifo")
@@ -0,0 +1,95 @@
+
+#
+# resident server: request handling and socket (VerilogCodeGen_Server, VerilogCodeGen_Socket)
+#
+
+import os, stat, threading
+import pytest
+
+from VerilogCodeGen_Server import VerilogCodeGen_Server
+from VerilogCodeGen_Socket import check_socket, send_request
+from conftest import write_module
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # (no configuration file)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    server = VerilogCodeGen_Server( str(tmp_path / "server.sock") )
+    yield server
+    server.server_close()
+
+
+@pytest.fixture
+def workDir(tmp_path, monkeypatch):
+    s_workDir = str(tmp_path / "work")
+    write_module(s_workDir + "/dut.v", "dut", "input clk, output q")
+    # (the server changes into the request's working directory)
+    monkeypatch.chdir(s_workDir)
+    return s_workDir
+
+
+def request_testbench(server, s_workDir, b_overwrite=False, s_author="author"):
+    return server.handle_action( { "action": "tb", "cwd": s_workDir, "name": "dut", "author": s_author, "overwrite": b_overwrite } )
+
+
+def test_requestOptionsNotCached(server, workDir):
+    # output options of a tb request must not leak into the cached scan result
+    with open(workDir + "/dut.v", "w") as file_out:
+        file_out.write("`timescale 1ns/1ps\nmodule dut (input clk);\nendmodule\n")
+    s_scan = server.handle_action( { "action": "scan", "cwd": workDir, "name": "dut" } )["stdout"]
+    assert "timescale: 1ns/1ps" in s_scan
+
+    assert request_testbench(server, workDir, s_author="X")["exitCode"] == 0
+    assert server.handle_action( { "action": "scan", "cwd": workDir, "name": "dut" } )["stdout"] == s_scan
+
+
+def test_testbenchUpToDate(server, workDir):
+    d_response = request_testbench(server, workDir)
+    assert d_response["exitCode"] == 0 and os.path.isfile(workDir + "/tb_dut.v")
+
+    # unchanged -> no overwrite query
+    d_response = request_testbench(server, workDir)
+    assert d_response["exitCode"] == 0 and "exists" not in d_response
+    assert "tb_dut.v is up to date" in d_response["stdout"]
+
+
+def test_testbenchModified(server, workDir):
+    request_testbench(server, workDir)
+    with open(workDir + "/tb_dut.v", "a") as file_out:
+        file_out.write("// edited\n")
+
+    # would change -> overwrite query is up to the client
+    d_response = request_testbench(server, workDir)
+    assert d_response["exitCode"] == 2 and d_response["exists"] == "tb_dut.v"
+    with open(workDir + "/tb_dut.v") as file_in:
+        assert file_in.read().endswith("// edited\n")
+
+    d_response = request_testbench(server, workDir, b_overwrite=True)
+    assert d_response["exitCode"] == 0
+    with open(workDir + "/tb_dut.v") as file_in:
+        assert not file_in.read().endswith("// edited\n")
+
+
+def test_socketMode(server):
+    socketStat = os.stat(server.s_socketPath)
+    assert stat.S_ISSOCK(socketStat.st_mode) and stat.S_IMODE(socketStat.st_mode) == 0o600
+    assert check_socket(server.s_socketPath)
+
+
+def test_request(server, workDir):
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    d_response = send_request( { "action": "scan", "cwd": workDir, "name": "dut" }, server.s_socketPath )
+    thread.join()
+    assert d_response["exitCode"] == 0 and "dut" in d_response["stdout"]
+
+
+def test_noSocket(tmp_path):
+    # e.g. a file placed by another user -> never connected
+    s_path = str(tmp_path / "fake.sock")
+    with open(s_path, "w") as file_out:
+        file_out.write("")
+    assert not check_socket(s_path)
+    assert send_request( {"action": "shutdown"}, s_path ) is None
+    assert not check_socket( str(tmp_path / "missing.sock") )
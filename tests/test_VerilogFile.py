@@ -0,0 +1,176 @@
+
+#
+# module header scanning and generated file handling (VerilogFile)
+#
+
+import os, builtins
+import pytest
+
+from VerilogFile import VerilogFile
+from VerilogCodeGen_Helper import IndentObj
+from conftest import write_module
+
+
+def scan_source(tmp_path, s_source, s_fileName="dut.sv", moduleName=""):
+    """writes s_source to tmp_path/s_fileName and scans it
+
+    :returns: dictionary of the scanned module (see VerilogModule.to_dict)
+    """
+    s_file = str(tmp_path / s_fileName)
+    with open(s_file, "w") as file_out:
+        file_out.write(s_source)
+    verilogFile = VerilogFile.scan(s_file, moduleName)
+    assert verilogFile
+    return verilogFile.verilogModule.to_dict()
+
+
+def get_ports(d_module):
+    return [ (d_port["portType"], d_port["identifier"], d_port["portWidth"]) for d_port in d_module["ports"] ]
+
+
+def get_parameters(d_module):
+    return [ (d_parameter["identifier"], d_parameter["defaultValue"]) for d_parameter in d_module["parameters"] ]
+
+
+#### header parsing ####
+
+def test_commentsWithDelimiters(tmp_path):
+    d_module = scan_source(tmp_path, """
+// module fake (input wrong);
+module dut ( // port list ( starts here;
+    input  clk, /* ) ; " */
+    output [7:0] q // ;)
+);
+endmodule
+""")
+    assert d_module["moduleName"] == "dut"
+    assert get_ports(d_module) == [ ("input", "clk", None), ("output", "q", "[7:0]") ]
+
+
+def test_multiLineParameters(tmp_path):
+    d_module = scan_source(tmp_path, """
+module dut
+  #(
+    parameter WIDTH =
+        8,
+    parameter DEPTH = (WIDTH *
+                       2)
+  )
+  (
+    input  [WIDTH-1:0] a,
+    output             b
+  );
+endmodule
+""")
+    assert get_parameters(d_module) == [ ("WIDTH", "8"), ("DEPTH", "(WIDTH*2)") ]
+    assert get_ports(d_module) == [ ("input", "a", "[WIDTH-1:0]"), ("output", "b", None) ]
+
+
+def test_packageImport(tmp_path):
+    d_module = scan_source(tmp_path, """
+package pkg; typedef logic [3:0] nibble_t; endpackage
+module dut
+  import pkg::*;
+  #(parameter int N = 2)
+  (input logic clk, output pkg::nibble_t q);
+endmodule
+""")
+    assert d_module["moduleName"] == "dut"
+    assert get_parameters(d_module) == [ ("N", "2") ]
+    assert [ s_identifier for s_type, s_identifier, s_width in get_ports(d_module) ] == ["clk", "q"]
+
+
+def test_macros(tmp_path):
+    d_module = scan_source(tmp_path, """
+`define WIDTH 8
+`define ADD(a, b) a+b
+module dut #(parameter P = `ADD(`WIDTH, 1)) (input [`WIDTH-1:0] a, output [`ADD(P,1):0] b);
+endmodule
+""")
+    assert get_parameters(d_module) == [ ("P", "8+1") ]
+    assert get_ports(d_module) == [ ("input", "a", "[8-1:0]"), ("output", "b", "[P+1:0]") ]
+
+
+def test_functionMacroWithoutArguments(tmp_path):
+    # the token behind a function-like macro used without argument list must not get lost
+    d_module = scan_source(tmp_path, """
+`define EMPTY(x) x
+`define N 4
+module dut #(parameter P = `EMPTY `N) (input [`N-1:0] a);
+endmodule
+""")
+    assert get_parameters(d_module) == [ ("P", "4") ]
+    assert get_ports(d_module) == [ ("input", "a", "[4-1:0]") ]
+
+
+def test_includedMacros(tmp_path):
+    with open(tmp_path / "defs.vh", "w") as file_out:
+        file_out.write("`define WIDTH 16\n")
+    s_file = str(tmp_path / "dut.v")
+    with open(s_file, "w") as file_out:
+        file_out.write("`include \"defs.vh\"\nmodule dut (input [`WIDTH-1:0] a);\nendmodule\n")
+    verilogFile = VerilogFile.scan(s_file)
+    assert get_ports( verilogFile.verilogModule.to_dict() ) == [ ("input", "a", "[16-1:0]") ]
+    assert verilogFile.get_includeFiles() == [ str(tmp_path / "defs.vh") ]
+
+
+def test_unreadableInclude(tmp_path, monkeypatch):
+    # an include file which exists but can not be opened is skipped like a missing one
+    with open(tmp_path / "defs.vh", "w") as file_out:
+        file_out.write("`define WIDTH 16\n")
+    s_file = str(tmp_path / "dut.v")
+    with open(s_file, "w") as file_out:
+        file_out.write("`include \"defs.vh\"\nmodule dut (input [`WIDTH-1:0] a);\nendmodule\n")
+
+    def open_failing(s_path, *args, **kwargs):
+        if str(s_path).endswith("defs.vh"):
+            raise PermissionError(s_path)
+        return builtins.open(s_path, *args, **kwargs)
+
+    monkeypatch.setattr("VerilogPreprocessor.open", open_failing, raising=False)
+    verilogFile = VerilogFile.scan(s_file)
+    assert get_ports( verilogFile.verilogModule.to_dict() ) == [ ("input", "a", "[`WIDTH-1:0]") ]
+    assert verilogFile.get_includeFiles() == []
+
+
+def test_selectedModule(tmp_path):
+    s_source = "module first (input a);\nendmodule\nmodule second (output b);\nendmodule\n"
+    assert scan_source(tmp_path, s_source)["moduleName"] == "first"
+    assert get_ports( scan_source(tmp_path, s_source, moduleName="second") ) == [ ("output", "b", None) ]
+
+
+#### generated files ####
+
+@pytest.fixture
+def verilogFile(tmp_path):
+    verilogFile = VerilogFile.scan( write_module(str(tmp_path / "dut.v"), "dut", "input clk, output [3:0] q") )
+    verilogFile.indentObj = IndentObj(4, desiredIndentation=24)
+    verilogFile.s_author = "author"
+    return verilogFile
+
+
+def test_fingerprintSkip(tmp_path, verilogFile):
+    s_fileOut = str(tmp_path / "tb_dut.v")
+    assert verilogFile.write_testbenchFile(s_fileOut, s_overwritePolicy="skip") == "written"
+    mtime = os.stat(s_fileOut).st_mtime_ns
+    # (fingerprint kept in the cache directory, nothing next to the generated file)
+    assert sorted(os.listdir(tmp_path)) == ["cache", "dut.v", "tb_dut.v"]
+
+    # up to date -> neither rendered nor written
+    assert verilogFile.write_testbenchFile(s_fileOut, s_overwritePolicy="skip") == "unchanged"
+    assert os.stat(s_fileOut).st_mtime_ns == mtime
+
+    # a changed output option changes the fingerprint
+    verilogFile.s_author = "somebody else"
+    assert verilogFile.write_testbenchFile(s_fileOut, s_overwritePolicy="overwrite") == "written"
+
+
+def test_modifiedFileIsKept(tmp_path, verilogFile):
+    s_fileOut = str(tmp_path / "tb_dut.v")
+    verilogFile.write_testbenchFile(s_fileOut, s_overwritePolicy="skip")
+    with open(s_fileOut, "a") as file_out:
+        file_out.write("// edited\n")
+
+    assert verilogFile.write_testbenchFile(s_fileOut, s_overwritePolicy="skip") == "skipped"
+    with open(s_fileOut) as file_in:
+        assert file_in.read().endswith("// edited\n")
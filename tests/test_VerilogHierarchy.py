@@ -0,0 +1,39 @@
+
+#
+# design hierarchy extraction (VerilogHierarchy)
+#
+
+from VerilogHierarchy import VerilogHierarchy
+from conftest import write_module
+
+
+def build_count(stats, s_root):
+    """builds the hierarchy of s_root
+
+    :returns: tuple (hierarchy dictionary, number of files served by the cache)
+    """
+    cacheHits = stats.d_counters.get("cacheHits", 0)
+    d_hierarchy = VerilogHierarchy.build( [s_root], jobs=1 ).to_dict()
+    return ( d_hierarchy, stats.d_counters.get("cacheHits", 0) - cacheHits )
+
+
+def test_instances(tmp_path, stats):
+    s_root = str(tmp_path / "rtl")
+    write_module(s_root + "/top.v", "top", s_body="sub #(.W(2)) u_sub0 (.a(a));\nsub u_sub1 (.a(a));\nprim u_prim (.a(a));\n")
+    write_module(s_root + "/sub.v", "sub", "input a")
+
+    d_hierarchy, cacheHits = build_count(stats, s_root)
+    assert d_hierarchy["modules"]["top"]["instances"] == {"sub": 2, "prim": 1}
+    assert d_hierarchy["tops"] == ["top"]
+    assert cacheHits == 0
+    assert build_count(stats, s_root) == (d_hierarchy, 2)
+
+
+def test_cachePerRoot(tmp_path, stats):
+    # alternating between two projects keeps both cached
+    s_rootA = write_module(str(tmp_path / "a" / "top_a.v"), "top_a").rsplit("/", 1)[0]
+    s_rootB = write_module(str(tmp_path / "b" / "top_b.v"), "top_b").rsplit("/", 1)[0]
+    build_count(stats, s_rootA)
+    build_count(stats, s_rootB)
+    assert build_count(stats, s_rootA)[1] == 1
+    assert build_count(stats, s_rootB)[1] == 1
@@ -0,0 +1,108 @@
+
+#
+# invalidation of the persistent module cache (VerilogModuleCache)
+#
+
+import os
+
+from VerilogModuleCache import VerilogModuleCache
+from conftest import write_module
+
+
+def scan_count(stats, moduleCache, s_file):
+    """scans s_file through moduleCache
+
+    :returns: tuple (scanned module dictionary, True if served by the cache)
+    """
+    cacheHits = stats.d_counters.get("cacheHits", 0)
+    verilogFile = moduleCache.scan(s_file)
+    return ( verilogFile.verilogModule.to_dict(), stats.d_counters.get("cacheHits", 0) > cacheHits )
+
+
+def get_portNames(d_module):
+    return [ d_port["identifier"] for d_port in d_module["ports"] ]
+
+
+def test_unchangedFileIsServed(tmp_path, stats):
+    s_file = write_module(str(tmp_path / "dut.v"), "dut", "input a", mtime=1000000)
+    d_module, b_hit = scan_count(stats, VerilogModuleCache.load(), s_file)
+    assert not b_hit and get_portNames(d_module) == ["a"]
+    # (new cache object -> served by the entry file)
+    d_module, b_hit = scan_count(stats, VerilogModuleCache.load(), s_file)
+    assert b_hit and get_portNames(d_module) == ["a"]
+
+
+def test_changedContent(tmp_path, stats):
+    s_file = write_module(str(tmp_path / "dut.v"), "dut", "input a", mtime=1000000)
+    moduleCache = VerilogModuleCache.load()
+    scan_count(stats, moduleCache, s_file)
+
+    # same size, new mtime
+    write_module(s_file, "dut", "input b", mtime=1000001)
+    d_module, b_hit = scan_count(stats, moduleCache, s_file)
+    assert not b_hit and get_portNames(d_module) == ["b"]
+
+
+def test_changedContentSameMtime(tmp_path, stats):
+    # (e.g. a file rewritten within the mtime resolution) -> the size decides
+    s_file = write_module(str(tmp_path / "dut.v"), "dut", "input a", mtime=1000000)
+    moduleCache = VerilogModuleCache.load()
+    scan_count(stats, moduleCache, s_file)
+
+    write_module(s_file, "dut", "input a, output b", mtime=1000000)
+    d_module, b_hit = scan_count(stats, moduleCache, s_file)
+    assert not b_hit and get_portNames(d_module) == ["a", "b"]
+
+
+def test_touchedFileIsServedByHash(tmp_path, stats):
+    # only the mtime changed (e.g. after a checkout) -> content hash matches, no rescan
+    s_file = write_module(str(tmp_path / "dut.v"), "dut", "input a", mtime=1000000)
+    moduleCache = VerilogModuleCache.load()
+    scan_count(stats, moduleCache, s_file)
+
+    # (the hash is only computed on the first mtime change, that one still rescans)
+    os.utime(s_file, (2000000, 2000000))
+    assert not scan_count(stats, moduleCache, s_file)[1]
+    os.utime(s_file, (3000000, 3000000))
+    d_module, b_hit = scan_count(stats, moduleCache, s_file)
+    assert b_hit and get_portNames(d_module) == ["a"]
+
+
+def test_coldScanDoesNotHash(tmp_path, monkeypatch):
+    # a cold scan must not read the whole file just for the cache
+    s_file = write_module(str(tmp_path / "dut.v"), "dut", "input a", mtime=1000000)
+
+    def fail(s_path):
+        raise AssertionError("hashed " + s_path)
+
+    monkeypatch.setattr(VerilogModuleCache, "_VerilogModuleCache__get_hash", staticmethod(fail))
+    moduleCache = VerilogModuleCache.load()
+    assert get_portNames( moduleCache.scan(s_file).verilogModule.to_dict() ) == ["a"]
+    write_module(s_file, "dut", "input a, input b", mtime=1000001)
+    assert get_portNames( moduleCache.scan(s_file).verilogModule.to_dict() ) == ["a", "b"]
+
+
+def test_changedInclude(tmp_path, stats):
+    s_header = str(tmp_path / "defs.vh")
+    with open(s_header, "w") as file_out:
+        file_out.write("`define W 8\n")
+    os.utime(s_header, (1000000, 1000000))
+    s_file = str(tmp_path / "dut.v")
+    with open(s_file, "w") as file_out:
+        file_out.write("`include \"defs.vh\"\nmodule dut (input [`W-1:0] a);\nendmodule\n")
+
+    moduleCache = VerilogModuleCache.load()
+    assert scan_count(stats, moduleCache, s_file)[0]["ports"][0]["portWidth"] == "[8-1:0]"
+
+    with open(s_header, "w") as file_out:
+        file_out.write("`define W 16\n")
+    os.utime(s_header, (1000001, 1000001))
+    d_module, b_hit = scan_count(stats, moduleCache, s_file)
+    assert not b_hit and d_module["ports"][0]["portWidth"] == "[16-1:0]"
+
+
+def test_disabledCache(tmp_path):
+    s_file = write_module(str(tmp_path / "dut.v"), "dut", "input a")
+    moduleCache = VerilogModuleCache.load(maxSize=0)
+    assert get_portNames( moduleCache.scan(s_file).verilogModule.to_dict() ) == ["a"]
+    assert not os.path.exists( os.path.join(os.environ["XDG_CACHE_HOME"], "verilog_codeGen", "modules") )
@@ -0,0 +1,47 @@
+
+#
+# persistent module index (VerilogModuleIndex)
+#
+
+import os
+
+from VerilogModuleIndex import VerilogModuleIndex
+from conftest import write_module
+
+
+def test_findAndPersist(tmp_path, cacheHome):
+    s_root = str(tmp_path / "rtl")
+    s_file = write_module(s_root + "/sub/dut.sv", "dut")
+    write_module(s_root + "/other.v", "other")
+
+    moduleIndex = VerilogModuleIndex.load()
+    assert moduleIndex.find("dut", [s_root]) == [s_file]
+    assert moduleIndex.find("dut.sv", [s_root]) == [s_file]
+    assert moduleIndex.find("dut.v", [s_root]) == []
+    moduleIndex.save()
+    assert os.path.isfile( os.path.join(cacheHome, "verilog_codeGen", "moduleIndex.json") )
+
+    # (loaded from the index file)
+    assert VerilogModuleIndex.load().find("dut", [s_root]) == [s_file]
+
+
+def test_changedDirectories(tmp_path):
+    s_root = str(tmp_path / "rtl")
+    s_file = write_module(s_root + "/sub/dut.v", "dut")
+    moduleIndex = VerilogModuleIndex.load()
+    assert moduleIndex.find("dut", [s_root]) == [s_file]
+    moduleIndex.save()
+
+    # added and removed files are picked up by the next lookup (directory mtimes changed)
+    os.remove(s_file)
+    s_newFile = write_module(s_root + "/new/dut.v", "dut")
+    assert VerilogModuleIndex.load().find("dut", [s_root]) == [s_newFile]
+
+
+def test_excludesAndDepth(tmp_path):
+    s_root = str(tmp_path / "rtl")
+    write_module(s_root + "/work/dut.v", "dut")
+    s_file = write_module(s_root + "/a/b/dut.v", "dut")
+    moduleIndex = VerilogModuleIndex.load()
+    assert moduleIndex.find("dut", [s_root], l_excludes=["work"]) == [s_file]
+    assert moduleIndex.find("dut", [s_root], l_excludes=["work"], maxDepth=1) == []
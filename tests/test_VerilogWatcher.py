@@ -0,0 +1,45 @@
+
+#
+# watch mode (VerilogWatcher)
+#
+
+import os
+
+from VerilogWatcher import VerilogWatcher
+from conftest import write_module
+
+
+def test_regenerateOnInterfaceChange(tmp_path):
+    s_file = write_module(str(tmp_path / "rtl" / "dut.v"), "dut", "input a", mtime=1000000)
+    watcher = VerilogWatcher( [str(tmp_path / "rtl")], s_outputDir=str(tmp_path / "tb") )
+    # (first poll only records the interfaces)
+    assert watcher.poll() == []
+
+    # body change -> nothing to do
+    write_module(s_file, "dut", "input a", s_body="assign x = 1;\n", mtime=1000001)
+    assert watcher.poll() == []
+
+    write_module(s_file, "dut", "input a, output b", mtime=1000002)
+    assert watcher.poll() == [ (s_file, "generated", str(tmp_path / "tb" / "tb_dut.v")) ]
+
+
+def test_regenerateOnIncludeChange(tmp_path):
+    s_header = str(tmp_path / "rtl" / "defs.vh")
+    s_file = str(tmp_path / "rtl" / "dut.v")
+    os.makedirs(tmp_path / "rtl")
+    with open(s_header, "w") as file_out:
+        file_out.write("`define W 8\n")
+    os.utime(s_header, (1000000, 1000000))
+    with open(s_file, "w") as file_out:
+        file_out.write("`include \"defs.vh\"\nmodule dut (input [`W-1:0] a);\nendmodule\n")
+
+    watcher = VerilogWatcher( [str(tmp_path / "rtl")], s_outputDir=str(tmp_path / "tb") )
+    assert watcher.poll() == []
+
+    with open(s_header, "w") as file_out:
+        file_out.write("`define W 16\n")
+    os.utime(s_header, (1000001, 1000001))
+    assert watcher.poll() == [ (s_file, "generated", str(tmp_path / "tb" / "tb_dut.v")) ]
+    with open(tmp_path / "tb" / "tb_dut.v") as file_in:
+        assert "[16-1:0]" in file_in.read()
+    assert watcher.poll() == []
@@ -0,0 +1,116 @@
+
+#
+# module search: ranking of several matches, module index vs. module database, consumers of the ranking (--modInst, --hierarchy)
+#
+
+import io, json
+import pytest
+
+from VerilogModule import VerilogModule
+from VerilogModuleIndex import VerilogModuleIndex
+from VerilogModuleDB import VerilogModuleDB
+from VerilogHierarchy import VerilogHierarchy
+from Verilog_codeGen_config import Verilog_codeGen_config
+from conftest import write_module
+
+
+@pytest.fixture
+def project(tmp_path):
+    """working directory proj/sub and two search paths, each containing a module "fifo" (at different depths, with different mtimes)
+
+    :returns: dictionary with the roots and the fifo files
+    """
+    d_project = { "cwd": str(tmp_path / "proj" / "sub"), "lib1": str(tmp_path / "lib1"), "lib2": str(tmp_path / "lib2") }
+    d_project["fifo_cwd"]  = write_module(d_project["cwd"] + "/fifo.v", "fifo", mtime=1000000)
+    d_project["fifo_deep"] = write_module(d_project["lib1"] + "/a/b/fifo.v", "fifo", mtime=3000000)
+    d_project["fifo_old"]  = write_module(d_project["lib1"] + "/fifo.sv", "fifo", mtime=1000000)
+    d_project["fifo_new"]  = write_module(d_project["lib1"] + "/x/fifo.v", "fifo", mtime=2000000)
+    d_project["fifo_lib2"] = write_module(d_project["lib2"] + "/fifo.v", "fifo", mtime=3000000)
+    write_module(d_project["lib2"] + "/leaf.v", "leaf")
+    d_project["roots"] = [ d_project["cwd"], d_project["lib1"], d_project["lib2"] ]
+    return d_project
+
+
+def get_ranking(d_project):
+    return [ d_project["fifo_cwd"], d_project["fifo_old"], d_project["fifo_new"], d_project["fifo_deep"], d_project["fifo_lib2"] ]
+
+
+#### ranking ####
+
+def test_rankFiles(project):
+    # working directory, search path order, depth below the root, newest first
+    l_shuffled = list( reversed( get_ranking(project) ) )
+    assert VerilogModuleIndex.rank_files(l_shuffled, project["roots"]) == get_ranking(project)
+
+
+def test_indexFindIsRanked(project):
+    moduleIndex = VerilogModuleIndex.load()
+    assert moduleIndex.find("fifo", project["roots"]) == get_ranking(project)
+    # (answered from the index)
+    assert moduleIndex.find("fifo", project["roots"]) == get_ranking(project)
+
+
+#### module instantiation ####
+
+def instantiate(project, monkeypatch, s_moduleDB=""):
+    """runs the module instantiation of "fifo" in the working directory of project
+
+    :returns: alternatives record (see VerilogModule.generate_instantiationFromSearch)
+    """
+    monkeypatch.chdir(project["cwd"])
+    config = Verilog_codeGen_config( "", searchPaths=[ project["lib1"], project["lib2"] ], moduleDB=s_moduleDB )
+    file_out = io.StringIO()
+    file_alternatives = io.StringIO()
+    assert VerilogModule.generate_instantiationFromSearch( "fifo", config, fileDescriptor=file_out, file_alternatives=file_alternatives )
+    assert file_out.getvalue().startswith("fifo")
+    return json.loads( file_alternatives.getvalue() )
+
+
+def test_instantiationPrefersWorkingDirectory(project, monkeypatch):
+    d_alternatives = instantiate(project, monkeypatch)
+    assert d_alternatives["selected"] == project["fifo_cwd"]
+    assert d_alternatives["alternatives"] == get_ranking(project)[1:]
+
+
+def test_instantiationOfFilePath(project, monkeypatch):
+    monkeypatch.chdir(project["cwd"])
+    config = Verilog_codeGen_config( "", searchPaths=[ project["lib1"] ] )
+    t_result = VerilogModule.generate_instantiationFromSearch( project["fifo_deep"], config, fileDescriptor=io.StringIO() )
+    assert t_result[0] == project["fifo_deep"]
+
+
+#### module database ####
+
+def test_databaseFindMatchesIndex(project, tmp_path):
+    moduleDB = VerilogModuleDB.create( str(tmp_path / "modules.db") )
+    d_summary = moduleDB.update( project["roots"][1:], jobs=1 )
+    assert d_summary["files"] == 5
+    moduleDB.close()
+
+    moduleDB = VerilogModuleDB.load( str(tmp_path / "modules.db") )
+    l_dbFiles = moduleDB.find("fifo", project["roots"])
+    assert l_dbFiles == VerilogModuleIndex.load().find("fifo", project["roots"][1:])
+    assert l_dbFiles[0] == project["fifo_old"]
+
+
+def test_databaseDoesNotChangeSelection(project, monkeypatch, tmp_path):
+    # database built from the search paths only -> the working directory is still searched
+    s_dbFile = str(tmp_path / "modules.db")
+    moduleDB = VerilogModuleDB.create(s_dbFile)
+    moduleDB.update( [ project["lib1"], project["lib2"] ], jobs=1 )
+    moduleDB.close()
+
+    assert instantiate(project, monkeypatch, s_dbFile) == instantiate(project, monkeypatch)
+
+
+#### hierarchy ####
+
+def test_hierarchyUsesRankedDeclaration(project):
+    # the module in the working directory instantiates leaf, the others do not
+    write_module(project["fifo_cwd"], "fifo", s_body="leaf u_leaf (.clk(clk));\n")
+    d_hierarchy = VerilogHierarchy.build( project["roots"], jobs=1, b_useCache=False ).to_dict()
+
+    assert d_hierarchy["modules"]["fifo"]["file"] == project["fifo_cwd"]
+    assert d_hierarchy["modules"]["fifo"]["instances"] == {"leaf": 1}
+    assert d_hierarchy["duplicates"]["fifo"] == get_ranking(project)
+    assert d_hierarchy["tops"] == ["fifo"]
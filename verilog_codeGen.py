@@ -34,6 +34,10 @@
 #       - searchPaths: list of paths where the specified module is searched in module instantiation (besides the working directory which is always used for the search)
 #       - author: author to be used in each file generating mode
 #       - tabwidth: set to your desired tabwidth, used in each writing operation
+#       - moduleCacheSize: maximum size of the cache of scanned module interfaces in MB (0 disables the cache)
+#       - searchExcludes, searchMaxDepth, searchFollowSymlinks, searchThreads, searchStopAtUniqueMatch: options of the module search (see README)
+#       - includeDirs: directories searched for `include files when macros in scanned module headers are expanded (-I directories are searched first)
+#       - moduleDB: SQLite module database shared by a team (module lookups and testbench generation query it before the file system), built with --update-db
 #   Every option (except from searchPaths) is overwritten if a command line parameter is given for this option
 #
 #
@@ -47,13 +51,43 @@
 #   * testbench generation
 #       verilog_codeGen --testbench/tb <module/file name>
 #
+#   * batch testbench generation (parallel, non-interactive)
+#       verilog_codeGen --tb [--overwrite skip/overwrite --output-dir <dir> -j <jobs> --file-list <file>] <files/directories/glob patterns>
+#
 #   * module instantiation
-#       verilog_codeGen --module-instantiation/mod-inst/modInst <module/file name>
+#       verilog_codeGen --module-instantiation/mod-inst/modInst [--alternatives] <module/file name>
+#
+#   * watch mode (regenerates testbenches/instantiation snippets of modules whose interface changed)
+#       verilog_codeGen --watch [--interval <seconds> --output-dir <dir> --snippet-dir <dir> --overwrite skip/overwrite] [<directories>]
+#
+#   * design hierarchy (all modules below the given directories, default: working directory and searchPaths)
+#       verilog_codeGen --hierarchy [--hierarchy-format json/dot -j <jobs>] [<directories>]
+#
+#   * shared module database (see moduleDB, e.g. updated by a cron or CI job)
+#       verilog_codeGen --update-db [-j <jobs>] [<directories>]
 #
 #   * config template generation
 #       verilog_codeGen --config-template [output dir]
+#
+#   * scan a file and print the found module declaration
+#       verilog_codeGen --scan <module/file name>
+#
+#   * files containing several modules (e.g. simulation libraries or netlists)
+#       verilog_codeGen --list-modules <file name>
+#       verilog_codeGen --tb/--scan/--modInst --module <module name> <module/file name>
+#
+#   * resident server mode (used by verilog_codeGen_client.py for fast editor integration)
+#       verilog_codeGen --server
+#       verilog_codeGen --stop-server
+#
+#   * language server (module name completion inserting the instantiation, for editors speaking the Language Server Protocol)
+#       verilog_codeGen --lsp
+#
+#   * instrumentation (combinable with any action)
+#       verilog_codeGen --stats ...                     (per-phase timings and counters as JSON on stderr)
+#       verilog_codeGen --profile <profile_file> ...    (cProfile stats dump)
 #   
-#   It is only possible to perform one of the three actions at a time
+#   It is only possible to perform one of the actions at a time
 #
 #   #######################
 #   #### configuration ####
@@ -95,17 +129,19 @@ def add_srcPath():
     sys.path.append( "/".join(l_srcPath) )
     
 
-import sys, os, re
+import sys, os, re, json, atexit
 from optparse import OptionParser
 from time import localtime, strftime
 from pathlib import Path
 add_srcPath()
 from VerilogModule import VerilogModule
 from VerilogFile import VerilogFile
+from VerilogModuleCache import VerilogModuleCache
 from VerilogPort import VerilogPort
 from VerilogParameter import VerilogParameter
 from Verilog_codeGen_config import Verilog_codeGen_config
 from VerilogCodeGen_Helper import *
+from VerilogCodeGen_Stats import VerilogCodeGen_Stats
 
 
 ######################
@@ -154,10 +190,111 @@ if __name__ == '__main__':
             action="store_true",
             dest="b_createTestbench",
             help="scans the specified input file and generates a suitable testbench")
+    parser.add_option("--file-list",
+            dest="s_fileList",
+            help="testbench generation for all sources (files, directories or glob patterns) listed in the given file, one per line (\"-\" reads from stdin)",
+            metavar="file_list")
+    parser.add_option("--overwrite",
+            dest="s_overwritePolicy",
+            type="choice",
+            choices=["ask", "skip", "overwrite"],
+            help="policy for existing output files: ask (default for single files), skip (default for batch generation) or overwrite",
+            metavar="policy")
+    parser.add_option("--output-dir",
+            dest="s_outputDir",
+            help="output directory for batch testbench generation and --watch, defaults to the directory of each source file",
+            metavar="output_dir")
+    parser.add_option("-j","--jobs",
+            dest="jobs",
+            type="int",
+            help="number of worker processes for batch testbench generation, defaults to the number of cores",
+            metavar="jobs")
     parser.add_option("--module-instantiation","--mod-inst","--modInst",
             action="store_true",
             dest="b_moduleInstantiation",
             help="searches the specified module and prints an instantiation")
+    parser.add_option("--alternatives",
+            action="store_true",
+            dest="b_alternatives",
+            help="--modInst instantiates the best ranked of several matching module files (working directory, search path order, directory depth, newest), this option additionally writes the selected and all other matching files as one JSON line to stderr")
+    parser.add_option("--complete",
+            dest="s_completeQuery",
+            help="prints the names of up to 10 modules in the search paths matching the given partial or misspelled module name, best match first (prefix, substring and fuzzy matches, e.g. for editor completion)",
+            metavar="name")
+    parser.add_option("--scan",
+            action="store_true",
+            dest="b_scan",
+            help="scans the specified input file and prints the found module declaration")
+    parser.add_option("--json",
+            action="store_true",
+            dest="b_json",
+            help="prints the scanned module interface (ports, widths, parameters, defaults, timescale, language) as JSON; for several sources, directories, glob patterns or --file-list, one JSON line per module of every file (JSONL)")
+    parser.add_option("--list-modules",
+            action="store_true",
+            dest="b_listModules",
+            help="lists all module declarations of the specified input file with their byte offsets")
+    parser.add_option("--module",
+            dest="s_moduleInFile",
+            help="module to be used by --tb, --scan and --modInst if the file contains several modules (default: the first one)",
+            metavar="module_name")
+    parser.add_option("-I","--include-dir",
+            action="append",
+            dest="l_includeDirs",
+            help="directory searched for `include files when macros in scanned module headers (e.g. port widths) are expanded, may be given several times, searched before the includeDirs of the configuration file",
+            metavar="include_dir")
+    parser.add_option("--hierarchy",
+            action="store_true",
+            dest="b_hierarchy",
+            help="scans all module files below the given directories (default: working directory and search paths) in parallel and prints the design hierarchy (declarations and instantiated modules)")
+    parser.add_option("--hierarchy-format",
+            dest="s_hierarchyFormat",
+            type="choice",
+            choices=["json", "dot"],
+            default="json",
+            help="output format of --hierarchy: json (default) or dot (graphviz)",
+            metavar="format")
+    parser.add_option("--watch",
+            action="store_true",
+            dest="b_watch",
+            help="watches the given directories (default: working directory) and regenerates testbenches (and instantiation snippets, see --snippet-dir) of modules whose port or parameter list changed")
+    parser.add_option("--interval",
+            dest="interval",
+            type="float",
+            default=1.0,
+            help="polling interval of --watch in seconds (default: 1)",
+            metavar="seconds")
+    parser.add_option("--snippet-dir",
+            dest="s_snippetDir",
+            help="directory --watch writes instantiation snippets (<module>.inst) to",
+            metavar="snippet_dir")
+    parser.add_option("--exit-code",
+            action="store_true",
+            dest="b_exitCode",
+            help="exit status tells whether files were written (for build systems): 0 if all generated files were up to date, 2 if at least one file was written, 1 on errors")
+    parser.add_option("--depfile",
+            dest="s_depFile",
+            help="writes a make/ninja compatible dependency file listing the inputs (scanned source, resolved `include files, config file) of every generated testbench, module file or instantiation",
+            metavar="depfile")
+    parser.add_option("--depfile-target",
+            dest="s_depFileTarget",
+            help="target of the --depfile rule, defaults to the generated file (for --modInst, which prints to stdout: the depfile name without a trailing .d)",
+            metavar="target")
+    parser.add_option("--update-db",
+            action="store_true",
+            dest="b_updateDB",
+            help="creates or updates the module database configured as moduleDB with all module files below the given directories (default: searchPaths), only new and changed files are scanned")
+    parser.add_option("--server",
+            action="store_true",
+            dest="b_server",
+            help="starts a resident server answering --modInst, --tb and --scan requests of verilog_codeGen_client.py via a unix socket")
+    parser.add_option("--lsp",
+            action="store_true",
+            dest="b_lsp",
+            help="runs a language server (Language Server Protocol over stdio) completing module names with their instantiation")
+    parser.add_option("--stop-server",
+            action="store_true",
+            dest="b_stopServer",
+            help="stops a running server")
     parser.add_option("--config-template",
             action="store_true",
             dest="b_configTemplate",
@@ -170,6 +307,14 @@ if __name__ == '__main__':
             dest="tabwidth",
             help="specify tabwidth for proper indentation, defaults to 4",
             metavar="tabwidth")
+    parser.add_option("--stats",
+            action="store_true",
+            dest="b_stats",
+            help="prints per-phase wall times and counters (directories visited, files scanned, lines read, ...) as JSON to stderr when done (not collected from batch worker processes)")
+    parser.add_option("--profile",
+            dest="s_profileFile",
+            help="runs verilog_codeGen under cProfile and dumps the stats to the given file (e.g. for 'python -m pstats')",
+            metavar="profile_file")
 
 
     #### parse options ####
@@ -178,8 +323,32 @@ if __name__ == '__main__':
     # call parser
     (options, args) = parser.parse_args()
 
-    # check for module name (if not config template generation is called)
-    if not options.b_configTemplate:
+    # instrumentation (output on exit, so every exit path is covered)
+    if options.b_stats:
+        VerilogCodeGen_Stats.enable()
+        atexit.register( VerilogCodeGen_Stats.dump )
+    if options.s_profileFile:
+        import cProfile
+        profiler = cProfile.Profile()
+
+        def dump_profile():
+            profiler.disable()
+            profiler.dump_stats(options.s_profileFile)
+            sys.stderr.write("profile written to " + options.s_profileFile + "\n")
+
+        atexit.register( dump_profile )
+        profiler.enable()
+
+    # batch testbench generation/json export (several sources, directories, glob patterns or a file list)
+    # (a single argument is only taken as a directory if it ends with a path separator or does not name a module file)
+    b_batch = bool( options.s_fileList or len(args) > 1
+            or ( len(args) == 1 and ( re.search(r"[*?[]", args[0]) or args[0].endswith(os.sep)
+                or ( os.path.isdir(args[0]) and not any( os.path.isfile(args[0] + s_ending) for s_ending in ("", ".v", ".sv") ) ) ) ) )
+    b_batchTestbench = options.b_createTestbench and b_batch
+    b_batchJson = options.b_json and b_batch
+
+    # check for module name (if not config template generation, server control or batch testbench generation is called)
+    if not (options.b_configTemplate or options.b_server or options.b_stopServer or b_batchTestbench or b_batchJson or options.b_hierarchy or options.b_watch or options.s_completeQuery or options.b_updateDB or options.b_lsp):
         if len(args) != 1 :
             print( "Please specify a module/file name!" )
             exit(1)
@@ -202,17 +371,28 @@ if __name__ == '__main__':
     # determine timescale string
     s_timescale = options.timescale if options.timescale else ""
 
+    # determine policy for existing output files
+    if options.s_overwritePolicy:
+        s_overwritePolicy = options.s_overwritePolicy
+    elif options.b_watch:
+        s_overwritePolicy = "overwrite"
+    else:
+        s_overwritePolicy = "skip" if b_batchTestbench else "ask"
+
 
     ##########################
     #### load config file ####
     ##########################
 
-    config = Verilog_codeGen_config.load()
-    if not config:
-        config = Verilog_codeGen_config( configFile="" )
+    with VerilogCodeGen_Stats.phase("config"):
+        config = Verilog_codeGen_config.load()
+        if not config:
+            config = Verilog_codeGen_config( configFile="" )
 
     l_searchPaths = config.searchPaths if config.searchPaths else []
-    if config.get_configFile() and not options.b_moduleInstantiation: print("Configuration loaded from " + config.get_configFile() )
+    if options.l_includeDirs:
+        config.includeDirs = options.l_includeDirs + list(config.includeDirs)
+    if config.get_configFile() and not (options.b_moduleInstantiation or options.b_hierarchy or options.s_completeQuery or options.b_json or options.b_updateDB or options.b_lsp): print("Configuration loaded from " + config.get_configFile() )
 
     # determine tabwidth
     if options.tabwidth:
@@ -231,6 +411,9 @@ if __name__ == '__main__':
     else: 
         s_author = ""
 
+    # inputs of every generated file besides the scanned sources (-> --depfile)
+    l_configDeps = [config.get_configFile()] if config.get_configFile() else []
+
 
     #############################################################
     #                                                           #
@@ -248,6 +431,24 @@ if __name__ == '__main__':
         print("code generation done")
 
 
+    ########################
+    #### server control ####
+    ########################
+
+    elif options.b_server:
+        from VerilogCodeGen_Server import VerilogCodeGen_Server
+        VerilogCodeGen_Server().run()
+
+    elif options.b_lsp:
+        from VerilogCodeGen_LSP import VerilogCodeGen_LSP
+        exit( VerilogCodeGen_LSP().run() )
+
+    elif options.b_stopServer:
+        from VerilogCodeGen_Socket import send_request
+        d_response = send_request( {"action": "shutdown"} )
+        print(d_response["stdout"] if d_response else "No server running", end="" if d_response else "\n")
+
+
     ###########################
     #### module generation ####
     ###########################
@@ -272,34 +473,197 @@ if __name__ == '__main__':
                             language=language )
 
         print("generating module file...")
-        verilogFile.write_moduleFile()
+        l_status = [ verilogFile.write_moduleFile( s_overwritePolicy=s_overwritePolicy ) ]
 
         #### additional testbench generation ####
         if options.b_addTestbench:
             print("adding a testbench...")
-            verilogFile.write_testbenchFile()
+            l_status.append( verilogFile.write_testbenchFile( s_overwritePolicy=s_overwritePolicy ) )
+
+        if options.s_depFile:
+            l_targets = [ s_moduleName + "." + language.get_fileEnding() ]
+            if options.b_addTestbench:
+                l_targets.append( "tb_" + s_moduleName + "." + language.get_fileEnding() )
+            writeDepfile( options.s_depFile, [ ([options.s_depFileTarget] if options.s_depFileTarget else l_targets, l_configDeps) ] )
 
         print("code generation done")
+        if options.b_exitCode and "written" in l_status:
+            exit(2)
 
 
     ##############################
     #### testbench generation ####
     ##############################
+    elif b_batchTestbench:
+        from VerilogCodeGen_Batch import collect_sourceFiles, generate_testbenches
+        l_files = collect_sourceFiles( args, options.s_fileList, config.get_searchOptions() )
+        d_summary = generate_testbenches( l_files,
+                        s_overwritePolicy=s_overwritePolicy,
+                        s_outputDir=options.s_outputDir,
+                        s_author=s_author,
+                        s_timescale=s_timescale,
+                        tabwidth=tabwidth,
+                        jobs=options.jobs,
+                        moduleCacheSize=config.moduleCacheSize,
+                        l_includeDirs=config.includeDirs )
+        if options.s_depFile:
+            # (scan results of the worker processes are served by the module cache)
+            moduleCache = VerilogModuleCache.load( config.moduleCacheSize, config.includeDirs )
+            l_rules = []
+            for s_fileIn, s_fileOut in d_summary["generated"] + d_summary["unchanged"]:
+                verilogFile = moduleCache.scan( s_fileIn )
+                l_rules.append( ([s_fileOut], [s_fileIn] + (verilogFile.get_includeFiles() if verilogFile else []) + l_configDeps) )
+            writeDepfile( options.s_depFile, l_rules )
+        exit(1 if d_summary["failed"] else 2 if options.b_exitCode and d_summary["generated"] else 0)
+
     elif options.b_createTestbench:
-        verilogFile = VerilogFile.scan( s_fileName )
+        from VerilogModuleDB import VerilogModuleDB
+        moduleDB = VerilogModuleDB.load( config.moduleDB, config.includeDirs )
+        verilogFile = moduleDB.scan( s_fileName, options.s_moduleInFile ) if moduleDB else None
+        if not verilogFile:
+            moduleCache = VerilogModuleCache.load( config.moduleCacheSize, config.includeDirs )
+            verilogFile = moduleCache.scan( s_fileName, options.s_moduleInFile )
+            moduleCache.prune()
+        if not verilogFile:
+            print("No module declaration " + (options.s_moduleInFile + " " if options.s_moduleInFile else "") + "found in " + s_fileName + "!")
+            exit(1)
         verilogFile.indentObj = indentObj
         verilogFile.s_author = s_author
         verilogFile.s_timescale = s_timescale
         print("writing testbench file...")
-        verilogFile.write_testbenchFile()
+        s_status = verilogFile.write_testbenchFile( s_overwritePolicy=s_overwritePolicy )
+        if options.s_depFile:
+            s_target = options.s_depFileTarget if options.s_depFileTarget else "tb_" + verilogFile.verilogModule.moduleName + "." + verilogFile.language.get_fileEnding()
+            writeDepfile( options.s_depFile, [ ([s_target], [s_fileName] + verilogFile.get_includeFiles() + l_configDeps) ] )
         print("code generation done")
+        if options.b_exitCode and s_status == "written":
+            exit(2)
+
+    
+    ######################
+    #### file scanning ####
+    ######################
+    elif options.b_scan:
+        moduleCache = VerilogModuleCache.load( config.moduleCacheSize, config.includeDirs )
+        verilogFile = moduleCache.scan( s_fileName, options.s_moduleInFile )
+        moduleCache.prune()
+        if verilogFile:
+            print(verilogFile)
+        else:
+            print("No module declaration " + (options.s_moduleInFile + " " if options.s_moduleInFile else "") + "found in " + s_fileName + "!")
+            exit(1)
+
+    #### json export ####
+    elif b_batchJson:
+        from VerilogCodeGen_Batch import collect_sourceFiles
+        from VerilogCodeGen_Export import export_files
+        l_failed = export_files( collect_sourceFiles( args, options.s_fileList, config.get_searchOptions() ), sys.stdout,
+                        jobs=options.jobs,
+                        moduleCacheSize=config.moduleCacheSize,
+                        l_includeDirs=config.includeDirs )
+        for s_fileIn, s_message in l_failed:
+            sys.stderr.write("failed: " + s_fileIn + " (" + s_message + ")\n")
+        exit(1 if l_failed else 0)
+
+    elif options.b_json:
+        from VerilogCodeGen_Export import get_record
+        moduleCache = VerilogModuleCache.load( config.moduleCacheSize, config.includeDirs )
+        verilogFile = moduleCache.scan( s_fileName, options.s_moduleInFile )
+        moduleCache.prune()
+        if not verilogFile:
+            sys.stderr.write("No module declaration " + (options.s_moduleInFile + " " if options.s_moduleInFile else "") + "found in " + s_fileName + "!\n")
+            exit(1)
+        print( json.dumps( get_record(s_fileName, verilogFile) ) )
+
+    elif options.b_listModules:
+        moduleCache = VerilogModuleCache.load( config.moduleCacheSize, config.includeDirs )
+        l_modules = moduleCache.get_moduleDeclarations( s_fileName )
+        moduleCache.prune()
+        for s_moduleName, offset, s_moduleTimescale in l_modules:
+            print( s_moduleName + "\t" + str(offset) )
+        if not l_modules:
+            print("No module declaration found in " + s_fileName + "!")
+            exit(1)
 
     
+    ####################
+    #### watch mode ####
+    ####################
+    elif options.b_watch:
+        from VerilogWatcher import VerilogWatcher
+        VerilogWatcher( args if args else [os.getcwd()],
+                        d_searchOptions=config.get_searchOptions(),
+                        l_includeDirs=config.includeDirs,
+                        moduleCacheSize=config.moduleCacheSize,
+                        s_outputDir=options.s_outputDir,
+                        s_snippetDir=options.s_snippetDir,
+                        s_author=s_author,
+                        s_timescale=s_timescale,
+                        tabwidth=tabwidth,
+                        s_overwritePolicy="skip" if s_overwritePolicy == "skip" else "overwrite" ).run( options.interval )
+
+
+    ##########################
+    #### design hierarchy ####
+    ##########################
+    elif options.b_hierarchy:
+        from VerilogHierarchy import VerilogHierarchy
+        hierarchy = VerilogHierarchy.build( args if args else [os.getcwd()] + list(l_searchPaths),
+                        d_searchOptions=config.get_searchOptions(),
+                        l_includeDirs=config.includeDirs,
+                        jobs=options.jobs,
+                        b_useCache=config.moduleCacheSize > 0,
+                        # the graph only needs module names and instantiations
+                        b_declarations=options.s_hierarchyFormat != "dot" )
+        with VerilogCodeGen_Stats.phase("write"):
+            sys.stdout.write( hierarchy.render_dot() if options.s_hierarchyFormat == "dot" else hierarchy.render_json() )
+
+
+    #########################
+    #### module database ####
+    #########################
+    elif options.b_updateDB:
+        from VerilogModuleDB import VerilogModuleDB
+        if not config.moduleDB:
+            print("No module database configured (moduleDB)!")
+            exit(1)
+        l_roots = args if args else list(l_searchPaths)
+        if not l_roots:
+            print("Please specify directories or configure searchPaths!")
+            exit(1)
+        moduleDB = VerilogModuleDB.create( config.moduleDB, config.includeDirs )
+        d_summary = moduleDB.update( l_roots, d_searchOptions=config.get_searchOptions(), jobs=options.jobs )
+        moduleDB.close()
+        print( config.moduleDB + ": " + str(d_summary["files"]) + " files, " + str(d_summary["scanned"]) + " scanned, " + str(d_summary["removed"]) + " removed" )
+
+
     ##############################
     #### module instantiation ####
     ##############################
     elif options.b_moduleInstantiation:
-        verilogModule = VerilogModule.generate_instantiationFromSearch( s_moduleName, config, indentObj=indentObj )
+        # a file path (e.g. one of the --alternatives) selects that file directly
+        t_instantiation = VerilogModule.generate_instantiationFromSearch( args[0] if "/" in args[0] else s_moduleName, config, indentObj=indentObj, moduleNameInFile=options.s_moduleInFile,
+                                                                            file_alternatives=sys.stderr if options.b_alternatives else None )
+        if options.s_depFile and t_instantiation:
+            s_selectedModule, verilogFile = t_instantiation
+            s_target = options.s_depFileTarget if options.s_depFileTarget else re.sub(r"\.d$", "", options.s_depFile)
+            writeDepfile( options.s_depFile, [ ([s_target], [s_selectedModule] + verilogFile.get_includeFiles() + l_configDeps) ] )
+
+    elif options.s_completeQuery:
+        from VerilogModuleDB import VerilogModuleDB
+        from VerilogModuleIndex import VerilogModuleIndex
+        moduleDB = VerilogModuleDB.load( config.moduleDB, config.includeDirs )
+        l_similar = moduleDB.find_similar( options.s_completeQuery, [os.getcwd()] + list(l_searchPaths) ) if moduleDB else []
+        if not l_similar:
+            moduleIndex = VerilogModuleIndex.load()
+            d_searchOptions = config.get_searchOptions()
+            d_searchOptions.pop("b_stopAtUniqueMatch")
+            l_similar = moduleIndex.find_similar( options.s_completeQuery, [os.getcwd()] + list(l_searchPaths), **d_searchOptions )
+            moduleIndex.save()
+        for s_similarName, l_files in l_similar:
+            print(s_similarName)
+        if not l_similar:
+            exit(1)
     
     else:
         print("No action specified, nothing to be done")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+
+# verilog_codeGen_client
+# Copyright © 2020 Marwin Kirchhofs <marwin.kirchhofs@rwth-aachen.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# thin client for a resident verilog_codeGen server (verilog_codeGen --server)
+#
+#   Takes the same command line as verilog_codeGen. Module instantiation (--modInst), testbench generation (--tb), scanning (--scan)
+#   and module name completion (--complete) are sent to the server, so no interpreter startup, config loading or directory walking is needed for these requests.
+#   Everything else, or every request while no server is running, is handed over to verilog_codeGen.py.
+#   The client deliberately imports nothing but the standard library modules it needs (and src/VerilogCodeGen_Socket.py, which only uses the standard library as well).
+#
+#   usage (e.g. in vim):
+#       :read !verilog_codeGen_client --modInst fifo_buffer
+#   Several matching files never lead to a query, the best ranked one is instantiated (--alternatives lists all of them on stderr).
+#
+
+import sys, os, json
+
+sys.path.append( os.path.dirname( os.path.realpath(__file__) ) + "/src" )
+from VerilogCodeGen_Socket import send_request
+
+
+# actions the server answers
+d_actions = { "--modInst": "modInst", "--mod-inst": "modInst", "--module-instantiation": "modInst",
+                "--tb": "tb", "--testbench": "tb", "--scan": "scan", "--complete": "complete" }
+# options without value which are handled by the client
+s_clientFlags = { "--alternatives" }
+# options with a value which are forwarded to the server
+d_valueOptions = { "-a": "author", "--author": "author", "--tabwidth": "tabwidth", "--timescale": "timescale", "--module": "module" }
+
+
+def parse_request(l_args):
+    """builds a server request from the command line
+
+    :l_args: command line arguments (without program name)
+    :returns: request dictionary, None if the command line can not be handled by the server
+    """
+    d_request = { "cwd": os.getcwd(), "flags": [] }
+    l_names = []
+    i = 0
+    while i < len(l_args):
+        s_arg = l_args[i]
+        s_option, s_sep, s_value = s_arg.partition("=")
+        if s_arg in d_actions:
+            if "action" in d_request:
+                return None
+            d_request["action"] = d_actions[s_arg]
+        elif s_arg in s_clientFlags:
+            d_request["flags"].append(s_arg)
+        elif s_option in d_valueOptions:
+            if not s_sep:
+                i += 1
+                if i == len(l_args):
+                    return None
+                s_value = l_args[i]
+            d_request[ d_valueOptions[s_option] ] = s_value
+        elif s_arg.startswith("-"):
+            # any other option is handled by verilog_codeGen.py itself
+            return None
+        else:
+            l_names.append(s_arg)
+        i += 1
+
+    if "action" not in d_request or len(l_names) != 1:
+        return None
+    d_request["name"] = l_names[0]
+    return d_request
+
+
+def fallback():
+    """hands the command line over to verilog_codeGen.py"""
+    s_codeGen = os.path.dirname( os.path.realpath(__file__) ) + "/verilog_codeGen.py"
+    os.execv( sys.executable, [sys.executable, s_codeGen] + sys.argv[1:] )
+
+
+if __name__ == '__main__':
+
+    d_request = parse_request(sys.argv[1:])
+    if not d_request:
+        fallback()
+
+    d_response = send_request(d_request)
+    if not d_response:
+        fallback()
+
+    # selected module file and alternatives (same as verilog_codeGen --alternatives)
+    if "--alternatives" in d_request["flags"] and "selected" in d_response:
+        sys.stderr.write( json.dumps( { "module": d_request["name"], "selected": d_response["selected"], "alternatives": d_response["alternatives"] } ) + "\n" )
+
+    # existing testbench -> query for overwriting
+    if d_response.get("exists"):
+        sys.stdout.write(d_response["stdout"])
+        try:
+            overwrite = input("File " + d_response["exists"] + " exists! Are you sure you want to overwrite it? [y/n]")
+        except EOFError:
+            # no terminal (e.g. called from an editor) -> keep the file
+            overwrite = "n"
+            print()
+        if overwrite != 'y':
+            print("File " + d_response["exists"] + " will not be overwritten. Exiting...")
+            sys.exit(0)
+        print("File " + d_response["exists"] + " will be overwritten...")
+        d_request["overwrite"] = True
+        d_response = send_request(d_request)
+
+    if not d_response:
+        print("Connection to verilog_codeGen server lost!")
+        sys.exit(1)
+    sys.stdout.write(d_response["stdout"])
+    sys.exit(d_response["exitCode"])